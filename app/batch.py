@@ -0,0 +1,113 @@
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import asdict, dataclass
+from typing import TextIO
+from app.utils import LoxRuntimeError
+from app.parser import ParseError
+from app.main import compile_program, execute
+
+EXIT_NO_INPUT = 66 # As in sysexits.h, like the usage errors (64)
+
+@dataclass
+class ScriptResult:
+    """
+    Outcome of one script of a batch: what it printed and its exit code, as `run` would have
+    exited: 0, 65 for scanning and parsing errors, 70 for runtime errors (1 if the interpreter
+    itself crashed, with the traceback on stderr), or 66 if the script could not be read.
+    """
+    path: str
+    exit_code: int
+    stdout: str
+    stderr: str
+    seconds: float
+
+def find_scripts(paths: list[str]) -> list[str]:
+    """The scripts to run: files as given, and the `.lox` files found in directories, in order."""
+    scripts = []
+    for path in paths:
+        if not os.path.isdir(path):
+            scripts.append(path)
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            scripts.extend(os.path.join(directory, file) for file in sorted(files) if file.endswith(".lox"))
+    return scripts
+
+def run_program(file_contents: str, engine: str, max_depth: int | None) -> int:
+    """
+    Runs a program on a fresh engine and returns the exit code of `run`, with errors reported on
+    stderr as `run` reports them.
+    """
+    try:
+        execute(compile_program(file_contents), engine, max_depth)
+        return 0
+    except LoxRuntimeError as error:
+        print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
+        return 70
+    except ParseError:
+        return 65
+    except SystemExit as exit: # The Scanner exits on errors
+        return exit.code if isinstance(exit.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+def read_script(path: str) -> str | None:
+    """The source of a script, or None (with the error on stderr) if it cannot be read."""
+    try:
+        with open(path) as file:
+            return file.read()
+    except OSError as error:
+        print(f"Cannot read {path}: {error.strerror}", file=sys.stderr)
+        return None
+
+def run_script(path: str, engine: str, max_depth: int | None) -> ScriptResult:
+    """Runs one script in the current process, capturing its output."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        file_contents = read_script(path)
+        exit_code = run_program(file_contents, engine, max_depth) if file_contents is not None else EXIT_NO_INPUT
+    return ScriptResult(path, exit_code, stdout.getvalue(), stderr.getvalue(), time.perf_counter() - start)
+
+def _run_task(task: tuple[str, str, int | None]) -> ScriptResult:
+    return run_script(*task)
+
+def run_batch(paths: list[str], engine: str, max_depth: int | None, workers: int | None = None, report: TextIO | None = None) -> int:
+    """
+    Runs scripts in a pool of `workers` processes (one per CPU by default), so that Python starts
+    and imports the interpreter once per worker instead of once per script. Writes a JSON report
+    of the results, in the order of the scripts, to `report` (stdout by default), and a summary to
+    stderr. Returns 0 if every script succeeded, 1 otherwise.
+    """
+    scripts = find_scripts(paths)
+    start = time.perf_counter()
+    tasks = [(script, engine, max_depth) for script in scripts]
+    if workers == 1 or len(tasks) <= 1:
+        results = [_run_task(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            # Small chunks keep workers busy when some scripts take much longer than others
+            results = pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1))))
+    elapsed = time.perf_counter() - start
+
+    exit_codes: dict[int, int] = {}
+    for result in results:
+        exit_codes[result.exit_code] = exit_codes.get(result.exit_code, 0) + 1
+    summary = {
+        "scripts": len(results),
+        "seconds": elapsed,
+        "exit_codes": {str(code): count for code, count in sorted(exit_codes.items())},
+    }
+    json.dump({"summary": summary, "results": [asdict(result) for result in results]}, report or sys.stdout, indent=2)
+    (report or sys.stdout).write("\n")
+
+    failed = len(results) - exit_codes.get(0, 0)
+    print(f"{len(results)} scripts in {elapsed:.2f}s: {len(results) - failed} succeeded, {failed} failed", file=sys.stderr)
+    return 0 if failed == 0 else 1
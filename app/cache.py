@@ -0,0 +1,127 @@
+import hashlib
+import os
+import pickle
+import stat
+import sys
+import tempfile
+from typing import Iterable
+from app.grammar.statements import Stmt
+from app.source import MappedSource
+
+CACHE_DIRECTORY = "__loxcache__"
+MAX_BYTES = 64 * 1024 * 1024
+
+# Modules whose code decides what a cached program looks like: editing any of them invalidates the cache
+COMPILER_MODULES = ["app/types.py", "app/scanner.py", "app/parser.py", "app/resolver.py", "app/optimizer.py", "app/operators.py", "app/rope.py", "app/interpreter.py", "app/grammar/expressions.py", "app/grammar/statements.py"]
+
+def _interpreter_version() -> bytes:
+	digest = hashlib.sha256(f"{sys.version_info[:2]} pickle {pickle.HIGHEST_PROTOCOL}".encode())
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	for module in COMPILER_MODULES:
+		with open(os.path.join(root, module), "rb") as file:
+			digest.update(file.read())
+	return digest.digest()
+
+def _user_cache_directory() -> str:
+	"""The cache of the current user, used when the directory next to the script cannot be trusted."""
+	root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(root, "lox")
+
+def _is_trusted_directory(directory: str) -> bool:
+	"""Whether only the current user can have written the entries of the directory."""
+	try:
+		status = os.lstat(directory)
+	except OSError:
+		return False
+	return stat.S_ISDIR(status.st_mode) and status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+class ProgramCache:
+	"""
+	On-disk cache of resolved programs, in the spirit of `__pycache__`.
+
+	Each entry is a pickled statement list, stored under the SHA-256 of the source and of the
+	interpreter version, so that a changed script or interpreter never hits a stale entry.
+	Entries are touched when they are used, and the least recently used ones are evicted
+	once the directory grows over `max_bytes`.
+	Any I/O or unpickling problem is treated as a miss: the cache can only make things faster.
+
+	Since unpickling an entry can run arbitrary code, entries are only loaded from, and stored
+	in, a directory that belongs to the current user and that no one else can write to, and only
+	entries that belong to the current user are loaded.
+	"""
+	def __init__(self, directory: str, max_bytes: int = MAX_BYTES):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self._version = _interpreter_version()
+
+	@classmethod
+	def for_script(cls, filename: str) -> 'ProgramCache':
+		"""
+		The cache living next to the script, like `__pycache__` next to a module, unless that
+		directory exists but belongs to someone else or is writable by others.
+		"""
+		directory = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIRECTORY)
+		if os.path.lexists(directory) and not _is_trusted_directory(directory):
+			return cls(_user_cache_directory())
+		return cls(directory)
+
+	def _path(self, source: str | Iterable[str]) -> str:
+		digest = hashlib.sha256(self._version)
+		if isinstance(source, MappedSource):
+			# Hashed as mapped, without decoding it
+			digest.update(source.data)
+			return os.path.join(self.directory, f"{digest.hexdigest()}.pickle")
+		# A source read in chunks has the same key as the whole str
+		for chunk in [source] if isinstance(source, str) else source:
+			digest.update(chunk.encode())
+		return os.path.join(self.directory, f"{digest.hexdigest()}.pickle")
+
+	def load(self, source: str | Iterable[str]) -> list[Stmt] | None:
+		if not _is_trusted_directory(self.directory):
+			return None
+		path = self._path(source)
+		try:
+			with open(path, "rb") as file:
+				if os.fstat(file.fileno()).st_uid != os.getuid():
+					return None
+				statements = pickle.load(file)
+			os.utime(path) # Marks the entry as recently used
+		except Exception: # A corrupt entry can fail in many ways
+			return None
+		return statements
+
+	def store(self, source: str | Iterable[str], statements: list[Stmt]) -> None:
+		try:
+			data = pickle.dumps(statements, pickle.HIGHEST_PROTOCOL)
+		except RecursionError: # Very deeply nested program
+			return
+		try:
+			# Never writable by others, whatever the umask
+			os.makedirs(self.directory, 0o755, exist_ok=True)
+			if not _is_trusted_directory(self.directory):
+				return
+			# Written under a temporary name first, so that concurrent runs never read a partial entry
+			descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+			with os.fdopen(descriptor, "wb") as file:
+				file.write(data)
+			os.replace(temporary, self._path(source))
+			self._evict()
+		except OSError:
+			return
+
+	def _evict(self) -> None:
+		entries = []
+		for entry in os.scandir(self.directory):
+			if entry.name.endswith(".pickle"):
+				stat = entry.stat()
+				entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			try:
+				os.remove(path)
+			except FileNotFoundError: # Already evicted by a concurrent run
+				pass
+			total -= size
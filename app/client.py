@@ -0,0 +1,38 @@
+import json
+import socket
+import sys
+from app.protocol import EXIT, REQUEST, STDERR, STDOUT, receive_frame, send_frame
+
+EXIT_UNAVAILABLE = 69 # As in sysexits.h: no server is listening
+
+def run_remote(file_contents: str, socket_path: str, engine: str, max_depth: int | None) -> int:
+    """
+    Runs a program on the server listening on `socket_path` (see app.server) and returns its
+    exit code. Its output and error output are written to stdout and stderr as they arrive, so
+    that the client behaves like `run`.
+
+    This module only imports the standard library, so that starting the client is cheap.
+    """
+    try:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    except OSError as error:
+        print(f"Cannot connect to the server at {socket_path}: {error.strerror}", file=sys.stderr)
+        return EXIT_UNAVAILABLE
+
+    with connection:
+        request = {"source": file_contents, "engine": engine, "max_depth": max_depth}
+        send_frame(connection, REQUEST, json.dumps(request).encode())
+        while (frame := receive_frame(connection)) is not None:
+            kind, payload = frame
+            if kind == STDOUT:
+                sys.stdout.write(payload.decode())
+            elif kind == STDERR:
+                sys.stdout.flush()
+                sys.stderr.write(payload.decode())
+            elif kind == EXIT:
+                sys.stdout.flush()
+                return int(payload)
+    sys.stdout.flush()
+    print("The server closed the connection before the end of the script", file=sys.stderr)
+    return EXIT_UNAVAILABLE
@@ -0,0 +1,337 @@
+import operator
+from typing import Any, Callable
+from app.types import TokenType, Token
+from app.utils import LoxRuntimeError, NativeError
+from app.grammar.expressions import Assign, Call, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+from app.environment import Environment
+from app.output import Output
+from app.interpreter import Interpreter, LoxCallable, NATIVES
+
+# A compiled expression evaluates to its value
+CompiledExpr = Callable[[Environment], Any]
+# A compiled statement evaluates to None, or to a 1-tuple holding the value of an executed `return`
+CompiledStmt = Callable[[Environment], tuple | None]
+
+_isTruthy = Interpreter._isTruthy
+_stringify = Interpreter._stringify
+_checkNumberOperands = Interpreter._checkNumberOperands
+
+NUMBER_OPERATORS: dict[TokenType, Callable[[Any, Any], Any]] = {
+	TokenType.MINUS: operator.sub,
+	TokenType.STAR: operator.mul,
+	TokenType.SLASH: operator.truediv,
+	TokenType.GREATER: operator.gt,
+	TokenType.GREATER_EQUAL: operator.ge,
+	TokenType.LESS: operator.lt,
+	TokenType.LESS_EQUAL: operator.le,
+}
+
+class ClosureInterpreter:
+	"""
+	Execution engine that compiles the program into a tree of Python closures before running it.
+
+	Each AST node is turned into one closure that takes the current Environment, with its
+	children, operator and variable address already bound, so nothing is dispatched at run time.
+	Expects a program that has been run through the Resolver.
+	"""
+	def __init__(self, output: Output | None = None):
+		self._globals: Environment = Environment()
+		self._output = output if output is not None else Output()
+
+		# We define native functions here
+		for name, native in NATIVES.items():
+			self._globals.define(name, native)
+
+	def interpret(self, statements: list[Stmt]) -> None:
+		compiled = ClosureCompiler(self).compile(statements)
+		try:
+			for statement in compiled:
+				statement(self._globals)
+		finally:
+			self._output.flush()
+
+class CompiledFunction(LoxCallable):
+	"""Counterpart of LoxFunction for compiled bodies."""
+	def __init__(self, declaration: Function, body: list[CompiledStmt], closure: Environment):
+		self.declaration = declaration
+		self.body = body
+		self.closure = closure
+		self.arity_ = len(declaration.params)
+
+	def call(self, interpreter: Any, arguments: list) -> Any:
+		# The Resolver gives parameters the first slots of the function scope
+		environment = Environment(self.closure, arguments)
+		for statement in self.body:
+			completion = statement(environment)
+			if completion is not None:
+				return completion[0]
+		return None
+
+	def arity(self) -> int:
+		return self.arity_
+
+	def __str__(self) -> str:
+		return f"<fn {self.declaration.name.lexeme}>"
+
+class ClosureCompiler(ExprVisitor, StmtVisitor):
+	def __init__(self, interpreter: ClosureInterpreter):
+		self._interpreter = interpreter
+		# Number of enclosing blocks and functions: at 0, declarations create globals
+		self._scope_depth = 0
+
+	def compile(self, statements: list[Stmt]) -> list[CompiledStmt]:
+		return [statement.accept(self) for statement in statements]
+
+	def _variable_reader(self, name: Token, depth: int | None, slot: int | None) -> CompiledExpr:
+		if depth is None:
+			globals_ = self._interpreter._globals
+
+			def read_global(environment: Environment) -> Any:
+				return globals_.get(name)
+			return read_global
+
+		if depth == 0:
+			def read_local(environment: Environment) -> Any:
+				return environment.slots[slot]
+			return read_local
+
+		if depth == 1:
+			def read_enclosing(environment: Environment) -> Any:
+				return environment.enclosing.slots[slot]
+			return read_enclosing
+
+		def read_ancestor(environment: Environment) -> Any:
+			return environment.get_at(depth, slot)
+		return read_ancestor
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_expression_stmt(self, stmt: Expression) -> CompiledStmt:
+		expression = stmt.expression.accept(self)
+
+		def execute_expression(environment: Environment) -> None:
+			expression(environment)
+		return execute_expression
+
+	def visit_print_stmt(self, stmt: Print) -> CompiledStmt:
+		expression = stmt.expression.accept(self)
+		write_line = self._interpreter._output.write_line
+
+		def execute_print(environment: Environment) -> None:
+			write_line(_stringify(expression(environment)))
+		return execute_print
+
+	def visit_var_stmt(self, stmt: Var) -> CompiledStmt:
+		name = stmt.name.lexeme
+		initializer = stmt.initializer.accept(self) if stmt.initializer is not None else None
+
+		if self._scope_depth == 0:
+			def define_global(environment: Environment) -> None:
+				environment.define(name, initializer(environment) if initializer is not None else None)
+			return define_global
+
+		def declare_local(environment: Environment) -> None:
+			environment.declare(initializer(environment) if initializer is not None else None)
+		return declare_local
+
+	def visit_block_stmt(self, stmt: Block) -> CompiledStmt:
+		self._scope_depth += 1
+		statements = [statement.accept(self) for statement in stmt.statements]
+		self._scope_depth -= 1
+
+		def execute_block(environment: Environment) -> tuple | None:
+			block_environment = Environment(environment)
+			for statement in statements:
+				completion = statement(block_environment)
+				if completion is not None:
+					return completion
+			return None
+		return execute_block
+
+	def visit_if_stmt(self, stmt: If) -> CompiledStmt:
+		condition = stmt.condition.accept(self)
+		then_branch = stmt.thenBranch.accept(self)
+		else_branch = stmt.elseBranch.accept(self) if stmt.elseBranch is not None else None
+
+		def execute_if(environment: Environment) -> tuple | None:
+			if _isTruthy(condition(environment)):
+				return then_branch(environment)
+			if else_branch is not None:
+				return else_branch(environment)
+			return None
+		return execute_if
+
+	def visit_while_stmt(self, stmt: While) -> CompiledStmt:
+		condition = stmt.condition.accept(self)
+		body = stmt.body.accept(self)
+
+		def execute_while(environment: Environment) -> tuple | None:
+			while _isTruthy(condition(environment)):
+				completion = body(environment)
+				if completion is not None:
+					return completion
+			return None
+		return execute_while
+
+	def visit_function_stmt(self, stmt: Function) -> CompiledStmt:
+		name = stmt.name.lexeme
+		is_global = self._scope_depth == 0
+		self._scope_depth += 1
+		body = [statement.accept(self) for statement in stmt.body]
+		self._scope_depth -= 1
+
+		if is_global:
+			def define_global_function(environment: Environment) -> None:
+				environment.define(name, CompiledFunction(stmt, body, environment))
+			return define_global_function
+
+		def declare_local_function(environment: Environment) -> None:
+			environment.declare(CompiledFunction(stmt, body, environment))
+		return declare_local_function
+
+	def visit_return_stmt(self, stmt: Return) -> CompiledStmt:
+		if stmt.value is None:
+			return lambda environment: (None,)
+		value = stmt.value.accept(self)
+
+		def execute_return(environment: Environment) -> tuple:
+			return (value(environment),)
+		return execute_return
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_literal(self, expr: Literal) -> CompiledExpr:
+		value = expr.value
+		return lambda environment: value
+
+	def visit_grouping(self, expr: Grouping) -> CompiledExpr:
+		return expr.expression.accept(self)
+
+	def visit_variable(self, expr: Variable) -> CompiledExpr:
+		return self._variable_reader(expr.name, expr.depth, expr.slot)
+
+	def visit_assign(self, expr: Assign) -> CompiledExpr:
+		name, depth, slot = expr.name, expr.depth, expr.slot
+		value = expr.value.accept(self)
+
+		if depth is None:
+			globals_ = self._interpreter._globals
+
+			def assign_global(environment: Environment) -> Any:
+				result = value(environment)
+				globals_.assign(name, result)
+				return result
+			return assign_global
+
+		if depth == 0:
+			def assign_local(environment: Environment) -> Any:
+				result = environment.slots[slot] = value(environment)
+				return result
+			return assign_local
+
+		def assign_ancestor(environment: Environment) -> Any:
+			result = value(environment)
+			environment.assign_at(depth, slot, result)
+			return result
+		return assign_ancestor
+
+	def visit_logical(self, expr: Logical) -> CompiledExpr:
+		left = expr.left.accept(self)
+		right = expr.right.accept(self)
+
+		if expr.operator.type == TokenType.OR:
+			def evaluate_or(environment: Environment) -> Any:
+				value = left(environment)
+				return value if _isTruthy(value) else right(environment)
+			return evaluate_or
+
+		def evaluate_and(environment: Environment) -> Any:
+			value = left(environment)
+			return right(environment) if _isTruthy(value) else value
+		return evaluate_and
+
+	def visit_unary(self, expr: Unary) -> CompiledExpr:
+		right = expr.right.accept(self)
+		operator_token = expr.operator
+
+		if operator_token.type == TokenType.BANG:
+			return lambda environment: not _isTruthy(right(environment))
+
+		def evaluate_negate(environment: Environment) -> Any:
+			value = right(environment)
+			if value.__class__ is float or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+				return -value
+			raise LoxRuntimeError(operator_token, "Operand must be a number.")
+		return evaluate_negate
+
+	def visit_binary(self, expr: Binary) -> CompiledExpr:
+		left = expr.left.accept(self)
+		right = expr.right.accept(self)
+		operator_token = expr.operator
+
+		match operator_token.type:
+			case TokenType.PLUS:
+				def evaluate_add(environment: Environment) -> Any:
+					left_value = left(environment)
+					right_value = right(environment)
+					if left_value.__class__ is float and right_value.__class__ is float:
+						return left_value + right_value
+					if isinstance(left_value, str) and isinstance(right_value, str):
+						return left_value + right_value
+					if (
+						(isinstance(left_value, (int, float)) and not isinstance(left_value, bool)) and
+						(isinstance(right_value, (int, float)) and not isinstance(right_value, bool))
+					):
+						return left_value + right_value
+					raise LoxRuntimeError(operator_token, "Operands must be two numbers or two strings.")
+				return evaluate_add
+			case TokenType.EQUAL_EQUAL:
+				return lambda environment: left(environment) == right(environment)
+			case TokenType.BANG_EQUAL:
+				return lambda environment: left(environment) != right(environment)
+
+		apply = NUMBER_OPERATORS[operator_token.type]
+
+		if isinstance(expr.right, Literal) and expr.right.value.__class__ is float:
+			# Specialized for the very common `a - 1`, `i < 10`...
+			constant = expr.right.value
+
+			def evaluate_with_constant(environment: Environment) -> Any:
+				left_value = left(environment)
+				if left_value.__class__ is not float:
+					_checkNumberOperands(operator_token, left_value, constant)
+				return apply(left_value, constant)
+			return evaluate_with_constant
+
+		def evaluate_numbers(environment: Environment) -> Any:
+			left_value = left(environment)
+			right_value = right(environment)
+			if left_value.__class__ is not float or right_value.__class__ is not float:
+				_checkNumberOperands(operator_token, left_value, right_value)
+			return apply(left_value, right_value)
+		return evaluate_numbers
+
+	def visit_call(self, expr: Call) -> CompiledExpr:
+		callee = expr.callee.accept(self)
+		arguments = [argument.accept(self) for argument in expr.arguments]
+		argument_count = len(arguments)
+		paren = expr.paren
+		interpreter = self._interpreter
+
+		def evaluate_call(environment: Environment) -> Any:
+			function = callee(environment)
+			values = [argument(environment) for argument in arguments]
+
+			if not isinstance(function, LoxCallable):
+				raise LoxRuntimeError(paren, "Can only call functions and classes.")
+			if argument_count != function.arity():
+				raise LoxRuntimeError(paren, f"Expected {function.arity()} arguments but got {argument_count}.")
+
+			try:
+				return function.call(interpreter, values)
+			except RecursionError:
+				raise LoxRuntimeError(paren, "Stack overflow.") from None
+			except NativeError as error:
+				raise LoxRuntimeError(paren, error.message) from None
+		return evaluate_call
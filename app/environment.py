@@ -1,43 +1,94 @@
-import random
-import string
+import itertools
 from typing import Any
 from app.types import Token
-from app.parser import Expr
-from app.interpreter import LoxRuntimeError
-
-characters = string.ascii_letters + string.digits
+from app.utils import LoxRuntimeError
 
 class Environment:
+	"""
+	Variables are stored by position in `slots`, in the order in which they are declared.
+
+	Locals of a resolved program are only ever accessed by position (see `declare`, `get_at`
+	and `assign_at`). Variables that are looked up by name (globals, or programs that were not
+	run through the Resolver) also get an entry in `names`, which is only created when needed.
+	"""
+	__slots__ = ("enclosing", "slots", "names")
+
 	enclosing: 'Environment | None'
-	values: dict[str, Any]
-	id: str
+	slots: list[Any]
+	names: dict[str, int] | None
 
-	def __init__(self, enclosing: 'Environment | None' = None, values: dict[str, Any] | None = None):
-		self.id = self._random_id()
+	def __init__(self, enclosing: 'Environment | None' = None, slots: list[Any] | None = None):
 		self.enclosing = enclosing
-		# We use .copy() to avoid multiple Environments sharing the same dictionary reference
-		self.values = {} if values is None else values.copy()
+		# The list is taken over, not copied (e.g. the arguments of a call become the parameters)
+		self.slots = [] if slots is None else slots
+		self.names = None
 
-	@staticmethod
-	def _random_id() -> str:
-		random_string = ''.join(random.choice(characters) for _ in range(10))
-		return random_string
+	def declare(self, value: Any) -> None:
+		"""Defines the next resolved local, in declaration order."""
+		self.slots.append(value)
 
 	def define(self, name: str, value: Any) -> Any:
-		self.values[name] = value
+		if self.names is None:
+			self.names = {}
+		slot = self.names.get(name)
+		if slot is None:
+			self.names[name] = len(self.slots)
+			self.slots.append(value)
+		else:
+			self.slots[slot] = value
 
 	def assign(self, name: Token, value: Any) -> Any:
-		if name.lexeme in self.values:
-			self.values[name.lexeme] = value
-			return
-		if self.enclosing is not None:
-			self.enclosing.assign(name, value)
-			return
+		environment = self
+		while environment is not None:
+			names = environment.names
+			if names is not None and name.lexeme in names:
+				environment.slots[names[name.lexeme]] = value
+				return
+			environment = environment.enclosing
 		raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
 
 	def get(self, name: Token):
-		if name.lexeme in self.values:
-			return self.values[name.lexeme]
-		if self.enclosing is not None:
-			return self.enclosing.get(name)
+		environment = self
+		while environment is not None:
+			names = environment.names
+			if names is not None and name.lexeme in names:
+				return environment.slots[names[name.lexeme]]
+			environment = environment.enclosing
 		raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+	# ----- Resolved access (see app/resolver.py) -----
+
+	def get_at(self, distance: int, slot: int) -> Any:
+		environment = self
+		for _ in range(distance):
+			environment = environment.enclosing
+		return environment.slots[slot]
+
+	def assign_at(self, distance: int, slot: int, value: Any) -> None:
+		environment = self
+		for _ in range(distance):
+			environment = environment.enclosing
+		environment.slots[slot] = value
+
+# Shared by all GlobalEnvironments, so that a version never identifies two different states
+_versions = itertools.count()
+
+class GlobalEnvironment(Environment):
+	"""
+	The outermost Environment. Its `version` changes whenever a global is defined or assigned,
+	so that a value read at a given version is known to be current as long as it has not changed
+	(see the inline caches on `Variable` nodes).
+	"""
+	__slots__ = ("version",)
+
+	def __init__(self):
+		super().__init__()
+		self.version = next(_versions)
+
+	def define(self, name: str, value: Any) -> Any:
+		Environment.define(self, name, value)
+		self.version = next(_versions)
+
+	def assign(self, name: Token, value: Any) -> Any:
+		Environment.assign(self, name, value)
+		self.version = next(_versions)
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod 
-from typing import Any
+from typing import Any, Callable
 from app.utils import pretty_print
 from app.types import Token
 
@@ -38,6 +38,9 @@ class Call(Expr):
     callee: Expr
     paren: Token
     arguments: list[Expr]
+    # Inline cache of the Interpreter: the declaration (a Function) of the last LoxFunction that
+    # passed the checks at this call site. Not the function itself, which would keep its closure alive
+    cached_declaration: Any = field(default=None, compare=False, repr=False)
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_call(self)
@@ -46,6 +49,8 @@ class Call(Expr):
 class Unary(Expr):
     operator: Token
     right: Expr
+    # Set by the Parser: the function implementing the operator (see app/operators.py)
+    apply: Callable[[Token, Any], Any] | None = field(default=None, compare=False, repr=False)
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_unary(self)
@@ -53,6 +58,14 @@ class Unary(Expr):
 @dataclass
 class Variable(Expr):
     name: Token
+    # Filled in by the Resolver: number of scopes between the use and the declaration,
+    # and the position of the variable within that scope. `None` means global.
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
+    # Inline cache of the Interpreter for globals: the value read at `GlobalEnvironment.version`,
+    # if it keeps nothing else alive (see `_is_cacheable`)
+    cached_version: int = field(default=-1, compare=False, repr=False)
+    cached_value: Any = field(default=None, compare=False, repr=False)
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_variable(self)
@@ -62,6 +75,8 @@ class Binary(Expr):
     left: Expr
     operator: Token
     right: Expr
+    # Set by the Parser: the function implementing the operator (see app/operators.py)
+    apply: Callable[[Token, Any, Any], Any] | None = field(default=None, compare=False, repr=False)
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_binary(self)
@@ -77,6 +92,9 @@ class Assign(Expr):
     """
     name: Token
     value: Expr
+    # See `Variable.depth` and `Variable.slot`
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
 
     def accept(self, visitor: 'ExprVisitor') -> Any:
         return visitor.visit_assign(self)
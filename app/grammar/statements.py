@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod 
 from typing import Any
 from app.types import Token
@@ -7,6 +7,9 @@ from app.grammar.expressions import Expr
 @dataclass
 class Stmt(ABC):
     """Base class for all statements"""
+    # Set by the Parser: the line of the first token of the statement (0 for synthesized statements)
+    line: int = field(default=0, kw_only=True, compare=False)
+
     @abstractmethod
     def accept(self, visitor: 'StmtVisitor') -> Any: ...
 
@@ -14,6 +17,8 @@ class Stmt(ABC):
 class Var(Stmt):
     name: Token
     initializer: Expr | None = None
+    # Filled in by the Resolver: whether the (local) variable is ever assigned after its declaration
+    reassigned: bool = field(default=False, compare=False)
 
     def accept(self, visitor: 'StmtVisitor') -> Any:
         return visitor.visit_var_stmt(self)
@@ -61,6 +66,8 @@ class Function(Stmt):
     name: Token
     params: list[Token]
     body: list[Stmt]
+    # Filled in by the PurityAnalyzer: the result only depends on the arguments (see app/purity.py)
+    pure: bool = field(default=False, compare=False)
     
     def accept(self, visitor: 'StmtVisitor') -> Any:
         return visitor.visit_function_stmt(self)
@@ -69,13 +76,11 @@ class Function(Stmt):
 class Return(Stmt, Exception):
     keyword: Token
     value: Expr | None
+    # Filled in by the Resolver: the value is a call whose result is returned as is (a tail call)
+    tail_call: bool = field(default=False, compare=False)
 
     def accept(self, visitor: 'StmtVisitor') -> Any:
-        # try:
         return visitor.visit_return_stmt(self)
-        # except ReturnException as return_value:
-        #     print(f"Catching return exception... value: {return_value.value}")
-        #     return return_value.value
 
 class StmtVisitor(ABC):
     """
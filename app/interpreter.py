@@ -1,41 +1,93 @@
+import math
 import time
-from typing import Any
+from collections import OrderedDict
+from typing import Any, Callable
 from abc import ABC, abstractmethod
-from app.types import TokenType, Token
-from app.utils import pretty_print, LoxRuntimeError, ReturnException
+from app.types import TokenType
+from app.utils import pretty_print, LoxRuntimeError, NativeError, TailCall
 from app.grammar.expressions import Assign, Call, Expr, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
 from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
-from app.environment import Environment
+from app.environment import Environment, GlobalEnvironment
+from app.output import Output
+from app.operators import is_truthy, check_number_operands
 
 class Interpreter(ExprVisitor, StmtVisitor):
-	def __init__(self):
-		self._globals: Environment = Environment()
+	"""
+	Tree-walking interpreter.
+
+	Executing a statement returns its completion: None when execution carries on with the next
+	statement, a 1-tuple holding the value of an executed `return`, or a TailCall. Blocks, `if`
+	and `while` pass a completion up as is, until it reaches LoxFunction.call.
+
+	With a `memo_capacity`, functions that the PurityAnalyzer found `pure` are memoized: the
+	results of the last `memo_capacity` distinct calls of each function are kept (see Memo).
+	"""
+	def __init__(self, resolved: bool = False, output: Output | None = None, memo_capacity: int | None = None):
+		self._globals: GlobalEnvironment = GlobalEnvironment()
+		self._output = output if output is not None else Output()
 		self._environment: Environment = self._globals
+		# When the program has been run through the Resolver, variables are accessed by their
+		# (depth, slot) address instead of being looked up by name along the environment chain.
+		self._resolved = resolved
+		self._memo_capacity = memo_capacity
+		# One Memo per pure function declaration, shared by all the closures it creates
+		self.memos: dict[int, Memo] = {}
+
+		# Type-keyed dispatch: a node is evaluated with one dict lookup and one call,
+		# instead of going through accept() and then the visit_ method
+		self._evaluators: dict[type, Callable[[Any], Any]] = {
+			Literal: self.visit_literal,
+			Variable: self.visit_variable,
+			Assign: self.visit_assign,
+			Binary: self.visit_binary,
+			Unary: self.visit_unary,
+			Logical: self.visit_logical,
+			Grouping: self.visit_grouping,
+			Call: self.visit_call,
+		}
+		self._executors: dict[type, Callable[[Any], Any]] = {
+			Expression: self.visit_expression_stmt,
+			Print: self.visit_print_stmt,
+			Var: self.visit_var_stmt,
+			Block: self.visit_block_stmt,
+			If: self.visit_if_stmt,
+			While: self.visit_while_stmt,
+			Function: self.visit_function_stmt,
+			Return: self.visit_return_stmt,
+		}
 
 		# We define native functions here
-		self._globals.define("clock", ClockCallable())
+		for name, native in NATIVES.items():
+			self._globals.define(name, native)
 
 	def interpret(self, statements: list[Stmt]) -> Any:
-		for statement in statements:
-			self.execute(statement)
+		try:
+			for statement in statements:
+				self.execute(statement)
+		finally:
+			self._output.flush()
 
 	# def interpret_expr(self, expr: Expr) -> None:
 	# 	value = self.evaluate(expr)
 	# 	print(self._stringify(value))
 
 	def evaluate(self, expr: Expr) -> Any:
-		return expr.accept(self)
+		return self._evaluators[expr.__class__](expr)
 	
-	def execute(self, stmt: Stmt) -> Any:
-		stmt.accept(self)
+	def execute(self, stmt: Stmt) -> tuple | TailCall | None:
+		return self._executors[stmt.__class__](stmt)
 
-	def execute_block(self, statements: list[Stmt], environment: Environment) -> Any:
+	def execute_block(self, statements: list[Stmt], environment: Environment) -> tuple | TailCall | None:
 		previous: Environment = self._environment
 
 		try:
 			self._environment = environment
+			executors = self._executors
 			for statement in statements:
-				self.execute(statement)
+				completion = executors[statement.__class__](statement)
+				if completion is not None:
+					return completion
+			return None
 		finally:
 			self._environment = previous
 			# if we add a "return" here, exceptions will not be further propagated;
@@ -48,70 +100,69 @@ class Interpreter(ExprVisitor, StmtVisitor):
 		else:
 			return pretty_print(value)
 	
-	@staticmethod
-	def _isTruthy(value: Any):
-		if value is None:
-			return False
-		if value == 'nil':
-			return False
-		if isinstance(value, bool):
-			return value
-		if value == 'true':
-			return True
-		if value == 'false':
-			return False
-		return True
-	
-	@staticmethod
-	def _checkNumberOperands(operator: Token, left: Any, right: Any):
-		if (
-			(isinstance(left, (int, float)) and not isinstance(left, bool)) and
-			(isinstance(right, (int, float)) and not isinstance(right, bool))
-		):
-			return
-		else:
-			raise LoxRuntimeError(operator, "Operands must be numbers.")
-	
+	_isTruthy = staticmethod(is_truthy)
+	_checkNumberOperands = staticmethod(check_number_operands)
+
 	# ----- Handles statements (StmtVisitor) -----
 
 	def visit_function_stmt(self, stmt: Function) -> Any:
-		function: LoxFunction = LoxFunction(stmt, self._environment)
-		self._environment.define(stmt.name.lexeme, function)
+		if stmt.pure and self._memo_capacity:
+			memo = self.memos.get(id(stmt))
+			if memo is None:
+				memo = self.memos[id(stmt)] = Memo(self._memo_capacity)
+			function: LoxFunction = MemoizedFunction(stmt, self._environment, memo)
+		else:
+			function = LoxFunction(stmt, self._environment)
+		self._define(stmt.name.lexeme, function)
 		return None
 
 	def visit_var_stmt(self, stmt: Var) -> Any:
 		value = None
 		if stmt.initializer is not None:
 			value = self.evaluate(stmt.initializer)
-		self._environment.define(stmt.name.lexeme, value)
+		self._define(stmt.name.lexeme, value)
 		return None
+
+	def _define(self, name: str, value: Any) -> None:
+		# Resolved locals are only accessed by position, so they don't need a name
+		if self._resolved and self._environment is not self._globals:
+			self._environment.declare(value)
+		else:
+			self._environment.define(name, value)
 	
 	def visit_expression_stmt(self, stmt: Expression) -> None:
 		self.evaluate(stmt.expression)
 	
 	def visit_print_stmt(self, stmt: Print) -> None:
 		value = self.evaluate(stmt.expression)
-		print(self._stringify(value))
+		self._output.write_line(self._stringify(value))
 
-	def visit_return_stmt(self, stmt: Return) -> Any:
-		value = self.evaluate(stmt.value) if stmt.value is not None else None
-		raise ReturnException(value)
+	def visit_return_stmt(self, stmt: Return) -> tuple | TailCall:
+		if stmt.tail_call:
+			function, arguments = self._evaluate_call(stmt.value)
+			if isinstance(function, LoxFunction):
+				return TailCall(function, arguments)
+			return (self._call_native(stmt.value, function, arguments),)
 
-	def visit_block_stmt(self, stmt: Block) -> None:
+		return (self.evaluate(stmt.value) if stmt.value is not None else None,)
+
+	def visit_block_stmt(self, stmt: Block) -> tuple | TailCall | None:
 		new_environment = Environment(self._environment)
-		self.execute_block(stmt.statements, new_environment)
+		return self.execute_block(stmt.statements, new_environment)
 
-	def visit_if_stmt(self, stmt: If) -> Any:
+	def visit_if_stmt(self, stmt: If) -> tuple | TailCall | None:
 		if self._isTruthy(self.evaluate(stmt.condition)):
-			self.execute(stmt.thenBranch)
+			return self.execute(stmt.thenBranch)
 		elif stmt.elseBranch is not None:
-			self.execute(stmt.elseBranch)
+			return self.execute(stmt.elseBranch)
 		else:
 			return None
 
-	def visit_while_stmt(self, stmt: While) -> Any:
+	def visit_while_stmt(self, stmt: While) -> tuple | TailCall | None:
 		while self._isTruthy(self.evaluate(stmt.condition)):
-			self.execute(stmt.body)
+			completion = self.execute(stmt.body)
+			if completion is not None:
+				return completion
 		return None
 
 	# ----- Handles expressions (ExprVisitor) -----
@@ -136,24 +187,40 @@ class Interpreter(ExprVisitor, StmtVisitor):
 		return self.evaluate(expr.expression)
 	
 	def visit_unary(self, expr: Unary) -> Any:
-		right = self.evaluate(expr.right)
+		right = expr.right
+		return expr.apply(expr.operator, self._evaluators[right.__class__](right))
 
-		match expr.operator.type:
-			case TokenType.MINUS:
-				# bool is a subclass of int in Python, hence the explicit exclusion
-				if isinstance(right, (int, float)) and not isinstance(right, bool):
-					return -(right)
-				else:
-					raise LoxRuntimeError(expr.operator, "Operand must be a number.")
-			case TokenType.BANG:
-				return not self._isTruthy(right)
-			case _:
-				return "nil"
-			
 	def visit_call(self, expr: Call) -> Any:
+		function, arguments = self._evaluate_call(expr)
+		try:
+			return function.call(self, arguments)
+		except RecursionError:
+			# Lox calls nest Python calls: the depth of Lox recursion is bounded by Python's stack
+			raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
+		except NativeError as error:
+			raise LoxRuntimeError(expr.paren, error.message) from None
+
+	def _call_native(self, expr: Call, function: 'LoxCallable', arguments: list) -> Any:
+		try:
+			return function.call(self, arguments)
+		except RecursionError: # A native, such as bench(), calling back into Lox
+			raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
+		except NativeError as error:
+			raise LoxRuntimeError(expr.paren, error.message) from None
+
+	def _evaluate_call(self, expr: Call) -> tuple['LoxCallable', list]:
+		"""
+		Evaluates the callee and the arguments of a call, and checks that the call can be made.
+		"""
 		callee = self.evaluate(expr.callee)
 		arguments = [self.evaluate(argument) for argument in expr.arguments]
 
+		# The number of arguments of a call site never changes, and the arity of a LoxFunction only
+		# depends on its declaration: any closure of a declaration that passed the checks here will
+		# pass them again, so they are skipped when the declaration of the callee is the cached one
+		if callee.__class__ is LoxFunction and callee.declaration is expr.cached_declaration:
+			return callee, arguments
+
 		if not isinstance(callee, LoxCallable):
 			raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
 		
@@ -165,57 +232,38 @@ class Interpreter(ExprVisitor, StmtVisitor):
 				f"Expected {function.arity()} arguments but got {len(arguments)}."
 				)
 
-		return function.call(self, arguments)
+		if function.__class__ is LoxFunction:
+			expr.cached_declaration = function.declaration
+		return function, arguments
 	
 	def visit_variable(self, expr: Variable) -> Any:
-		return self._environment.get(expr.name)
+		if not self._resolved:
+			return self._environment.get(expr.name)
+		if expr.depth is None:
+			globals_ = self._globals
+			if expr.cached_version == globals_.version:
+				return expr.cached_value
+			value = globals_.get(expr.name)
+			if value.__class__ in _PLAIN_VALUES or _is_cacheable(value, globals_):
+				expr.cached_version, expr.cached_value = globals_.version, value
+			else:
+				expr.cached_version, expr.cached_value = -1, None
+			return value
+		return self._environment.get_at(expr.depth, expr.slot)
 	
 	def visit_binary(self, expr: Binary) -> Any:
-		left = self.evaluate(expr.left)
-		right = self.evaluate(expr.right)
+		evaluators = self._evaluators
+		left, right = expr.left, expr.right
+		return expr.apply(expr.operator, evaluators[left.__class__](left), evaluators[right.__class__](right))
 
-		match expr.operator.type:
-			case TokenType.PLUS:
-				if isinstance(left, str) and isinstance(right, str):
-					return left + right
-				elif (
-					(isinstance(left, (int, float)) and not isinstance(left, bool)) and
-					(isinstance(right, (int, float)) and not isinstance(right, bool))
-				):
-					return left + right
-				else:
-					raise LoxRuntimeError(expr.operator, "Operands must be two numbers or two strings.")
-			case TokenType.MINUS:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left - right
-			case TokenType.STAR:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left * right
-			case TokenType.SLASH:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left / right
-			case TokenType.GREATER:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left > right
-			case TokenType.GREATER_EQUAL:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left >= right
-			case TokenType.LESS:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left < right
-			case TokenType.LESS_EQUAL:
-				self._checkNumberOperands(expr.operator, left, right)
-				return left <= right
-			case TokenType.BANG_EQUAL:
-				return left != right
-			case TokenType.EQUAL_EQUAL:
-				return left == right
-			case _:
-				return None
-			
 	def visit_assign(self, expr: Assign) -> Any:
 		value = self.evaluate(expr.value)
-		self._environment.assign(expr.name, value)
+		if not self._resolved:
+			self._environment.assign(expr.name, value)
+		elif expr.depth is None:
+			self._globals.assign(expr.name, value)
+		else:
+			self._environment.assign_at(expr.depth, expr.slot, value)
 		return value
 
 
@@ -241,18 +289,28 @@ class LoxFunction(LoxCallable):
 		self.declaration = declaration
 
 	def call(self, interpreter: Interpreter, arguments: list) -> Any:
-		environment = Environment(self.closure)
+		# Trampoline: the body of the current function completes with a TailCall, which is then
+		# made from here, so tail recursion runs in constant Python stack
+		function = self
+		while True:
+			completion = interpreter.execute_block(function.declaration.body, function._bind(interpreter, arguments))
+			if completion is None:
+				return None
+			if completion.__class__ is TailCall:
+				function, arguments = completion.function, completion.arguments
+				continue
+			return completion[0]
 
+	def _bind(self, interpreter: Interpreter, arguments: list) -> Environment:
+		if interpreter._resolved:
+			# Parameters are the first slots of the function scope
+			return Environment(self.closure, arguments)
+
+		environment = Environment(self.closure)
 		for i in range(len(self.declaration.params)):
 			param = self.declaration.params[i]
 			environment.define(param.lexeme, arguments[i])
-
-		try:
-			interpreter.execute_block(self.declaration.body, environment)
-		except ReturnException as return_value:
-			return return_value.value
-			
-		return None
+		return environment
 
 	def arity(self) -> int:
 		return len(self.declaration.params)
@@ -260,17 +318,153 @@ class LoxFunction(LoxCallable):
 	def __str__(self) -> str:
 		return f"<fn {self.declaration.name.lexeme}>"
 
+class Memo:
+	"""
+	Bounded cache of the results of a pure function, by arguments, that evicts the least
+	recently used result once it holds `capacity` of them.
+	"""
+	def __init__(self, capacity: int):
+		self.capacity = capacity
+		self.hits = 0
+		self.misses = 0
+		self._results: OrderedDict[tuple, Any] = OrderedDict()
+
+	def get(self, key: tuple, default: Any) -> Any:
+		result = self._results.get(key, default)
+		if result is default:
+			self.misses += 1
+		else:
+			self.hits += 1
+			self._results.move_to_end(key)
+		return result
+
+	def put(self, key: tuple, result: Any) -> None:
+		self._results[key] = result
+		if len(self._results) > self.capacity:
+			self._results.popitem(last=False)
+
+_MISSING = object()
+
+class MemoizedFunction(LoxFunction):
+	"""
+	A pure function whose results are kept in a Memo. Only calls whose arguments are all numbers
+	or strings are memoized: their values can be compared without mixing up Lox types (in Python,
+	`true == 1`). Calls with a zero argument are not either, since `-0 == 0` although they differ.
+	A call that fails is not remembered, and fails again when it is made again.
+	Tail calls to the function are made by the trampoline of the caller, without the Memo.
+	"""
+	def __init__(self, declaration: Function, closure: Environment, memo: Memo):
+		super().__init__(declaration, closure)
+		self.memo = memo
+
+	def call(self, interpreter: Interpreter, arguments: list) -> Any:
+		for argument in arguments:
+			if argument.__class__ is not float and argument.__class__ is not str or argument == 0.0:
+				return LoxFunction.call(self, interpreter, arguments)
+
+		# Made before the call, which takes over the list of arguments
+		key = tuple(arguments)
+		result = self.memo.get(key, _MISSING)
+		if result is _MISSING:
+			result = LoxFunction.call(self, interpreter, arguments)
+			self.memo.put(key, result)
+		return result
+
+# Values that the inline cache of a Variable node can always keep (see _is_cacheable)
+_PLAIN_VALUES = frozenset([float, bool, str, type(None)])
+
+def _is_cacheable(value: Any, globals_: GlobalEnvironment) -> bool:
+	"""
+	Whether a global value can be kept in the inline cache of a Variable node, which lives as long
+	as the syntax tree: only values that keep nothing else alive. Plain strs are either literals,
+	already held by the tree, or shorter than ROPE_THRESHOLD; functions declared at the top level
+	only hold the global environment, which lives as long anyway. Ropes and other closures are
+	not cached, so that they are freed once the script drops them.
+	"""
+	if value.__class__ in _PLAIN_VALUES:
+		return True
+	if isinstance(value, LoxFunction):
+		return value.closure is globals_
+	return isinstance(value, LoxCallable) # Natives
+
 # ------------ Native functions and methods ---------------
 
 class ClockCallable(LoxCallable):
 	@staticmethod
 	def arity() -> int:
 		return 0
-	
+
 	@staticmethod
 	def call(interpreter: Interpreter, arguments: list) -> int:
 		return int(time.time())
-	
+
+	@staticmethod
+	def __str__() -> str:
+		return "<native fn>"
+
+# Origin of `clock_ns`, so that its values stay small enough to be exact as Lox numbers (floats)
+_CLOCK_NS_ORIGIN = time.perf_counter_ns()
+
+class ClockNsCallable(LoxCallable):
+	"""Monotonic time in nanoseconds, since an arbitrary point: only differences are meaningful."""
+	@staticmethod
+	def arity() -> int:
+		return 0
+
+	@staticmethod
+	def call(interpreter: Interpreter, arguments: list) -> float:
+		return float(time.perf_counter_ns() - _CLOCK_NS_ORIGIN)
+
+	@staticmethod
+	def __str__() -> str:
+		return "<native fn>"
+
+class CpuTimeCallable(LoxCallable):
+	"""CPU time of the process, in seconds (user and system, excluding time spent sleeping)."""
+	@staticmethod
+	def arity() -> int:
+		return 0
+
+	@staticmethod
+	def call(interpreter: Interpreter, arguments: list) -> float:
+		return time.process_time()
+
+	@staticmethod
+	def __str__() -> str:
+		return "<native fn>"
+
+class BenchCallable(LoxCallable):
+	"""
+	`bench(fn, iterations)` calls `fn` (with no arguments) `iterations` times in a row and returns
+	the mean time of a call in nanoseconds. The calls are timed as a whole, so that the only
+	overhead is the loop making them.
+	"""
+	@staticmethod
+	def arity() -> int:
+		return 2
+
+	@staticmethod
+	def call(interpreter: Interpreter, arguments: list) -> float:
+		function, iterations = arguments
+		if not isinstance(function, LoxCallable) or function.arity() != 0:
+			raise NativeError("bench() expects a function without parameters.")
+		if iterations.__class__ not in (int, float) or not math.isfinite(iterations) or iterations < 1 or iterations != int(iterations):
+			raise NativeError("bench() expects a positive whole number of iterations.")
+
+		call = function.call
+		start = time.perf_counter_ns()
+		for _ in range(int(iterations)):
+			call(interpreter, []) # A new list each time: calls take over their list of arguments
+		return (time.perf_counter_ns() - start) / iterations
+
 	@staticmethod
 	def __str__() -> str:
-		return "<native fn>"
\ No newline at end of file
+		return "<native fn>"
+
+# Globals defined by every execution engine
+NATIVES: dict[str, LoxCallable] = {
+	"clock": ClockCallable(),
+	"clock_ns": ClockNsCallable(),
+	"cpu_time": CpuTimeCallable(),
+	"bench": BenchCallable(),
+}
@@ -1,61 +1,350 @@
 import sys
-from app.grammar.expressions import Expr
-from app.grammar.statements import Stmt
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, ContextManager, Iterable, TextIO
 from app.utils import pretty_print, LoxRuntimeError
 from app.scanner import Scanner
-from app.parser import Parser, ParseError
-from app.ast_printer import AstPrinter
-from app.interpreter import Interpreter
+
+# The other modules are imported by the commands and engines that need them, so that e.g. `run`
+# does not load the compiled engines, nor `tokenize` the parser (see bench/startup.py)
+if TYPE_CHECKING:
+    from app.cache import ProgramCache
+    from app.grammar.expressions import Expr
+    from app.grammar.statements import Stmt
+    from app.stats import RuntimeStats
+
+ENGINES = ["tree", "closure", "vm", "python"]
+# The options that each command accepts: any other one is rejected
+OPTIONS = {
+    "tokenize": [],
+    "parse": [],
+    "evaluate": ["stats"],
+    "interpret": [],
+    "run": ["engine", "stream", "cache", "max-depth", "memoize", "stats"],
+    "transpile": ["cache"],
+    "profile": ["cache", "top", "output"],
+    "batch": ["engine", "max-depth", "workers", "report"],
+    "serve": ["socket", "max-children", "timeout"],
+    "client": ["socket", "engine", "max-depth"],
+}
+MEMO_CAPACITY = 1024
+
+def parse_arguments(argv: list[str]) -> tuple[list[str], dict[str, str]]:
+    """
+    Splits the command line into positional arguments and `--name=value` options.
+    """
+    positional: list[str] = []
+    options: dict[str, str] = {}
+    for arg in argv:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            positional.append(arg)
+    return positional, options
+
+def timed(stats: 'RuntimeStats | None', phase: str) -> ContextManager:
+    """
+    Times a phase of the run into `stats`, if statistics are collected.
+    """
+    return stats.phase(phase) if stats is not None else nullcontext()
+
+def create_engine(engine: str, max_depth: int | None = None, stats: 'RuntimeStats | None' = None, memo_capacity: int | None = None) -> Callable[[list['Stmt']], None]:
+    """
+    Returns a function that runs parsed and resolved statements on the selected execution engine.
+    It can be called several times with consecutive parts of a program: globals are kept in between.
+    `max_depth` bounds Lox recursion on the `vm` engine, which keeps its own call stack (FRAMES_MAX
+    calls by default); the other engines are bounded by Python's stack. With `stats`, the `tree` engine also counts what it does,
+    and with `memo_capacity`, it memoizes pure functions.
+    """
+    match engine:
+        case "tree":
+            if stats is not None:
+                from app.stats import StatsInterpreter
+                return StatsInterpreter(stats, resolved=True, memo_capacity=memo_capacity).interpret
+            from app.interpreter import Interpreter
+            return Interpreter(resolved=True, memo_capacity=memo_capacity).interpret
+        case "closure":
+            from app.closure_compiler import ClosureInterpreter
+            return ClosureInterpreter().interpret
+        case "vm":
+            from app.vm.compiler import Compiler
+            from app.vm.machine import VM
+            vm = VM(max_depth=max_depth) if max_depth is not None else VM()
+            return lambda statements: vm.interpret(Compiler.compile(statements))
+        case "python":
+            from app.transpiler import Transpiler, PythonEngine
+            python_engine, transpiler = PythonEngine(), Transpiler()
+            return lambda statements: python_engine.interpret(transpiler.transpile(statements))
+
+def compile_program(file_contents: str | Iterable[str], cache: 'ProgramCache | None' = None, stats: 'RuntimeStats | None' = None, analyze_purity: bool = False) -> list['Stmt']:
+    """
+    Scans, parses, resolves and optimizes a program, or loads it from the cache if it was compiled before.
+    The source is either a str or an iterable of chunks of it, such as a MappedSource.
+    With `stats`, each phase is timed and the tokens and nodes of the program are counted.
+    With `analyze_purity` (for `--memoize`), the functions whose calls can be memoized are marked pure.
+    """
+    from app.parser import Parser
+    from app.resolver import Resolver
+    from app.optimizer import Optimizer
+
+    if cache is not None:
+        with timed(stats, "cache load"):
+            statements = cache.load(file_contents)
+        if statements is not None:
+            return mark_pure_functions(statements, stats) if analyze_purity else statements
+
+    with timed(stats, "scan"):
+        tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
+    with timed(stats, "parse"):
+        statements: list[Stmt] = Parser(tokens).parse()
+    if stats is not None:
+        from app.stats import count_nodes
+        stats.tokens, stats.nodes = len(tokens), count_nodes(statements)
+    with timed(stats, "resolve"):
+        Resolver().resolve(statements)
+        statements = Optimizer().optimize(statements)
+
+    if cache is not None:
+        cache.store(file_contents, statements)
+    return mark_pure_functions(statements, stats) if analyze_purity else statements
+
+def mark_pure_functions(statements: list['Stmt'], stats: 'RuntimeStats | None' = None) -> list['Stmt']:
+    """
+    Runs the PurityAnalyzer, only for memoized runs. It runs after the cache, so that cached
+    programs do not depend on whether they were compiled with `--memoize`.
+    """
+    from app.purity import PurityAnalyzer
+
+    with timed(stats, "purity"):
+        return PurityAnalyzer().analyze(statements)
+
+def execute(statements: list['Stmt'], engine: str, max_depth: int | None = None, stats: 'RuntimeStats | None' = None, memo_capacity: int | None = None) -> None:
+    """
+    Runs a parsed and resolved program on the selected execution engine.
+    """
+    run = create_engine(engine, max_depth, stats, memo_capacity)
+    with timed(stats, "execute"):
+        run(statements)
+
+def stream(file: TextIO, engine: str, max_depth: int | None = None) -> None:
+    """
+    Runs a program one top-level declaration at a time: each is executed as soon as it has been
+    parsed, while the rest of the file has not been read yet. Neither the tokens nor the
+    statements of the whole program are ever held in memory. As without streaming, nothing
+    runs after a scanning error has been reported: the run stops with exit code 65.
+    """
+    from app.parser import Parser
+    from app.resolver import Resolver
+    from app.optimizer import Optimizer
+
+    run = create_engine(engine, max_depth)
+    resolver, optimizer = Resolver(), Optimizer()
+    scanner = Scanner(file)
+    for statement in Parser(scanner.tokens()).declarations():
+        if scanner.scan_errors:
+            exit(65)
+        run(optimizer.optimize(resolver.resolve([statement])))
+
+def profile(file_contents: str, filename: str, cache: 'ProgramCache | None', top: int, output: str | None) -> None:
+    """
+    Runs a program on the ProfilingInterpreter and prints its profile to stderr, also when the
+    program fails at run time. With `output`, the timings are also saved in the `pstats` format.
+    """
+    from app.profiler import Profile, ProfilingInterpreter
+
+    statements = compile_program(file_contents, cache)
+    program_profile = Profile(filename)
+    try:
+        ProfilingInterpreter(program_profile).interpret(statements)
+    finally:
+        program_profile.report(file_contents, top, sys.stderr)
+        if output is not None:
+            program_profile.dump_stats(output)
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: ./your_program.sh <tokenize | parse | run> <filename>", file=sys.stderr)
+    positional, options = parse_arguments(sys.argv[1:])
+
+    if len(positional) < 2 and positional[:1] != ["serve"]:
+        print("Usage: ./your_program.sh <tokenize | parse | run | transpile | profile> [--engine=tree|closure|vm|python] [--stream | --cache] [--max-depth=N] [--memoize[=N]] [--stats] [--top=N] [--output=FILE] <filename>\n       ./your_program.sh batch [--engine=tree|closure|vm|python] [--max-depth=N] [--workers=N] [--report=FILE] <file or directory>...\n       ./your_program.sh serve [--socket=PATH] [--max-children=N] [--timeout=SECONDS]\n       ./your_program.sh client [--socket=PATH] [--engine=tree|closure|vm|python] [--max-depth=N] <filename>", file=sys.stderr)
         exit(64)
 
-    command = sys.argv[1]
-    filename = sys.argv[2]
+    command = positional[0]
+    filename = positional[1] if len(positional) > 1 else None
 
-    if command not in ["tokenize", "parse", "evaluate", "interpret", "run"]:
+    if command not in OPTIONS:
         print(f"Unknown command: {command}", file=sys.stderr)
         exit(64)
 
-    with open(filename) as file:
-        file_contents = file.read()
-
-    match command:
-        case "tokenize":
-            Scanner(file_contents, print_to_stdout=True).tokenize()
-        case "parse":
-            try:
-                tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
-                parser = Parser(tokens)
-                ast: Expr = parser.parse_expr()
-                if ast is not None:
-                    print(AstPrinter().print(ast))
-            except (ParseError):
-                exit(65)
-        case "evaluate": # Only for single-line expressions (no statements)
-            try:
-                tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
-                parser = Parser(tokens)
-                ast: Expr = parser.parse_expr()
-                print(pretty_print(Interpreter().evaluate(ast)))
-            except LoxRuntimeError as error:
-                print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
-                exit(70)
-            except ParseError:
-                exit(65)
-        case "run":
-            try:
-                tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
-                statements: list[Stmt] = Parser(tokens).parse()
-                # print(statements)
-                Interpreter().interpret(statements)
-            except LoxRuntimeError as error:
-                print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
-                exit(70)
-            except ParseError:
-                exit(65)
+    for name in options:
+        if name not in OPTIONS[command]:
+            print(f"Unknown option for {command}: --{name}", file=sys.stderr)
+            exit(64)
+
+    engine = options.get("engine", "tree")
+    if engine not in ENGINES:
+        print(f"Unknown engine: {engine}", file=sys.stderr)
+        exit(64)
+
+    if not options.get("max-depth", "0").isdigit():
+        print(f"Invalid maximum depth: {options['max-depth']}", file=sys.stderr)
+        exit(64)
+    max_depth = int(options["max-depth"]) if "max-depth" in options else None
+    # The other engines are bounded by Python's stack, not by a depth of their own
+    if max_depth is not None and engine != "vm":
+        print("--max-depth is only supported by the vm engine", file=sys.stderr)
+        exit(64)
+
+    if not options.get("top", "20").isdigit():
+        print(f"Invalid number of entries: {options['top']}", file=sys.stderr)
+        exit(64)
+    top = int(options.get("top", 20))
+
+    streaming = command == "run" and "stream" in options
+    stats = None
+    if "stats" in options:
+        from app.stats import RuntimeStats
+        stats = RuntimeStats()
+    if streaming and stats is not None:
+        print("--stats cannot be combined with --stream", file=sys.stderr)
+        exit(64)
+
+    memo_capacity = None
+    if "memoize" in options:
+        if not (options["memoize"] or str(MEMO_CAPACITY)).isdigit():
+            print(f"Invalid memoization capacity: {options['memoize']}", file=sys.stderr)
+            exit(64)
+        # Purity needs the whole program, and only the tree engine memoizes
+        if streaming or engine != "tree":
+            print("--memoize is only supported by the tree engine, without --stream", file=sys.stderr)
+            exit(64)
+        memo_capacity = int(options["memoize"] or MEMO_CAPACITY)
+
+    # The cache stores whole compiled programs, which streaming never has
+    if "cache" in options and streaming:
+        print("--cache cannot be combined with --stream", file=sys.stderr)
+        exit(64)
+
+    if command == "batch":
+        if not options.get("workers", "1").isdigit() or options.get("workers") == "0":
+            print(f"Invalid number of workers: {options['workers']}", file=sys.stderr)
+            exit(64)
+        workers = int(options["workers"]) if "workers" in options else None
+        from app.batch import run_batch # Imports app.main itself
+        if "report" in options:
+            with open(options["report"], "w") as report:
+                exit(run_batch(positional[1:], engine, max_depth, workers, report))
+        exit(run_batch(positional[1:], engine, max_depth, workers))
+
+    if command in ["serve", "client"]:
+        from app.protocol import default_socket_path
+        socket_path = options.get("socket") or default_socket_path()
+
+    if command == "serve":
+        for option, default in [("max-children", "40"), ("timeout", "0")]:
+            if not options.get(option, default).isdigit():
+                print(f"Invalid value for --{option}: {options[option]}", file=sys.stderr)
+                exit(64)
+        from app.server import serve # Imports app.main itself
+        try:
+            serve(socket_path, set(ENGINES), max(1, int(options.get("max-children", 40))), int(options.get("timeout", 0)))
+        except OSError as error:
+            print(error, file=sys.stderr)
+            exit(69)
+        exit()
+
+    if command == "client":
+        from app.client import run_remote
+        with open(filename) as file:
+            exit(run_remote(file.read(), socket_path, engine, max_depth))
+
+    cache = None
+    if "cache" in options:
+        from app.cache import ProgramCache
+        cache = ProgramCache.for_script(filename)
+    source = None
+    if command == "profile": # The report quotes the lines of the source
+        with open(filename) as file:
+            file_contents = file.read()
+    elif not streaming:
+        # Mapped rather than read, so that a large source is never held in memory as a whole
+        from app.source import MappedSource
+        file_contents = source = MappedSource(filename)
+
+    try:
+        match command:
+            case "tokenize":
+                Scanner(file_contents, print_to_stdout=True).tokenize()
+            case "parse":
+                from app.parser import Parser, ParseError
+                from app.ast_printer import AstPrinter
+                try:
+                    tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
+                    parser = Parser(tokens)
+                    ast: Expr = parser.parse_expr()
+                    if ast is not None:
+                        print(AstPrinter().print(ast))
+                except (ParseError):
+                    exit(65)
+            case "evaluate": # Only for single-line expressions (no statements)
+                from app.parser import Parser, ParseError
+                from app.interpreter import Interpreter
+                try:
+                    with timed(stats, "scan"):
+                        tokens = Scanner(file_contents, print_to_stdout=False).tokenize()
+                    with timed(stats, "parse"):
+                        parser = Parser(tokens)
+                        ast: Expr = parser.parse_expr()
+                    if stats is not None:
+                        from app.stats import StatsInterpreter, count_nodes
+                        stats.tokens, stats.nodes = len(tokens), count_nodes([ast])
+                    interpreter = StatsInterpreter(stats) if stats is not None else Interpreter()
+                    with timed(stats, "execute"):
+                        value = interpreter.evaluate(ast)
+                    print(pretty_print(value))
+                except LoxRuntimeError as error:
+                    print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
+                    exit(70)
+                except ParseError:
+                    exit(65)
+                finally:
+                    if stats is not None:
+                        stats.report(sys.stderr)
+            case "run":
+                from app.parser import ParseError
+                try:
+                    if streaming:
+                        with open(filename) as file:
+                            stream(file, engine, max_depth)
+                    else:
+                        execute(compile_program(file_contents, cache, stats, memo_capacity is not None), engine, max_depth, stats, memo_capacity)
+                except LoxRuntimeError as error:
+                    print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
+                    exit(70)
+                except ParseError:
+                    exit(65)
+                finally:
+                    if stats is not None:
+                        stats.report(sys.stderr)
+            case "profile":
+                from app.parser import ParseError
+                try:
+                    profile(file_contents, filename, cache, top, options.get("output"))
+                except LoxRuntimeError as error:
+                    print(f"{error.message}\n[line {error.token.line}]", file=sys.stderr)
+                    exit(70)
+                except ParseError:
+                    exit(65)
+            case "transpile":
+                from app.parser import ParseError
+                from app.transpiler import Transpiler
+                try:
+                    statements = compile_program(file_contents, cache)
+                    print(Transpiler().transpile(statements).source, end="")
+                except ParseError:
+                    exit(65)
+    finally:
+        if source is not None:
+            source.close()
 
     exit()
 
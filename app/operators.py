@@ -0,0 +1,110 @@
+from typing import Any, Callable
+from app.types import Token, TokenType
+from app.utils import LoxRuntimeError
+from app.rope import Rope, ROPE_THRESHOLD
+
+# One function per Lox operator, chosen once by the Parser and stored on the node (see `Binary.apply`
+# and `Unary.apply`), so that evaluating an operator is a single call with no dispatch on its type.
+# Each has the fast path for floats first and reports errors with the operator token.
+
+BinaryFunction = Callable[[Token, Any, Any], Any]
+UnaryFunction = Callable[[Token, Any], Any]
+
+def is_truthy(value: Any) -> bool:
+	if value is None:
+		return False
+	if value == 'nil':
+		return False
+	if isinstance(value, bool):
+		return value
+	if value == 'true':
+		return True
+	if value == 'false':
+		return False
+	return True
+
+def is_number(value: Any) -> bool:
+	# bool is a subclass of int in Python, hence the explicit exclusion
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def check_number_operands(operator: Token, left: Any, right: Any) -> None:
+	if not (is_number(left) and is_number(right)):
+		raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+def add(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is float and right.__class__ is float:
+		return left + right
+	if left.__class__ is str and right.__class__ is str and len(left) + len(right) < ROPE_THRESHOLD:
+		return left + right
+	if isinstance(left, (str, Rope)) and isinstance(right, (str, Rope)):
+		return Rope.concat(left, right)
+	if is_number(left) and is_number(right):
+		return left + right
+	raise LoxRuntimeError(operator, "Operands must be two numbers or two strings.")
+
+def subtract(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left - right
+
+def multiply(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left * right
+
+def divide(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left / right
+
+def greater(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left > right
+
+def greater_equal(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left >= right
+
+def less(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left < right
+
+def less_equal(operator: Token, left: Any, right: Any) -> Any:
+	if left.__class__ is not float or right.__class__ is not float:
+		check_number_operands(operator, left, right)
+	return left <= right
+
+def equal(operator: Token, left: Any, right: Any) -> Any:
+	return left == right
+
+def not_equal(operator: Token, left: Any, right: Any) -> Any:
+	return left != right
+
+def negate(operator: Token, right: Any) -> Any:
+	if right.__class__ is float or is_number(right):
+		return -right
+	raise LoxRuntimeError(operator, "Operand must be a number.")
+
+def not_(operator: Token, right: Any) -> Any:
+	return not is_truthy(right)
+
+BINARY_OPERATORS: dict[TokenType, BinaryFunction] = {
+	TokenType.PLUS: add,
+	TokenType.MINUS: subtract,
+	TokenType.STAR: multiply,
+	TokenType.SLASH: divide,
+	TokenType.GREATER: greater,
+	TokenType.GREATER_EQUAL: greater_equal,
+	TokenType.LESS: less,
+	TokenType.LESS_EQUAL: less_equal,
+	TokenType.EQUAL_EQUAL: equal,
+	TokenType.BANG_EQUAL: not_equal,
+}
+
+UNARY_OPERATORS: dict[TokenType, UnaryFunction] = {
+	TokenType.MINUS: negate,
+	TokenType.BANG: not_,
+}
@@ -0,0 +1,154 @@
+from app.utils import LoxRuntimeError
+from app.types import TokenType
+from app.grammar.expressions import Assign, Call, Expr, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+from app.interpreter import Interpreter
+from app.rope import Rope
+
+_isTruthy = Interpreter._isTruthy
+
+class Optimizer(ExprVisitor, StmtVisitor):
+	"""
+	AST-to-AST pass that runs between the Resolver and the execution engines:
+
+	- folds operators whose operands are all literals (arithmetic, comparisons, string concatenation),
+	- strips `Grouping` nodes,
+	- replaces reads of local variables that are never reassigned and are initialized with a
+	  literal by that literal,
+	- drops `if` branches and `while` loops whose condition is a literal that selects against them.
+
+	Folding evaluates the operator with the Interpreter itself, so the results are exactly those
+	of run time. An operation that fails (e.g. `-"str"` or `1 / 0`) is left alone and still fails
+	when, and only if, it is executed. Declarations are never removed: the slots the Resolver
+	assigned stay valid, and resolve-time errors in dead code have already been reported.
+	"""
+	def __init__(self):
+		self._evaluator = Interpreter()
+		# Mirrors the Resolver's scopes: the value of each slot, if it is a known constant
+		self._scopes: list[list[Literal | None]] = []
+
+	def optimize(self, statements: list[Stmt]) -> list[Stmt]:
+		return self._optimize_body(statements)
+
+	def _optimize_body(self, statements: list[Stmt]) -> list[Stmt]:
+		optimized = (statement.accept(self) for statement in statements)
+		return [statement for statement in optimized if statement is not None]
+
+	def _optimize_branch(self, stmt: Stmt) -> Stmt:
+		"""For places where a statement is required: a removed statement becomes an empty block."""
+		optimized = stmt.accept(self)
+		return optimized if optimized is not None else Block([])
+
+	def _fold(self, expr: Expr) -> Expr:
+		try:
+			value = self._evaluator.evaluate(expr)
+		except (LoxRuntimeError, ArithmeticError):
+			return expr
+		# Literals hold plain strs, which every engine handles
+		return Literal(str(value) if value.__class__ is Rope else value)
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_block_stmt(self, stmt: Block) -> Stmt | None:
+		self._scopes.append([])
+		stmt.statements = self._optimize_body(stmt.statements)
+		self._scopes.pop()
+		return stmt
+
+	def visit_var_stmt(self, stmt: Var) -> Stmt | None:
+		if stmt.initializer is not None:
+			stmt.initializer = stmt.initializer.accept(self)
+		if self._scopes:
+			constant = None
+			if not stmt.reassigned:
+				if stmt.initializer is None:
+					constant = Literal(None)
+				elif isinstance(stmt.initializer, Literal):
+					constant = stmt.initializer
+			self._scopes[-1].append(constant)
+		return stmt
+
+	def visit_function_stmt(self, stmt: Function) -> Stmt | None:
+		if self._scopes:
+			self._scopes[-1].append(None)
+		self._scopes.append([None] * len(stmt.params))
+		stmt.body = self._optimize_body(stmt.body)
+		self._scopes.pop()
+		return stmt
+
+	def visit_expression_stmt(self, stmt: Expression) -> Stmt | None:
+		stmt.expression = stmt.expression.accept(self)
+		# A literal has no effect (unlike a variable: reading an undefined global is an error)
+		return stmt if not isinstance(stmt.expression, Literal) else None
+
+	def visit_if_stmt(self, stmt: If) -> Stmt | None:
+		stmt.condition = stmt.condition.accept(self)
+		if isinstance(stmt.condition, Literal):
+			if _isTruthy(stmt.condition.value):
+				return stmt.thenBranch.accept(self)
+			return stmt.elseBranch.accept(self) if stmt.elseBranch is not None else None
+
+		stmt.thenBranch = self._optimize_branch(stmt.thenBranch)
+		if stmt.elseBranch is not None:
+			stmt.elseBranch = stmt.elseBranch.accept(self)
+		return stmt
+
+	def visit_print_stmt(self, stmt: Print) -> Stmt | None:
+		stmt.expression = stmt.expression.accept(self)
+		return stmt
+
+	def visit_return_stmt(self, stmt: Return) -> Stmt | None:
+		if stmt.value is not None:
+			stmt.value = stmt.value.accept(self)
+		return stmt
+
+	def visit_while_stmt(self, stmt: While) -> Stmt | None:
+		stmt.condition = stmt.condition.accept(self)
+		if isinstance(stmt.condition, Literal) and not _isTruthy(stmt.condition.value):
+			return None
+		stmt.body = self._optimize_branch(stmt.body)
+		return stmt
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_literal(self, expr: Literal) -> Expr:
+		return expr
+
+	def visit_grouping(self, expr: Grouping) -> Expr:
+		return expr.expression.accept(self)
+
+	def visit_variable(self, expr: Variable) -> Expr:
+		if expr.depth is None:
+			return expr
+		constant = self._scopes[-1 - expr.depth][expr.slot]
+		return Literal(constant.value) if constant is not None else expr
+
+	def visit_assign(self, expr: Assign) -> Expr:
+		expr.value = expr.value.accept(self)
+		return expr
+
+	def visit_unary(self, expr: Unary) -> Expr:
+		expr.right = expr.right.accept(self)
+		if isinstance(expr.right, Literal):
+			return self._fold(expr)
+		return expr
+
+	def visit_binary(self, expr: Binary) -> Expr:
+		expr.left = expr.left.accept(self)
+		expr.right = expr.right.accept(self)
+		if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+			return self._fold(expr)
+		return expr
+
+	def visit_logical(self, expr: Logical) -> Expr:
+		expr.left = expr.left.accept(self)
+		expr.right = expr.right.accept(self)
+		if isinstance(expr.left, Literal):
+			left_is_result = _isTruthy(expr.left.value) == (expr.operator.type == TokenType.OR)
+			return expr.left if left_is_result else expr.right
+		return expr
+
+	def visit_call(self, expr: Call) -> Expr:
+		expr.callee = expr.callee.accept(self)
+		expr.arguments = [argument.accept(self) for argument in expr.arguments]
+		return expr
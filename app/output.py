@@ -0,0 +1,36 @@
+import sys
+from typing import Any, TextIO
+
+BUFFER_SIZE = 64 * 1024
+
+class Output:
+	"""
+	Buffer for the output of Lox `print` statements, owned by the execution engine.
+
+	Lines are accumulated and written in one go once `buffer_size` characters are pending, instead
+	of one write (and, with PYTHONUNBUFFERED or a TTY, one flush) per `print`. When the stream is a
+	TTY, every line is flushed right away, so that interactive output is not delayed.
+	Engines flush when they finish or fail, before main reports the error on stderr.
+	"""
+	def __init__(self, stream: TextIO | None = None, buffer_size: int = BUFFER_SIZE, line_buffered: bool | None = None):
+		self._stream = stream if stream is not None else sys.stdout
+		self.buffer_size = buffer_size
+		self.line_buffered = self._stream.isatty() if line_buffered is None else line_buffered
+		self._lines: list[str] = []
+		self._pending = 0
+
+	def write_line(self, text: Any) -> None:
+		if text.__class__ is not str:
+			text = str(text)
+		self._lines.append(text)
+		self._pending += len(text) + 1
+		if self._pending >= self.buffer_size or self.line_buffered:
+			self.flush()
+
+	def flush(self) -> None:
+		if self._lines:
+			self._lines.append("")
+			self._stream.write("\n".join(self._lines))
+			self._lines.clear()
+			self._pending = 0
+		self._stream.flush()
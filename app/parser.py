@@ -1,19 +1,29 @@
 import sys
+from typing import Iterable, Iterator
 from app.types import TokenType, Token
 from app.grammar.expressions import Expr, Grouping, Binary, Unary, Literal, Variable, Assign, Logical, Call
 from app.grammar.statements import Stmt, Print, Expression, Var, Block, If, While, Function, Return
+from app.operators import BINARY_OPERATORS, UNARY_OPERATORS
 
 class Parser:
-    current: int = 0
-
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens = tokens
+    """
+    Recursive descent parser. Tokens are pulled one at a time from `tokens` (a list or a lazy
+    stream such as `Scanner.tokens()`): only the current and the previous token are kept.
+    """
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        self.tokens: Iterator[Token] = iter(tokens)
+        self._current_token: Token = next(self.tokens)
+        self._previous_token: Token | None = None
 
     def parse(self) -> list[Stmt]:
-        declarations: list[Stmt] = []
+        return list(self.declarations())
+
+    def declarations(self) -> Iterator[Stmt]:
+        """
+        Yields the top-level declarations one by one, as soon as each has been parsed.
+        """
         while not self._isAtEnd():
-            declarations.append(self.declaration())
-        return declarations
+            yield self.declaration()
     
     def parse_expr(self) -> Expr:
         return self.expression()
@@ -23,9 +33,10 @@ class Parser:
         Consumes current token and returns it
         """
         if not self._isAtEnd():
-            self.current += 1
+            self._previous_token = self._current_token
+            self._current_token = next(self.tokens)
         
-        return self._previous()
+        return self._previous_token
 
     def _match(self, *types: TokenType) -> bool:
         """
@@ -60,10 +71,10 @@ class Parser:
         return self._peek().type == TokenType.EOF
     
     def _peek(self) -> Token:
-        return self.tokens[self.current]
+        return self._current_token
     
     def _previous(self) -> Token:
-        return self.tokens[self.current - 1]
+        return self._previous_token
     
     def _finish_call(self, callee: Expr) -> Expr:
         arguments: list[Expr] = []
@@ -85,11 +96,15 @@ class Parser:
     # ----- Handles declarations and statements -----
 
     def declaration(self) -> Stmt:
+        line = self._peek().line
         if self._match(TokenType.FUN):
-            return self.function("function")
-        if self._match(TokenType.VAR):
-            return self.variable_declaration()
-        return self.statement()
+            stmt = self.function("function")
+        elif self._match(TokenType.VAR):
+            stmt = self.variable_declaration()
+        else:
+            return self.statement()
+        stmt.line = line
+        return stmt
         # TODO: add `synchronize()` in an `except` clause for error handling
 
     def function(self, kind: str) -> Stmt:
@@ -126,21 +141,26 @@ class Parser:
         return Var(name, initializer) # Stmt.Print
 
     def statement(self) -> Stmt:
+        line = self._peek().line
         if self._match(TokenType.FOR):
-            return self.for_stmt()
-        if self._match(TokenType.IF):
-            return self.if_stmt()
-        if self._match(TokenType.PRINT):
-            return self.print_stmt()
-        if self._match(TokenType.RETURN):
-            return self.return_stmt()
-        if self._match(TokenType.WHILE):
-            return self.while_stmt()
-        if self._match(TokenType.LEFT_BRACE):
-            return Block(self.block())
-        return self.expression_stmt()
+            stmt = self.for_stmt()
+        elif self._match(TokenType.IF):
+            stmt = self.if_stmt()
+        elif self._match(TokenType.PRINT):
+            stmt = self.print_stmt()
+        elif self._match(TokenType.RETURN):
+            stmt = self.return_stmt()
+        elif self._match(TokenType.WHILE):
+            stmt = self.while_stmt()
+        elif self._match(TokenType.LEFT_BRACE):
+            stmt = Block(self.block())
+        else:
+            stmt = self.expression_stmt()
+        stmt.line = line
+        return stmt
     
     def for_stmt(self) -> Stmt:
+        line = self._previous().line
         self._consume(TokenType.LEFT_PAREN, "Expect '(' after 'for'.")
 
         initializer: Stmt | None = None
@@ -148,8 +168,10 @@ class Parser:
             initializer = None
         elif self._match(TokenType.VAR):
             initializer = self.variable_declaration()
+            initializer.line = line
         else:
             initializer = self.expression_stmt()
+            initializer.line = line
 
         condition: Expr | None = None
         if not self._check(TokenType.SEMICOLON):
@@ -157,6 +179,7 @@ class Parser:
         self._consume(TokenType.SEMICOLON, "Expect ';' after loop condition.")
 
         increment: Expr | None = None
+        increment_line = self._peek().line
         if not self._check(TokenType.RIGHT_PAREN):
             increment = self.expression()
         self._consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
@@ -164,15 +187,15 @@ class Parser:
         body: Stmt | list[Stmt] = self.statement()
 
         if increment is not None:
-            body = Block([body, Expression(increment)])
+            body = Block([body, Expression(increment, line=increment_line)], line=line)
 
         if condition is None:
             condition = Literal(True)
 
-        body = While(condition, body)
+        body = While(condition, body, line=line)
 
         if initializer is not None:
-            body = Block([initializer, body])
+            body = Block([initializer, body], line=line)
 
         return body
 
@@ -275,7 +298,7 @@ class Parser:
         while self._match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
             operator: Token = self._previous()
             right: Expr = self.comparison()
-            expr = Binary(expr, operator, right)
+            expr = Binary(expr, operator, right, BINARY_OPERATORS[operator.type])
         
         return expr
 
@@ -285,7 +308,7 @@ class Parser:
         while self._match(TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL):
             operator: Token = self._previous()
             right = self.term()
-            expr = Binary(expr, operator, right)
+            expr = Binary(expr, operator, right, BINARY_OPERATORS[operator.type])
 
         return expr
 
@@ -295,7 +318,7 @@ class Parser:
         while self._match(TokenType.MINUS, TokenType.PLUS):
             operator = self._previous()
             right = self.factor()
-            expr = Binary(expr, operator, right)
+            expr = Binary(expr, operator, right, BINARY_OPERATORS[operator.type])
 
         return expr
 
@@ -305,7 +328,7 @@ class Parser:
         while self._match(TokenType.SLASH, TokenType.STAR):
             operator = self._previous()
             right = self.unary()
-            expr = Binary(expr, operator, right)
+            expr = Binary(expr, operator, right, BINARY_OPERATORS[operator.type])
 
         return expr
 
@@ -313,7 +336,7 @@ class Parser:
         if self._match(TokenType.BANG, TokenType.MINUS):
             operator = self._previous()
             right = self.unary()
-            return Unary(operator, right)
+            return Unary(operator, right, UNARY_OPERATORS[operator.type])
 
         return self.call()
     
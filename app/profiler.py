@@ -0,0 +1,180 @@
+import marshal
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, TextIO
+from app.utils import LoxRuntimeError, TailCall
+from app.grammar.expressions import Call, Variable
+from app.grammar.statements import Function, Return, Stmt
+from app.interpreter import Interpreter, LoxCallable, LoxFunction
+from app.output import Output
+
+@dataclass(eq=False)
+class FunctionStats:
+	"""
+	Timings of one Lox function (or native function), in nanoseconds.
+	As in cProfile, `inclusive_time` only counts the outermost of recursive calls, which are
+	the `primitive_calls`, so that recursion does not count the same time several times.
+	"""
+	name: str
+	line: int
+	calls: int = 0
+	primitive_calls: int = 0
+	self_time: int = 0
+	inclusive_time: int = 0
+	# The same counters, split by calling function
+	callers: dict['FunctionStats', list[int]] = field(default_factory=dict)
+	# Number of calls of the function currently on the stack
+	active: int = 0
+
+class Profile:
+	"""
+	Call counts and timings of the functions of a Lox program, and the number of statements
+	executed on each line, as collected by the ProfilingInterpreter.
+	The whole program is the `<script>` pseudo-function, which all top-level calls are made from.
+	"""
+	def __init__(self, filename: str = "<script>"):
+		self.filename = filename
+		self.script = FunctionStats("<script>", 0)
+		self.functions: dict[int, FunctionStats] = {}
+		self.line_hits: defaultdict[int, int] = defaultdict(int)
+		# Stack of [stats, start time, time spent in callees]
+		self._stack: list[list] = []
+
+	def function(self, declaration: Function) -> FunctionStats:
+		stats = self.functions.get(id(declaration))
+		if stats is None:
+			stats = self.functions[id(declaration)] = FunctionStats(declaration.name.lexeme, declaration.name.line)
+		return stats
+
+	def native(self, function: LoxCallable, name: str) -> FunctionStats:
+		stats = self.functions.get(id(function))
+		if stats is None:
+			stats = self.functions[id(function)] = FunctionStats(f"<native fn {name}>", 0)
+		return stats
+
+	def enter(self, stats: FunctionStats) -> None:
+		stats.active += 1
+		self._stack.append([stats, time.perf_counter_ns(), 0])
+
+	def exit(self) -> None:
+		stats, start, children = self._stack.pop()
+		elapsed = time.perf_counter_ns() - start
+		stats.active -= 1
+		primitive = stats.active == 0
+
+		own = elapsed - children
+		stats.calls += 1
+		stats.self_time += own
+		if primitive:
+			stats.primitive_calls += 1
+			stats.inclusive_time += elapsed
+
+		if self._stack:
+			caller = self._stack[-1]
+			caller[2] += elapsed
+			# calls, primitive calls, self time, inclusive time
+			edge = stats.callers.setdefault(caller[0], [0, 0, 0, 0])
+			edge[0] += 1
+			edge[2] += own
+			if primitive:
+				edge[1] += 1
+				edge[3] += elapsed
+
+	def report(self, source: str, top: int, file: TextIO) -> None:
+		"""Prints the `top` functions with the most self time and the `top` most executed lines."""
+		functions = sorted([self.script, *self.functions.values()], key=lambda stats: stats.self_time, reverse=True)
+		print(f"{'calls':>10} {'self (ms)':>12} {'inclusive (ms)':>15}  function", file=file)
+		for stats in functions[:top]:
+			calls = f"{stats.calls}/{stats.primitive_calls}" if stats.calls != stats.primitive_calls else str(stats.calls)
+			location = f" (line {stats.line})" if stats.line else ""
+			print(f"{calls:>10} {stats.self_time / 1e6:12.3f} {stats.inclusive_time / 1e6:15.3f}  {stats.name}{location}", file=file)
+
+		lines = source.splitlines()
+		hits = sorted(((count, line) for line, count in self.line_hits.items() if line), reverse=True)
+		print(f"\n{'hits':>10} {'line':>6}  source", file=file)
+		for count, line in hits[:top]:
+			text = lines[line - 1].strip() if line <= len(lines) else ""
+			print(f"{count:>10} {line:>6}  {text}", file=file)
+
+	def dump_stats(self, path: str) -> None:
+		"""Writes the timings in the format of `pstats`, which profile viewers (e.g. snakeviz) read."""
+		def key(stats: FunctionStats) -> tuple[str, int, str]:
+			return ("~" if stats.name.startswith("<native") else self.filename, stats.line, stats.name)
+
+		entries = {}
+		for stats in [self.script, *self.functions.values()]:
+			# Unlike the entries themselves, the counters of callers start with the total number of calls
+			callers = {
+				key(caller): (calls, primitive, self_time / 1e9, inclusive_time / 1e9)
+				for caller, (calls, primitive, self_time, inclusive_time) in stats.callers.items()
+			}
+			entries[key(stats)] = (stats.primitive_calls, stats.calls, stats.self_time / 1e9, stats.inclusive_time / 1e9, callers)
+		with open(path, "wb") as file:
+			marshal.dump(entries, file)
+
+class ProfilingInterpreter(Interpreter):
+	"""
+	Tree-walking interpreter that records a Profile of the program it runs: every executed
+	statement counts as a hit on its line, and every call is timed.
+	Tail calls replace the calling function, as they do on the Interpreter: the time of the
+	called function is not included in the caller's. The extra Python frames of each call make
+	a profiled program overflow the stack at a smaller depth of recursion than on the Interpreter.
+	"""
+	def __init__(self, profile: Profile, output: Output | None = None):
+		super().__init__(resolved=True, output=output)
+		self.profile = profile
+		self._executors = {type_: self._counting(execute) for type_, execute in self._executors.items()}
+
+	def _counting(self, execute):
+		line_hits = self.profile.line_hits
+		def counted(stmt: Stmt) -> Any:
+			line_hits[stmt.line] += 1
+			return execute(stmt)
+		return counted
+
+	def interpret(self, statements: list[Stmt]) -> Any:
+		self.profile.enter(self.profile.script)
+		try:
+			return super().interpret(statements)
+		finally:
+			self.profile.exit()
+
+	def visit_return_stmt(self, stmt: Return) -> tuple | TailCall:
+		if stmt.tail_call:
+			function, arguments = self._evaluate_call(stmt.value)
+			if isinstance(function, LoxFunction):
+				return TailCall(function, arguments)
+			return (self._call(stmt.value, function, arguments),)
+		return super().visit_return_stmt(stmt)
+
+	def visit_call(self, expr: Call) -> Any:
+		function, arguments = self._evaluate_call(expr)
+		try:
+			return self._call(expr, function, arguments)
+		except RecursionError:
+			raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
+
+	def _call(self, expr: Call, function: LoxCallable, arguments: list) -> Any:
+		profile = self.profile
+		if not isinstance(function, LoxFunction):
+			name = expr.callee.name.lexeme if isinstance(expr.callee, Variable) else str(function)
+			profile.enter(profile.native(function, name))
+			try:
+				return self._call_native(expr, function, arguments)
+			finally:
+				profile.exit()
+
+		# The trampoline of LoxFunction.call, with each function timed separately
+		while True:
+			profile.enter(profile.function(function.declaration))
+			try:
+				completion = self.execute_block(function.declaration.body, function._bind(self, arguments))
+			finally:
+				profile.exit()
+			if completion is None:
+				return None
+			if completion.__class__ is TailCall:
+				function, arguments = completion.function, completion.arguments
+				continue
+			return completion[0]
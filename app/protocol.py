@@ -0,0 +1,45 @@
+import os
+import socket
+import struct
+import tempfile
+
+# Frames are a kind byte and a big-endian payload length, followed by the payload
+HEADER = struct.Struct("!cI")
+
+REQUEST = b"R" # JSON: "source" or "path", "engine", "max_depth"
+STDOUT = b"O" # Output text
+STDERR = b"E" # Error output text
+EXIT = b"X" # Exit code of the script, in ASCII digits; always the last frame
+
+def default_socket_path() -> str:
+    """
+    `lox.sock` in $XDG_RUNTIME_DIR, which only the user can access, or else in a `lox-<uid>`
+    directory of the temporary directory, which the server keeps private to the user: other
+    users cannot create the socket first, nor connect to it.
+    """
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory and os.path.isdir(runtime_directory):
+        return os.path.join(runtime_directory, "lox.sock")
+    return os.path.join(tempfile.gettempdir(), f"lox-{os.getuid()}", "lox.sock")
+
+def send_frame(connection: socket.socket, kind: bytes, payload: bytes) -> None:
+    connection.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def receive_frame(connection: socket.socket) -> tuple[bytes, bytes] | None:
+    """The next frame, or None if the peer closed the connection."""
+    header = _receive_exactly(connection, HEADER.size)
+    if header is None:
+        return None
+    kind, size = HEADER.unpack(header)
+    payload = _receive_exactly(connection, size)
+    return (kind, payload) if payload is not None else None
@@ -0,0 +1,162 @@
+from collections import Counter
+from typing import Any
+from app.grammar.expressions import Assign, Call, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+
+class FunctionInfo:
+	"""What the PurityAnalyzer found out about one function while walking its body."""
+	def __init__(self, declaration: Function):
+		self.declaration = declaration
+		self.pure = True
+		# Globals read in the body, which must be constant, and global functions called from
+		# it, which must be pure
+		self.globals: set[str] = set()
+		self.callees: set[str] = set()
+		# Scopes open within the function, including the one of its parameters
+		self.scopes = 1
+
+class PurityAnalyzer(ExprVisitor, StmtVisitor):
+	"""
+	Static pass that runs after the Resolver and the Optimizer, only with `--memoize`, and marks
+	the functions whose result only depends on their arguments as `pure`, so that calls to them
+	can be memoized (see MemoizedFunction).
+
+	A function is pure when its body
+	- does not print,
+	- does not declare functions (each call would return a new closure),
+	- does not assign variables other than its own locals,
+	- reads no variables other than its own locals and constant globals,
+	- only calls pure functions, by the name of a constant global.
+
+	A global is constant when it is declared once at the top level and never assigned, so that
+	once it has been defined, it always has the same value. Calls between pure functions may be
+	(mutually) recursive.
+	"""
+	def __init__(self):
+		self._functions: list[FunctionInfo] = []
+		self._current: FunctionInfo | None = None
+		self._assigned_globals: set[str] = set()
+
+	def analyze(self, statements: list[Stmt]) -> list[Stmt]:
+		for statement in statements:
+			statement.accept(self)
+
+		declarations = Counter(statement.name.lexeme for statement in statements if isinstance(statement, (Var, Function)))
+		constants = {name for name, count in declarations.items() if count == 1 and name not in self._assigned_globals}
+		global_functions = {
+			statement.name.lexeme: statement for statement in statements
+			if isinstance(statement, Function) and statement.name.lexeme in constants
+		}
+		for info in self._functions:
+			if not (info.globals <= constants and info.callees <= global_functions.keys()):
+				info.pure = False
+
+		# Greatest fixed point: a function stops being pure as soon as it calls an impure one
+		pure = {id(info.declaration) for info in self._functions if info.pure}
+		changed = True
+		while changed:
+			changed = False
+			for info in self._functions:
+				if id(info.declaration) in pure and any(id(global_functions[name]) not in pure for name in info.callees):
+					pure.discard(id(info.declaration))
+					changed = True
+
+		for info in self._functions:
+			info.declaration.pure = id(info.declaration) in pure
+		return statements
+
+	def _is_local(self, depth: int | None) -> bool:
+		return depth is not None and depth < self._current.scopes
+
+	def _impure(self) -> None:
+		if self._current is not None:
+			self._current.pure = False
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_function_stmt(self, stmt: Function) -> Any:
+		self._impure()
+		enclosing = self._current
+		self._current = FunctionInfo(stmt)
+		self._functions.append(self._current)
+		for statement in stmt.body:
+			statement.accept(self)
+		self._current = enclosing
+
+	def visit_block_stmt(self, stmt: Block) -> Any:
+		if self._current is not None:
+			self._current.scopes += 1
+		for statement in stmt.statements:
+			statement.accept(self)
+		if self._current is not None:
+			self._current.scopes -= 1
+
+	def visit_var_stmt(self, stmt: Var) -> Any:
+		if stmt.initializer is not None:
+			stmt.initializer.accept(self)
+
+	def visit_expression_stmt(self, stmt: Expression) -> Any:
+		stmt.expression.accept(self)
+
+	def visit_if_stmt(self, stmt: If) -> Any:
+		stmt.condition.accept(self)
+		stmt.thenBranch.accept(self)
+		if stmt.elseBranch is not None:
+			stmt.elseBranch.accept(self)
+
+	def visit_print_stmt(self, stmt: Print) -> Any:
+		self._impure()
+		stmt.expression.accept(self)
+
+	def visit_return_stmt(self, stmt: Return) -> Any:
+		if stmt.value is not None:
+			stmt.value.accept(self)
+
+	def visit_while_stmt(self, stmt: While) -> Any:
+		stmt.condition.accept(self)
+		stmt.body.accept(self)
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_variable(self, expr: Variable) -> Any:
+		if self._current is None or self._is_local(expr.depth):
+			return
+		if expr.depth is None:
+			self._current.globals.add(expr.name.lexeme)
+		else: # A local of an enclosing function
+			self._impure()
+
+	def visit_assign(self, expr: Assign) -> Any:
+		expr.value.accept(self)
+		if expr.depth is None:
+			self._assigned_globals.add(expr.name.lexeme)
+		if self._current is not None and not self._is_local(expr.depth):
+			self._impure()
+
+	def visit_call(self, expr: Call) -> Any:
+		expr.callee.accept(self)
+		for argument in expr.arguments:
+			argument.accept(self)
+		if self._current is None:
+			return
+		if isinstance(expr.callee, Variable) and expr.callee.depth is None:
+			self._current.callees.add(expr.callee.name.lexeme)
+		else:
+			self._impure()
+
+	def visit_binary(self, expr: Binary) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_grouping(self, expr: Grouping) -> Any:
+		expr.expression.accept(self)
+
+	def visit_literal(self, expr: Literal) -> Any:
+		return None
+
+	def visit_logical(self, expr: Logical) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_unary(self, expr: Unary) -> Any:
+		expr.right.accept(self)
@@ -0,0 +1,175 @@
+from enum import Enum
+from typing import Any
+from app.types import Token
+from app.parser import error
+from app.grammar.expressions import Assign, Call, Expr, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+
+FunctionType = Enum("FunctionType", ["NONE", "FUNCTION"])
+
+class Scope:
+	"""
+	A local scope as seen by the Resolver.
+	`slots` maps a variable name to its position in the runtime Environment,
+	`defined` holds the names whose initializer has already been resolved,
+	`variables` the `var` declarations of the scope.
+	"""
+	def __init__(self):
+		self.slots: dict[str, int] = {}
+		self.defined: set[str] = set()
+		self.variables: dict[str, Var] = {}
+
+class Resolver(ExprVisitor, StmtVisitor):
+	"""
+	Static pass that runs between the Parser and the Interpreter.
+
+	Every `Variable` and `Assign` node that refers to a local variable is annotated with
+	its `depth` (how many environments to walk up) and its `slot` (position within that
+	environment), so that the Interpreter can reach it without any name lookups.
+	Variables that are not found in any local scope are left unannotated and treated as globals.
+	Local `var` declarations that are assigned later on are marked as `reassigned`,
+	and `return` statements that return the result of a call as `tail_call`.
+
+	Errors are reported like parse errors (see `app.parser.error`).
+	"""
+	def __init__(self):
+		self._scopes: list[Scope] = []
+		self._current_function = FunctionType.NONE
+
+	def resolve(self, statements: list[Stmt]) -> list[Stmt]:
+		for statement in statements:
+			self._resolve_stmt(statement)
+		return statements
+
+	def _resolve_stmt(self, stmt: Stmt) -> None:
+		stmt.accept(self)
+
+	def _resolve_expr(self, expr: Expr) -> None:
+		expr.accept(self)
+
+	def _begin_scope(self) -> None:
+		self._scopes.append(Scope())
+
+	def _end_scope(self) -> None:
+		self._scopes.pop()
+
+	def _declare(self, name: Token) -> None:
+		if not self._scopes:
+			return
+		scope = self._scopes[-1]
+		if name.lexeme in scope.slots:
+			error(name, "Already a variable with this name in this scope.")
+		scope.slots[name.lexeme] = len(scope.slots)
+
+	def _define(self, name: Token) -> None:
+		if not self._scopes:
+			return
+		self._scopes[-1].defined.add(name.lexeme)
+
+	def _resolve_local(self, expr: Variable | Assign, name: Token) -> None:
+		for depth, scope in enumerate(reversed(self._scopes)):
+			if name.lexeme in scope.slots:
+				expr.depth = depth
+				expr.slot = scope.slots[name.lexeme]
+				return
+		# Not found: assume it is global
+
+	def _resolve_function(self, function: Function, type: FunctionType) -> None:
+		enclosing_function = self._current_function
+		self._current_function = type
+
+		self._begin_scope()
+		for param in function.params:
+			self._declare(param)
+			self._define(param)
+		# The body shares the scope of the parameters (see LoxFunction.call)
+		for statement in function.body:
+			self._resolve_stmt(statement)
+		self._end_scope()
+
+		self._current_function = enclosing_function
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_block_stmt(self, stmt: Block) -> Any:
+		self._begin_scope()
+		for statement in stmt.statements:
+			self._resolve_stmt(statement)
+		self._end_scope()
+
+	def visit_var_stmt(self, stmt: Var) -> Any:
+		self._declare(stmt.name)
+		if self._scopes:
+			self._scopes[-1].variables[stmt.name.lexeme] = stmt
+		if stmt.initializer is not None:
+			self._resolve_expr(stmt.initializer)
+		self._define(stmt.name)
+
+	def visit_function_stmt(self, stmt: Function) -> Any:
+		# Defined eagerly, so that the function can refer to itself in its body
+		self._declare(stmt.name)
+		self._define(stmt.name)
+		self._resolve_function(stmt, FunctionType.FUNCTION)
+
+	def visit_expression_stmt(self, stmt: Expression) -> Any:
+		self._resolve_expr(stmt.expression)
+
+	def visit_if_stmt(self, stmt: If) -> Any:
+		self._resolve_expr(stmt.condition)
+		self._resolve_stmt(stmt.thenBranch)
+		if stmt.elseBranch is not None:
+			self._resolve_stmt(stmt.elseBranch)
+
+	def visit_print_stmt(self, stmt: Print) -> Any:
+		self._resolve_expr(stmt.expression)
+
+	def visit_return_stmt(self, stmt: Return) -> Any:
+		if self._current_function == FunctionType.NONE:
+			error(stmt.keyword, "Can't return from top-level code.")
+		if stmt.value is not None:
+			self._resolve_expr(stmt.value)
+			# Nothing is left to do in the function once the call is made (see LoxFunction.call)
+			stmt.tail_call = isinstance(stmt.value, Call)
+
+	def visit_while_stmt(self, stmt: While) -> Any:
+		self._resolve_expr(stmt.condition)
+		self._resolve_stmt(stmt.body)
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_variable(self, expr: Variable) -> Any:
+		if self._scopes:
+			scope = self._scopes[-1]
+			if expr.name.lexeme in scope.slots and expr.name.lexeme not in scope.defined:
+				error(expr.name, "Can't read local variable in its own initializer.")
+		self._resolve_local(expr, expr.name)
+
+	def visit_assign(self, expr: Assign) -> Any:
+		self._resolve_expr(expr.value)
+		self._resolve_local(expr, expr.name)
+		if expr.depth is not None:
+			declaration = self._scopes[-1 - expr.depth].variables.get(expr.name.lexeme)
+			if declaration is not None:
+				declaration.reassigned = True
+
+	def visit_binary(self, expr: Binary) -> Any:
+		self._resolve_expr(expr.left)
+		self._resolve_expr(expr.right)
+
+	def visit_call(self, expr: Call) -> Any:
+		self._resolve_expr(expr.callee)
+		for argument in expr.arguments:
+			self._resolve_expr(argument)
+
+	def visit_grouping(self, expr: Grouping) -> Any:
+		self._resolve_expr(expr.expression)
+
+	def visit_literal(self, expr: Literal) -> Any:
+		return None
+
+	def visit_logical(self, expr: Logical) -> Any:
+		self._resolve_expr(expr.left)
+		self._resolve_expr(expr.right)
+
+	def visit_unary(self, expr: Unary) -> Any:
+		self._resolve_expr(expr.right)
@@ -0,0 +1,60 @@
+from typing import Any
+
+# Concatenations shorter than this make plain strs: copying a string of up to this size costs
+# about as much as appending to a rope (measured with CPython 3.11)
+ROPE_THRESHOLD = 16 * 1024
+
+class Rope:
+	"""
+	Lox string built by `+`, kept as a list of parts and only joined into a str when its value is
+	needed: when it is printed (through `str()`), compared, or hashed. The str is then cached.
+
+	Appending to a rope shares its list of parts: the new rope appends in place and covers one
+	more part, while the old one keeps covering the first `count` parts. Only appending twice to
+	the same rope copies the parts, so that building a string with `s = s + piece` in a loop is
+	amortized O(1) per append, instead of copying the whole string every time.
+	"""
+	__slots__ = ("_parts", "_count", "_length", "_flat")
+
+	def __init__(self, parts: list[str], length: int):
+		self._parts = parts
+		self._count = len(parts)
+		self._length = length
+		self._flat: str | None = None
+
+	@staticmethod
+	def concat(left: 'str | Rope', right: 'str | Rope') -> 'str | Rope':
+		if right.__class__ is Rope:
+			right = str(right)
+		if left.__class__ is not Rope:
+			if len(left) + len(right) < ROPE_THRESHOLD:
+				return left + right
+			return Rope([left, right], len(left) + len(right))
+
+		if left._count == len(left._parts):
+			parts = left._parts
+		else:
+			parts = left._parts[:left._count]
+		parts.append(right)
+		return Rope(parts, left._length + len(right))
+
+	def __str__(self) -> str:
+		if self._flat is None:
+			self._flat = "".join(self._parts) if self._count == len(self._parts) else "".join(self._parts[:self._count])
+			# Later appends start from the joined string, and the shared parts can be freed
+			self._parts, self._count = [self._flat], 1
+		return self._flat
+
+	def __len__(self) -> int:
+		return self._length
+
+	def __eq__(self, other: Any) -> bool:
+		if other.__class__ is str or other.__class__ is Rope:
+			return len(other) == self._length and str(self) == str(other)
+		return NotImplemented
+
+	def __hash__(self) -> int:
+		return hash(str(self))
+
+	def __repr__(self) -> str:
+		return repr(str(self))
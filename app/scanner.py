@@ -1,194 +1,172 @@
+import gc
+import re
 import sys
+from typing import Iterable, Iterator
 from app.types import Token, TokenType
 
-class Scanner:
-    scan_errors = False
-    is_identifier_open = False
-    identifier = ""
-    result_tokens: list[Token] = []
+KEYWORDS: dict[str, TokenType] = {
+    keyword: getattr(TokenType, keyword.upper())
+    for keyword in ["and", "class", "else", "false", "for", "fun", "if", "nil", "or", "print", "return", "super", "this", "true", "var", "while"]
+}
+
+WHITESPACE = frozenset(" \t\r\n")
+
+OPERATORS: dict[str, TokenType] = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "*": TokenType.STAR,
+    "/": TokenType.SLASH,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+}
+
+# Every character of the source belongs to exactly one lexeme: newlines and comments are matched
+# too (and skipped), so that line numbers can be counted from the lexemes alone. Other whitespace
+# is skipped before each lexeme, rather than matched as lexemes of its own, which halves their number
+LEXEME_PATTERN = re.compile(r"""[ \t\r]*(
+    \n[ \t\r\n]*          # newlines, with the whitespace that follows them
+  | //[^\n]*              # comment
+  | [^\W\d]\w*            # identifier or keyword
+  | \d+(?:\.\d+)?         # number
+  | [!=<>]=?              # one or two character operators
+  | "[^"]*"               # string
+  | .                     # single character: operator, unterminated string or unexpected character
+)""", re.VERBOSE | re.DOTALL)
 
-    def __init__(self, file_contents: str, print_to_stdout: bool = False):
-        self.file_contents: str = file_contents
-        self.file_contents_length: int = len(file_contents)
+class Scanner:
+    """
+    Single-pass lexer: one compiled regular expression splits the source into lexemes,
+    which are then classified by their first character. All state lives in the instance.
+
+    `file_contents` is either the whole source or an iterable of chunks of it (e.g. an open file
+    or a MappedSource): `tokens()` then only reads one chunk past the tokens it has yielded.
+    """
+    def __init__(self, file_contents: str | Iterable[str], print_to_stdout: bool = False):
+        self.file_contents = file_contents
         self.print_to_stdout = print_to_stdout
-
-    def tokenize(self):
-        index_to_ignore = None # Used to store indexes that are part of multiple-character lexemes
-        current_line = 1
-        ignore_rest_of_line = None
-        is_string_literal_open = False
-        string_literal = ""
-        number_literal = "" # Stored as string
-        
-        if not len(self.file_contents):
-            print("EOF  null") if self.print_to_stdout else None
-            self.result_tokens.append(Token(TokenType.EOF, "null", None, current_line))
-            return self.result_tokens
-
-        for i in range(self.file_contents_length):
-            if i == index_to_ignore:
-                continue
-
-            char = self.file_contents[i]
-            next_char = self.file_contents[i + 1] if i < self.file_contents_length - 1 else None
-
-            if char == "\n":
-                current_line += 1
-                if is_string_literal_open:
-                    string_literal += "\n"
-                continue
-
-            # This is set in action when we find a comment. The rest of the line is ignored
-            if current_line == ignore_rest_of_line:
-                continue
-
-            # Handles string literals
-            if char == '"': # String literals
-                is_string_literal_open = not is_string_literal_open
-                if not is_string_literal_open:
-                    print(f'STRING "{string_literal}" {string_literal}') if self.print_to_stdout else None
-                    self.result_tokens.append(Token(TokenType.STRING, string_literal, string_literal, current_line))
-                    string_literal = ""
-                continue
-
-            if is_string_literal_open:
-                # Adds content to string literal until it is closed
-                string_literal += char
-                continue
-
-            # Handles number literals
-            if (char.isdigit() or (char == '.' and next_char and next_char.isdigit())) and not self.is_identifier_open:
-                number_literal += char
-                if not next_char or not (next_char.isdigit() or next_char == '.'):
-                    print(f"NUMBER {number_literal} {float(number_literal)}") if self.print_to_stdout else None
-                    self.result_tokens.append(Token(TokenType.NUMBER, number_literal, float(number_literal), current_line))
-                    number_literal = ""
+        self.scan_errors = False
+        self.result_tokens: list[Token] = []
+
+    def tokenize(self) -> list[Token]:
+        # Tokens never form reference cycles: pausing the cyclic GC while millions of them are
+        # allocated avoids repeated full collections on large sources
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for tokens in self._scan_chunks():
+                self.result_tokens.extend(tokens)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return self.result_tokens
+
+    def tokens(self) -> Iterator[Token]:
+        """
+        Yields the tokens as they are scanned, ending with EOF.
+        """
+        for tokens in self._scan_chunks():
+            yield from tokens
+
+    def _scan_chunks(self) -> Iterator[list[Token]]:
+        """
+        Yields the tokens of each chunk of the source in turn, ending with [EOF]. Tokens are
+        handed over a chunk at a time rather than one by one, which saves resuming a generator per token.
+        """
+        source = self.file_contents
+        if isinstance(source, str):
+            tokens, _, line = self._scan(source, 1, final=True)
+            yield tokens
+        else:
+            line = 1
+            pending = ""
+            for chunk in source:
+                text = pending + chunk
+                # Only strings continue past a newline, and _scan stops at a string that is not closed yet
+                end = text.rfind("\n") + 1
+                tokens, consumed, line = self._scan(text[:end], line, final=False)
+                yield tokens
+                pending = text[consumed:]
+            tokens, _, line = self._scan(pending, line, final=True)
+            yield tokens
+
+        eof = self._eof(line)
+        # Before yielding EOF: consumers such as the Parser stop pulling tokens once they get it
+        if self.scan_errors:
+            exit(65)
+        yield [eof]
+
+    def _scan(self, text: str, line: int, final: bool) -> tuple[list[Token], int, int]:
+        """
+        Scans `text`, starting at `line`.
+        Returns its tokens, how many characters were consumed and the line reached. Unless this is the
+        `final` part of the source, an unterminated string is left unconsumed, as it may end in the next part.
+        """
+        tokens: list[Token] = []
+        append = tokens.append
+        operator_type = OPERATORS.get
+        keyword_type = KEYWORDS.get
+        print_to_stdout = self.print_to_stdout
+
+        for lexeme in LEXEME_PATTERN.findall(text):
+            type = operator_type(lexeme)
+            if type is not None:
+                if print_to_stdout:
+                    print(f"{type.name} {lexeme} null")
+                append(Token(type, lexeme, None, line))
                 continue
 
-            # Handles other multiple-character lexemes
-            if char == "=" and next_char == "=":
-                self._scan("==", current_line)
-                index_to_ignore = i + 1
-            elif char == "!" and next_char == "=":
-                self._scan("!=", current_line)
-                index_to_ignore = i + 1
-            elif char in ["<", ">"] and next_char == "=":
-                self._scan(char + "=", current_line)
-                index_to_ignore = i + 1
-            elif char == "/" and next_char == "/": # Comments `//` - Stop here
-                ignore_rest_of_line = current_line
+            first = lexeme[0]
+            if first in WHITESPACE:
+                if "\n" in lexeme:
+                    line += lexeme.count("\n")
+            elif first == "/": # Comment (a lone "/" is an operator)
                 continue
-            elif char in ["\t", " "]: # Ignore these
-                self._resolve_identifier(self.identifier, current_line)
-                continue
-            elif (char.isalpha() or char == "_") or (self.is_identifier_open and char.isdigit()):
-                self.is_identifier_open = True
-                self.identifier += char
-            # Handles single-character lexemes
+            elif first == '"':
+                if len(lexeme) == 1:
+                    # No closing quote: this is the last quote of the text, and the string runs up to its end
+                    start = text.rfind('"')
+                    if not final:
+                        return tokens, start, line
+                    line += text.count("\n", start)
+                    print(f"[line {line}] Error: Unterminated string.", file=sys.stderr)
+                    self._eof(line)
+                    exit(65)
+                # Strings can span multiple lines; the token gets the line where it ends
+                line += lexeme.count("\n")
+                value = lexeme[1:-1]
+                if print_to_stdout:
+                    print(f'STRING "{value}" {value}')
+                append(Token(TokenType.STRING, value, value, line))
+            elif first.isdecimal():
+                value = float(lexeme)
+                if print_to_stdout:
+                    print(f"NUMBER {lexeme} {value}")
+                append(Token(TokenType.NUMBER, lexeme, value, line))
+            elif first == "_" or first.isalnum():
+                type = keyword_type(lexeme, TokenType.IDENTIFIER)
+                if print_to_stdout:
+                    print(f"{type.name} {lexeme} null")
+                append(Token(type, lexeme, None, line))
             else:
-                self._scan(char, current_line)
-
-        # If we get here, but a string literal is still open, throw an error and exit early
-        if is_string_literal_open:
-            print(f"[line {current_line}] Error: Unterminated string.", file=sys.stderr)
-            print("EOF  null") if self.print_to_stdout else None
-            self.result_tokens.append(Token(TokenType.EOF, "null", None, current_line))
-            exit(65)
-
-        if self.is_identifier_open:
-            self._resolve_identifier(self.identifier, current_line)
-        
-        print("EOF  null") if self.print_to_stdout else None
-        self.result_tokens.append(Token(TokenType.EOF, "null", None, current_line))
-
-        if self.scan_errors:
-            exit(65)
-        else:
-            return self.result_tokens
-
-    def _scan(self, char, current_line):
-        # If it gets to this function and we still have an identifier open, we need to close it
-        if self.is_identifier_open:
-            self._resolve_identifier(self.identifier, current_line)
-
-        match char:
-            case "(":
-                print("LEFT_PAREN ( null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.LEFT_PAREN, "(", None, current_line))
-            case ")":
-                print("RIGHT_PAREN ) null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.RIGHT_PAREN, ")", None, current_line))
-            case "{":
-                print("LEFT_BRACE { null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.LEFT_BRACE, "{", None, current_line))
-            case "}":
-                print("RIGHT_BRACE } null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.RIGHT_BRACE, "}", None, current_line))
-            case "*":
-                print("STAR * null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.STAR, "*", None, current_line))
-            case ".":
-                print("DOT . null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.DOT, ".", None, current_line))
-            case ",":
-                print("COMMA , null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.COMMA, ",", None, current_line))
-            case "+":
-                print("PLUS + null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.PLUS, "+", None, current_line))
-            case "-":
-                print("MINUS - null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.MINUS, "-", None, current_line))
-            case ";":
-                print("SEMICOLON ; null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.SEMICOLON, ";", None, current_line))
-            case "=":
-                print("EQUAL = null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.EQUAL, "=", None, current_line))
-            case "==":
-                print("EQUAL_EQUAL == null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.EQUAL_EQUAL, "==", None, current_line))
-            case "!":
-                print("BANG ! null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.BANG, "!", None, current_line))
-            case "!=":
-                print("BANG_EQUAL != null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.BANG_EQUAL, "!=", None, current_line))
-            case "<":
-                print("LESS < null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.LESS, "<", None, current_line))
-            case "<=":
-                print("LESS_EQUAL <= null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.LESS_EQUAL, "<=", None, current_line))
-            case ">":
-                print("GREATER > null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.GREATER, ">", None, current_line))
-            case ">=":
-                print("GREATER_EQUAL >= null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.GREATER_EQUAL, ">=", None, current_line))
-            case "/":
-                print("SLASH / null") if self.print_to_stdout else None
-                self.result_tokens.append(Token(TokenType.SLASH, "/", None, current_line))
-            case _:
-                print(f"[line {current_line}] Error: Unexpected character: {char}", file=sys.stderr)
+                print(f"[line {line}] Error: Unexpected character: {lexeme}", file=sys.stderr)
                 self.scan_errors = True
-                return False
-        return True
 
-    def _resolve_identifier(self, identifier: str, current_line: int):
-        reserved_words = ["and", "class", "else", "false", "for", "fun", "if", "nil", "or", "print", "return", "super", "this", "true", "var", "while"]
-
-        self.is_identifier_open = False
-
-        if not identifier:
-            self.identifier = ""
-            return
-
-        if identifier in reserved_words:
-            print(f"{identifier.upper()} {identifier} null") if self.print_to_stdout else None
-            self.result_tokens.append(Token(getattr(TokenType, identifier.upper()), identifier, None, current_line))
-        else:
-            print(f"IDENTIFIER {identifier} null") if self.print_to_stdout else None
-            self.result_tokens.append(Token(TokenType.IDENTIFIER, identifier, None, current_line))
+        return tokens, len(text), line
 
-        self.identifier = ""
\ No newline at end of file
+    def _eof(self, line: int) -> Token:
+        if self.print_to_stdout:
+            print("EOF  null")
+        return Token(TokenType.EOF, "null", None, line)
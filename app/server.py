@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+from app.protocol import EXIT, REQUEST, STDERR, STDOUT, default_socket_path, receive_frame, send_frame
+from app.batch import EXIT_NO_INPUT, read_script, run_program
+
+EXIT_TIMEOUT = 124 # As with timeout(1)
+EXIT_BAD_REQUEST = 64
+
+class Timeout(BaseException):
+    """Raised in a script that runs for too long. Lox code cannot catch it, like KeyboardInterrupt."""
+
+class FrameWriter(io.TextIOBase):
+    """Text stream that sends what is written to it to the client, in frames of the given kind."""
+    def __init__(self, connection: socket.socket, kind: bytes):
+        self._connection = connection
+        self._kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            # A timeout must not interrupt a frame half-sent
+            blocked = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+            try:
+                send_frame(self._connection, self._kind, text.encode())
+            finally:
+                signal.pthread_sigmask(signal.SIG_SETMASK, blocked)
+        return len(text)
+
+def _raise_timeout(signum: int, frame) -> None:
+    raise Timeout()
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    """Runs the script of one request, in the child process forked for it."""
+    server: 'LoxServer'
+
+    def handle(self) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL) # Set by serve() for the server only
+        frame = receive_frame(self.request)
+        if frame is None:
+            return
+        sys.stdout = FrameWriter(self.request, STDOUT)
+        sys.stderr = FrameWriter(self.request, STDERR)
+        try:
+            exit_code = self._run(frame)
+        finally:
+            sys.stdout.flush()
+        send_frame(self.request, EXIT, str(exit_code).encode())
+
+    def _run(self, frame: tuple[bytes, bytes]) -> int:
+        kind, payload = frame
+        try:
+            request = json.loads(payload) if kind == REQUEST else None
+            engine, max_depth = request["engine"], request["max_depth"]
+            file_contents = request["source"] if "source" in request else read_script(request["path"])
+        except (TypeError, KeyError, ValueError):
+            print("Invalid request", file=sys.stderr)
+            return EXIT_BAD_REQUEST
+        if file_contents is None:
+            return EXIT_NO_INPUT
+        if engine not in self.server.engines or not (max_depth is None or isinstance(max_depth, int) and max_depth >= 0):
+            print("Invalid engine or maximum depth", file=sys.stderr)
+            return EXIT_BAD_REQUEST
+
+        if self.server.timeout_seconds:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.alarm(self.server.timeout_seconds)
+        try:
+            return run_program(file_contents, engine, max_depth)
+        except Timeout:
+            sys.stdout.flush()
+            print(f"Timed out after {self.server.timeout_seconds} seconds", file=sys.stderr)
+            return EXIT_TIMEOUT
+        finally:
+            signal.alarm(0)
+
+class LoxServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Server that runs Lox scripts sent by clients (see app.client) on a Unix socket, so that they
+    do not pay for starting Python and importing the interpreter: the server has already imported
+    it, and forks a child process for each request. Each script thus runs on a fresh engine,
+    with its own globals, and cannot affect the server or other scripts.
+
+    At most `max_children` scripts run at once; further connections wait until one has finished.
+    Scripts that run for more than `timeout_seconds` (if not 0) are stopped.
+    """
+    def __init__(self, socket_path: str, engines: set[str], max_children: int, timeout_seconds: int):
+        self.engines = engines
+        self.max_children = max_children
+        self.timeout_seconds = timeout_seconds
+        self.request_queue_size = max(max_children, socketserver.UnixStreamServer.request_queue_size)
+        super().__init__(socket_path, RequestHandler)
+
+def _make_private_directory(directory: str) -> None:
+    """Creates the directory of the default socket, or checks that it is only accessible to the user."""
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise OSError(f"{directory} is not a directory that only the current user can access")
+
+def serve(socket_path: str, engines: set[str], max_children: int, timeout_seconds: int) -> None:
+    """Serves requests on `socket_path` until interrupted or terminated."""
+    if socket_path == default_socket_path():
+        _make_private_directory(os.path.dirname(socket_path))
+    if os.path.lexists(socket_path) and os.lstat(socket_path).st_uid != os.getuid():
+        raise OSError(f"{socket_path} belongs to another user")
+    if os.path.exists(socket_path):
+        # Left over by a server that did not shut down cleanly, unless one is still listening
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(socket_path) == 0:
+                raise OSError(f"A server is already listening on {socket_path}")
+        os.unlink(socket_path)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with LoxServer(socket_path, engines, max_children, timeout_seconds) as server:
+        print(f"Listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
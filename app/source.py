@@ -0,0 +1,58 @@
+import mmap
+from typing import Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+class MappedSource:
+    """
+    Source file mapped into memory, read as consecutive chunks of text that end at a newline, so
+    that no lexeme other than a string spans two chunks (see `Scanner.tokens`).
+
+    The file is never read into memory as a whole: only the chunk being scanned is decoded, and
+    the pages of the mapping are backed by the file, so that the operating system can drop them
+    once they have been scanned. The text is the same as reading the file in text mode: decoded
+    as UTF-8, with `\\r\\n` and `\\r` newlines translated to `\\n`.
+
+    Each iteration starts over from the beginning, so that the source can be scanned and also
+    hashed by the ProgramCache.
+    """
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        with open(path, "rb") as file:
+            try:
+                self._data: mmap.mmap | bytes = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError): # Empty files, and files that cannot be mapped (e.g. pipes)
+                self._data = file.read()
+
+    @property
+    def data(self) -> 'mmap.mmap | bytes':
+        """The raw bytes of the file, e.g. to hash it without decoding it."""
+        return self._data
+
+    def __iter__(self) -> Iterator[str]:
+        data, size = self._data, len(self._data)
+        start = 0
+        while start < size:
+            end = start + self.chunk_size
+            if end < size:
+                # Chunks end after a newline: a "\r\n" is never split, nor is a UTF-8 sequence
+                newline = data.rfind(b"\n", start, end)
+                end = newline + 1 if newline != -1 else data.find(b"\n", end) + 1 or size
+            chunk = data[start:end]
+            start = end
+            if chunk.isascii() and b"\r" not in chunk:
+                yield chunk.decode("ascii")
+            else:
+                text = chunk.decode("utf-8")
+                yield text.replace("\r\n", "\n").replace("\r", "\n") if "\r" in text else text
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> 'MappedSource':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,146 @@
+import dataclasses
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, TextIO
+from app.grammar.expressions import Call, Expr, Variable
+from app.grammar.statements import Return, Stmt
+from app.utils import LoxRuntimeError, NativeError, TailCall
+from app.interpreter import Interpreter, LoxFunction
+from app.environment import Environment
+from app.output import Output
+
+@dataclasses.dataclass
+class RuntimeStats:
+	"""
+	Statistics of one run, printed with `--stats`: the wall time of each phase, the size of the
+	program, and counters of the StatsInterpreter (left at None on the other engines).
+	"""
+	phases: dict[str, float] = dataclasses.field(default_factory=dict)
+	tokens: int | None = None
+	nodes: int | None = None
+	environments: int | None = None
+	variable_reads: int | None = None
+	environment_hops: int | None = None
+	global_cache_hits: int | None = None
+	calls: int | None = None
+	peak_call_depth: int | None = None
+	memo_hits: int | None = None
+	memo_misses: int | None = None
+
+	@contextmanager
+	def phase(self, name: str) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+	def report(self, file: TextIO) -> None:
+		for name, seconds in self.phases.items():
+			print(f"{name + ' time:':<22}{seconds * 1e3:12.3f} ms", file=file)
+		for field in dataclasses.fields(self)[1:]:
+			value = getattr(self, field.name)
+			if value is not None:
+				print(f"{field.name.replace('_', ' ') + ':':<22}{value:12}", file=file)
+
+def count_nodes(nodes: list) -> int:
+	"""Number of statements and expressions in a syntax tree."""
+	count = 0
+	pending = list(nodes)
+	while pending:
+		node = pending.pop()
+		if isinstance(node, list):
+			pending.extend(node)
+		elif isinstance(node, (Stmt, Expr)):
+			count += 1
+			pending.extend(getattr(node, field.name) for field in dataclasses.fields(node))
+	return count
+
+class StatsInterpreter(Interpreter):
+	"""
+	Tree-walking interpreter that keeps the counters of a RuntimeStats up to date. It is only
+	used with `--stats`, so that the Interpreter itself pays nothing for them.
+
+	Every block and every function body runs in a new Environment, besides the global one, so
+	environments are counted as they are entered (memoized calls served by the cache enter none,
+	nor do calls of natives). Reads of a variable count the hops along the chain of environments
+	to the one that holds it: the depth of resolved locals, and the distance found by name
+	otherwise. Reads of globals served by the inline cache of the Variable node are counted as
+	global cache hits.
+	"""
+	def __init__(self, stats: RuntimeStats, resolved: bool = False, output: Output | None = None, memo_capacity: int | None = None):
+		super().__init__(resolved=resolved, output=output, memo_capacity=memo_capacity)
+		self.stats = stats
+		stats.environments = 1
+		stats.variable_reads = stats.environment_hops = stats.global_cache_hits = 0
+		stats.calls = stats.peak_call_depth = 0
+		self._depth = 0
+
+	def interpret(self, statements: list[Stmt]) -> Any:
+		try:
+			return super().interpret(statements)
+		finally:
+			if self._memo_capacity:
+				self.stats.memo_hits = sum(memo.hits for memo in self.memos.values())
+				self.stats.memo_misses = sum(memo.misses for memo in self.memos.values())
+
+	# The methods below repeat those of the Interpreter rather than calling them, to save a call
+
+	def execute_block(self, statements: list[Stmt], environment: Environment) -> Any:
+		self.stats.environments += 1
+		previous = self._environment
+		try:
+			self._environment = environment
+			executors = self._executors
+			for statement in statements:
+				completion = executors[statement.__class__](statement)
+				if completion is not None:
+					return completion
+			return None
+		finally:
+			self._environment = previous
+
+	def visit_variable(self, expr: Variable) -> Any:
+		stats = self.stats
+		stats.variable_reads += 1
+		if not self._resolved:
+			stats.environment_hops += self._distance(expr)
+		elif expr.depth is not None:
+			stats.environment_hops += expr.depth
+			return self._environment.get_at(expr.depth, expr.slot)
+		elif expr.cached_version == self._globals.version:
+			stats.global_cache_hits += 1
+			return expr.cached_value
+		return super().visit_variable(expr)
+
+	def _distance(self, expr: Variable) -> int:
+		distance, environment = 0, self._environment
+		while environment.enclosing is not None and (environment.names is None or expr.name.lexeme not in environment.names):
+			distance, environment = distance + 1, environment.enclosing
+		return distance
+
+	def visit_return_stmt(self, stmt: Return) -> Any:
+		if stmt.tail_call:
+			# Made by the trampoline of the calling function, at the same depth
+			function, arguments = self._evaluate_call(stmt.value)
+			self.stats.calls += 1
+			if isinstance(function, LoxFunction):
+				return TailCall(function, arguments)
+			return (self._call_native(stmt.value, function, arguments),)
+		return (self.evaluate(stmt.value) if stmt.value is not None else None,)
+
+	def visit_call(self, expr: Call) -> Any:
+		function, arguments = self._evaluate_call(expr)
+		stats = self.stats
+		stats.calls += 1
+		self._depth += 1
+		if self._depth > stats.peak_call_depth:
+			stats.peak_call_depth = self._depth
+		try:
+			return function.call(self, arguments)
+		except RecursionError:
+			raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
+		except NativeError as error:
+			raise LoxRuntimeError(expr.paren, error.message) from None
+		finally:
+			self._depth -= 1
@@ -0,0 +1,796 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any
+from app.types import TokenType, Token
+from app.utils import LoxRuntimeError, NativeError
+from app.grammar.expressions import Assign, Call, Expr, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+from app.interpreter import Interpreter, LoxCallable, NATIVES
+from app.output import Output
+
+FILENAME = "<lox>"
+INDENT = "    "
+
+# Python limits how deeply code can nest: an expression to 200 parentheses, and a function to 20
+# nested loops. Lox code nested deeper than this is moved into helper functions (see `_helper`).
+EXPRESSION_DEPTH = 32  # Lox expressions, each adding at most two parentheses
+LOOP_DEPTH = 16
+
+# Binding kinds
+GLOBAL = "global"  # Lox global, stored in the module namespace as `g_<name>`
+MODULE = "module"  # Local of a top-level block, stored in the module namespace as `l<n>_<name>`
+LOCAL = "local"    # Local of a Lox function, stored in a Python local as `l<n>_<name>`
+
+# Runtime helpers referenced by the generated code, and the error each one reports
+NUMBER_HELPERS = {
+	TokenType.MINUS: ("_subtract", "-"),
+	TokenType.STAR: ("_multiply", "*"),
+	TokenType.SLASH: ("_divide", "/"),
+	TokenType.GREATER: ("_greater", ">"),
+	TokenType.GREATER_EQUAL: ("_greater_equal", ">="),
+	TokenType.LESS: ("_less", "<"),
+	TokenType.LESS_EQUAL: ("_less_equal", "<="),
+}
+
+BOOLEAN_OPERATORS = {
+	TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL,
+	TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL,
+}
+
+# ----------- Runtime support for the generated code ---------------
+
+class Cell:
+	"""
+	Box for a local that is declared inside a loop and captured by a closure.
+	Python closures share one binding per function call, but Lox creates a new variable
+	on every iteration; the current cell is handed to the closure as a default argument.
+	"""
+	__slots__ = ("v",)
+
+	def __init__(self, value: Any):
+		self.v = value
+
+	def set(self, value: Any) -> Any:
+		self.v = value
+		return value
+
+class TranspiledFunction(LoxCallable):
+	"""Counterpart of LoxFunction wrapping the generated Python function."""
+	__slots__ = ("name", "arity_", "fn")
+
+	def __init__(self, name: str, arity: int, fn: Any):
+		self.name = name
+		self.arity_ = arity
+		self.fn = fn
+
+	def call(self, interpreter: Any, arguments: list) -> Any:
+		return self.fn(*arguments)
+
+	def arity(self) -> int:
+		return self.arity_
+
+	def __str__(self) -> str:
+		return f"<fn {self.name}>"
+
+def _is_number(value: Any) -> bool:
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _number_helper(apply):
+	def helper(left: Any, right: Any, token: Token) -> Any:
+		Interpreter._checkNumberOperands(token, left, right)
+		return apply(left, right)
+	return helper
+
+def _add(left: Any, right: Any, token: Token) -> Any:
+	if (isinstance(left, str) and isinstance(right, str)) or (_is_number(left) and _is_number(right)):
+		return left + right
+	raise LoxRuntimeError(token, "Operands must be two numbers or two strings.")
+
+def _negate(value: Any, token: Token) -> Any:
+	if _is_number(value):
+		return -value
+	raise LoxRuntimeError(token, "Operand must be a number.")
+
+# Returned by a helper function holding a loop when the loop ends without a Lox `return`
+NORMAL_COMPLETION = object()
+
+RUNTIME: dict[str, Any] = {
+	"_Cell": Cell,
+	"_Normal": NORMAL_COMPLETION,
+	"_Function": TranspiledFunction,
+	"_truthy": Interpreter._isTruthy,
+	"_add": _add,
+	"_negate": _negate,
+	"_subtract": _number_helper(lambda left, right: left - right),
+	"_multiply": _number_helper(lambda left, right: left * right),
+	"_divide": _number_helper(lambda left, right: left / right),
+	"_greater": _number_helper(lambda left, right: left > right),
+	"_greater_equal": _number_helper(lambda left, right: left >= right),
+	"_less": _number_helper(lambda left, right: left < right),
+	"_less_equal": _number_helper(lambda left, right: left <= right),
+}
+
+# ----------- Analysis ---------------
+
+@dataclass(eq=False)
+class Binding:
+	name: str                   # Python identifier
+	kind: str                   # GLOBAL, MODULE or LOCAL
+	owner: Function | None      # Lox function declaring the variable (None at top level)
+	in_loop: bool = False       # Declared inside a loop body of its owner
+	captured: bool = False      # Referenced from a nested function
+
+	@property
+	def is_cell(self) -> bool:
+		return self.captured and self.in_loop and self.kind != GLOBAL
+
+@dataclass
+class FunctionInfo:
+	# Dicts are used as ordered sets, to keep the generated code deterministic
+	globals: dict[str, None] = field(default_factory=dict)
+	nonlocals: dict[str, None] = field(default_factory=dict)
+	cells: dict[str, None] = field(default_factory=dict)
+
+class Analyzer(ExprVisitor, StmtVisitor):
+	"""
+	Maps every variable declaration and reference to a Binding (a unique Python name),
+	and finds what each generated Python function has to declare: `global` and `nonlocal`
+	names it assigns, and the Cells it has to receive as default arguments.
+	Scoping follows the Resolver.
+	"""
+	def __init__(self):
+		self.bindings: dict[int, Binding] = {} # id() of declaration token or Variable/Assign node -> Binding
+		self.functions: dict[int, FunctionInfo] = {} # id() of Function -> FunctionInfo
+		# Global writes that may happen before the `var` (checked at run time)
+		self.unchecked_writes: set[int] = set()
+		self.module_locals: list[Binding] = []
+		self._globals: dict[str, Binding] = {}
+		self._defined_globals: set[str] = set()
+		self._scopes: list[dict[str, Binding]] = []
+		self._function_chain: list[Function] = []
+		self._loop_depths: list[int] = [0]
+		self._counter = 0
+
+	def analyze(self, statements: list[Stmt]) -> None:
+		# Tables keyed by id() only describe the statements of this call: nodes of earlier calls may be gone
+		self.bindings.clear()
+		self.functions.clear()
+		self.unchecked_writes.clear()
+		self.module_locals.clear()
+		for statement in statements:
+			statement.accept(self)
+			# Top-level statements run in order: later ones can rely on these globals being defined
+			if isinstance(statement, (Var, Function)):
+				self._defined_globals.add(statement.name.lexeme)
+
+	def unique_name(self, prefix: str, name: str) -> str:
+		self._counter += 1
+		return f"{prefix}{self._counter}_{name}"
+
+	def _global(self, name: str) -> Binding:
+		if name not in self._globals:
+			self._globals[name] = Binding(f"g_{name}", GLOBAL, None)
+		return self._globals[name]
+
+	def _declare(self, name: Token) -> None:
+		if not self._scopes:
+			self.bindings[id(name)] = self._global(name.lexeme)
+			return
+		owner = self._function_chain[-1] if self._function_chain else None
+		binding = Binding(
+			self.unique_name("l", name.lexeme),
+			LOCAL if owner is not None else MODULE,
+			owner,
+			in_loop=self._loop_depths[-1] > 0,
+		)
+		self._scopes[-1][name.lexeme] = binding
+		self.bindings[id(name)] = binding
+		if binding.kind == MODULE:
+			self.module_locals.append(binding)
+
+	def _reference(self, expr: Variable | Assign, is_write: bool) -> None:
+		name = expr.name.lexeme
+		binding = None
+		for scope in reversed(self._scopes):
+			if name in scope:
+				binding = scope[name]
+				break
+		if binding is None:
+			binding = self._global(name)
+			if is_write and name not in self._defined_globals:
+				self.unchecked_writes.add(id(expr))
+		self.bindings[id(expr)] = binding
+
+		current = self._function_chain[-1] if self._function_chain else None
+		if binding.owner is current:
+			return
+
+		if binding.kind != GLOBAL:
+			binding.captured = True
+		if binding.is_cell:
+			# Every function between the owner and here receives the current cell as a default argument
+			start = 0 if binding.owner is None else self._function_chain.index(binding.owner) + 1
+			for function in self._function_chain[start:]:
+				self.functions[id(function)].cells[binding.name] = None
+		elif is_write:
+			info = self.functions[id(current)]
+			if binding.owner is None:
+				info.globals[binding.name] = None
+			else:
+				info.nonlocals[binding.name] = None
+
+	def visit_block_stmt(self, stmt: Block) -> Any:
+		self._scopes.append({})
+		for statement in stmt.statements:
+			statement.accept(self)
+		self._scopes.pop()
+
+	def visit_var_stmt(self, stmt: Var) -> Any:
+		if stmt.initializer is not None:
+			stmt.initializer.accept(self)
+		self._declare(stmt.name)
+
+	def visit_function_stmt(self, stmt: Function) -> Any:
+		self._declare(stmt.name)
+		self.functions[id(stmt)] = FunctionInfo()
+		self._function_chain.append(stmt)
+		self._loop_depths.append(0)
+		self._scopes.append({})
+		for param in stmt.params:
+			self._declare(param)
+		for statement in stmt.body:
+			statement.accept(self)
+		self._scopes.pop()
+		self._loop_depths.pop()
+		self._function_chain.pop()
+
+	def visit_while_stmt(self, stmt: While) -> Any:
+		stmt.condition.accept(self)
+		self._loop_depths[-1] += 1
+		stmt.body.accept(self)
+		self._loop_depths[-1] -= 1
+
+	def visit_if_stmt(self, stmt: If) -> Any:
+		stmt.condition.accept(self)
+		stmt.thenBranch.accept(self)
+		if stmt.elseBranch is not None:
+			stmt.elseBranch.accept(self)
+
+	def visit_expression_stmt(self, stmt: Expression) -> Any:
+		stmt.expression.accept(self)
+
+	def visit_print_stmt(self, stmt: Print) -> Any:
+		stmt.expression.accept(self)
+
+	def visit_return_stmt(self, stmt: Return) -> Any:
+		if stmt.value is not None:
+			stmt.value.accept(self)
+
+	def visit_variable(self, expr: Variable) -> Any:
+		self._reference(expr, is_write=False)
+
+	def visit_assign(self, expr: Assign) -> Any:
+		expr.value.accept(self)
+		self._reference(expr, is_write=True)
+
+	def visit_binary(self, expr: Binary) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_logical(self, expr: Logical) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_unary(self, expr: Unary) -> Any:
+		expr.right.accept(self)
+
+	def visit_grouping(self, expr: Grouping) -> Any:
+		expr.expression.accept(self)
+
+	def visit_call(self, expr: Call) -> Any:
+		expr.callee.accept(self)
+		for argument in expr.arguments:
+			argument.accept(self)
+
+	def visit_literal(self, expr: Literal) -> Any:
+		return None
+
+# ----------- Code generation ---------------
+
+@dataclass
+class PythonProgram:
+	"""
+	Output of the Transpiler.
+	`tokens` are the tokens used to report runtime errors, and `global_reads`
+	maps (generated line, Python name) to the token of the Lox global read on that line,
+	used to turn a NameError back into Lox's "Undefined variable" error. `calls` maps generated
+	lines to the parenthesis of a Lox call made on them, used to report a RecursionError as
+	Lox's "Stack overflow." error. `lines` holds the Lox line of each generated line.
+	`discarded` are the module-level names that are only used while the program runs: temporaries,
+	helper functions and locals of top-level blocks that no function captures.
+
+	The generated code refers to its program as `_T`, and to its tokens as `_T[i]`. Functions keep
+	the `_T` they were defined with as a default argument: the tables of a program live as long
+	as its functions, and errors in a function are reported with the tables of its own program.
+	"""
+	source: str
+	tokens: list[Token]
+	global_reads: dict[tuple[int, str], Token]
+	calls: dict[int, Token]
+	lines: list[int]
+	discarded: list[str]
+
+	def __getitem__(self, index: int) -> Token:
+		return self.tokens[index]
+
+@dataclass
+class HelperScope:
+	"""Python names that the code of a helper function binds, which it has to declare `global` or `nonlocal`."""
+	assigned: dict[str, Binding] = field(default_factory=dict) # Used as an ordered set
+	declared: set[str] = field(default_factory=set) # Lox variables declared in the helper itself
+
+	def declarations(self) -> list[str]:
+		globals = [binding.name for binding in self.assigned.values() if binding.kind != LOCAL]
+		nonlocals = [binding.name for binding in self.assigned.values() if binding.kind == LOCAL and binding.name not in self.declared]
+		declarations = [f"global {', '.join(globals)}"] if globals else []
+		if nonlocals:
+			declarations.append(f"nonlocal {', '.join(nonlocals)}")
+		return declarations
+
+class Transpiler(ExprVisitor, StmtVisitor):
+	"""
+	Translates a resolved Lox program into Python source code.
+
+	Lox semantics are kept by inlining the fast paths (float arithmetic, calls to Lox functions)
+	and falling back to the helpers in RUNTIME, which perform the same checks as the Interpreter.
+	Temporaries are introduced with assignment expressions, so that each operand is evaluated once.
+	Code nested deeper than Python allows is moved into helper functions.
+	"""
+	def __init__(self):
+		self._analyzer = Analyzer()
+		self._lines: list[str] = []
+		self._lox_lines: list[int] = []
+		self._line = 0 # Lox line of the statement being translated
+		self._indent = 0
+		self._depth = 0 # Nesting of the Lox expression being translated
+		self._loops = 0 # Nesting of loops in the Python function being generated
+		self._functions = 0 # Nesting of Lox functions
+		self._scope: HelperScope | None = None # Of the helper function being generated, if any
+		self._tokens: list[Token] = []
+		self._token_indexes: dict[int, int] = {}
+		self._pending_reads: list[tuple[str, Token]] = []
+		self._global_reads: dict[tuple[int, str], Token] = {}
+		self._pending_calls: list[Token] = []
+		self._calls: dict[int, Token] = {}
+		self._discarded: list[str] = []
+		self._temporaries = 0
+
+	def transpile(self, statements: list[Stmt]) -> PythonProgram:
+		"""
+		Can be called again with the next top-level statements of the same program: generated names
+		carry over, so that the resulting programs can run one after the other. Nothing else is
+		kept from one call to the next, so that a streamed program is translated in constant memory.
+		"""
+		self._lines = []
+		self._lox_lines = []
+		self._tokens = []
+		self._token_indexes = {}
+		self._global_reads = {}
+		self._calls = {}
+		self._discarded = []
+		self._analyzer.analyze(statements)
+		self._emit("# Generated from Lox source")
+		for statement in statements:
+			self._statement(statement)
+		self._discarded.extend(binding.name for binding in self._analyzer.module_locals if not binding.captured)
+		return PythonProgram(
+			"\n".join(self._lines) + "\n", self._tokens, self._global_reads, self._calls, self._lox_lines, self._discarded
+		)
+
+	# ----- Emitting code -----
+
+	def _emit(self, line: str) -> None:
+		self._lines.append(INDENT * self._indent + line)
+		self._lox_lines.append(self._line)
+		for name, token in self._pending_reads:
+			self._global_reads[(len(self._lines), name)] = token
+		self._pending_reads.clear()
+		for paren in self._pending_calls:
+			self._calls[len(self._lines)] = paren
+		self._pending_calls.clear()
+
+	def _emit_body(self, statements: list[Stmt]) -> None:
+		self._indent += 1
+		start = len(self._lines)
+		for statement in statements:
+			self._statement(statement)
+		if len(self._lines) == start:
+			self._emit("pass")
+		self._indent -= 1
+
+	def _token(self, token: Token) -> str:
+		if id(token) not in self._token_indexes:
+			self._token_indexes[id(token)] = len(self._tokens)
+			self._tokens.append(token)
+		return f"_T[{self._token_indexes[id(token)]}]"
+
+	def _temporary(self, prefix: str = "_t") -> str:
+		self._temporaries += 1
+		name = f"{prefix}{self._temporaries}"
+		if not self._functions and self._scope is None:
+			self._discarded.append(name)
+		return name
+
+	def _statement(self, stmt: Stmt) -> None:
+		line = self._line
+		self._line = stmt.line or line
+		stmt.accept(self)
+		self._line = line
+
+	def _expr(self, expr: Expr) -> str:
+		self._depth += 1
+		try:
+			if self._depth % EXPRESSION_DEPTH == 0 and not isinstance(expr, (Literal, Variable)):
+				return self._expression_helper(expr)
+			return expr.accept(self)
+		finally:
+			self._depth -= 1
+
+	def _bind(self, binding: Binding, declared: bool) -> None:
+		"""Records that the code being generated assigns the Python name of `binding`."""
+		if self._scope is not None:
+			self._scope.assigned[binding.name] = binding
+			if declared:
+				self._scope.declared.add(binding.name)
+
+	def _expression_helper(self, expr: Expr) -> str:
+		"""
+		Moves a deeply nested subexpression into a helper function without parameters, called where
+		the subexpression was: it is evaluated at the same point, and sees the same variables.
+		"""
+		outer_scope, outer_reads, outer_calls = self._scope, self._pending_reads, self._pending_calls
+		scope = HelperScope()
+		self._scope, self._pending_reads, self._pending_calls = scope, [], []
+		value = expr.accept(self)
+		reads, calls = self._pending_reads, self._pending_calls
+		self._scope, self._pending_reads, self._pending_calls = outer_scope, [], []
+
+		name = self._temporary("_e")
+		self._emit(f"def {name}(_T=_T):")
+		self._indent += 1
+		for declaration in scope.declarations():
+			self._emit(declaration)
+		self._pending_reads, self._pending_calls = reads, calls
+		self._emit(f"return {value}")
+		self._indent -= 1
+		self._pending_reads, self._pending_calls = outer_reads, outer_calls
+		return f"{name}()"
+
+	def _loop_helper(self, stmt: While) -> None:
+		"""
+		Moves a deeply nested loop into a helper function, called in its place. In a Lox function,
+		a `return` in the loop returns from the helper, and the caller returns the same value.
+		"""
+		name = self._temporary("_w")
+		self._emit(f"def {name}(_T=_T):")
+		self._indent += 1
+		# Reserved for the declarations, which are only known once the loop has been translated
+		self._emit("pass")
+		declarations_line = len(self._lines) - 1
+		outer_scope, outer_loops = self._scope, self._loops
+		self._scope, self._loops = HelperScope(), 0
+		self.visit_while_stmt(stmt)
+		if self._functions:
+			self._emit("return _Normal")
+		declarations = self._scope.declarations()
+		if declarations:
+			self._lines[declarations_line] = INDENT * self._indent + "; ".join(declarations)
+		self._scope, self._loops = outer_scope, outer_loops
+		self._indent -= 1
+
+		if self._functions:
+			temporary = self._temporary()
+			self._emit(f"if ({temporary} := {name}()) is not _Normal:")
+			self._emit(f"{INDENT}return {temporary}")
+		else:
+			self._emit(f"{name}()")
+
+	def _condition(self, expr: Expr) -> str:
+		if self._is_boolean(expr):
+			return self._expr(expr)
+		return f"_truthy({self._expr(expr)})"
+
+	def _is_boolean(self, expr: Expr) -> bool:
+		"""Whether the expression always evaluates to a Python bool (so Python truthiness applies)."""
+		match expr:
+			case Binary():
+				return expr.operator.type in BOOLEAN_OPERATORS
+			case Unary():
+				return expr.operator.type == TokenType.BANG
+			case Literal():
+				return isinstance(expr.value, bool)
+			case Grouping():
+				return self._is_boolean(expr.expression)
+			case Logical():
+				return self._is_boolean(expr.left) and self._is_boolean(expr.right)
+		return False
+
+	def _binding(self, node: Any) -> Binding:
+		return self._analyzer.bindings[id(node)]
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_expression_stmt(self, stmt: Expression) -> None:
+		expr = stmt.expression
+		if isinstance(expr, Assign):
+			# Plain assignment statement instead of an assignment expression
+			self._emit(self._assignment(expr, as_statement=True))
+		else:
+			self._emit(self._expr(expr))
+
+	def visit_print_stmt(self, stmt: Print) -> None:
+		self._emit(f"_print({self._expr(stmt.expression)})")
+
+	def visit_var_stmt(self, stmt: Var) -> None:
+		binding = self._binding(stmt.name)
+		value = self._expr(stmt.initializer) if stmt.initializer is not None else "None"
+		if binding.is_cell:
+			value = f"_Cell({value})"
+		self._bind(binding, declared=True)
+		self._emit(f"{binding.name} = {value}")
+
+	def visit_block_stmt(self, stmt: Block) -> None:
+		# Variables were given unique names, so a block needs no Python scope of its own
+		for statement in stmt.statements:
+			self._statement(statement)
+
+	def visit_if_stmt(self, stmt: If) -> None:
+		self._emit(f"if {self._condition(stmt.condition)}:")
+		self._emit_body([stmt.thenBranch])
+		if stmt.elseBranch is not None:
+			self._emit("else:")
+			self._emit_body([stmt.elseBranch])
+
+	def visit_while_stmt(self, stmt: While) -> None:
+		if self._loops == LOOP_DEPTH:
+			self._loop_helper(stmt)
+			return
+		self._emit(f"while {self._condition(stmt.condition)}:")
+		self._loops += 1
+		self._emit_body([stmt.body])
+		self._loops -= 1
+
+	def visit_function_stmt(self, stmt: Function) -> None:
+		binding = self._binding(stmt.name)
+		info = self._analyzer.functions[id(stmt)]
+		function_name = self._analyzer.unique_name("f", stmt.name.lexeme)
+		if not self._functions and self._scope is None:
+			self._discarded.append(function_name) # Only referenced through the _Function
+
+		parameters = [self._binding(param).name for param in stmt.params]
+		parameters.append("_T=_T") # Never passed: calls check the arity
+		if info.cells:
+			parameters.append("*")
+			parameters.extend(f"{cell}={cell}" for cell in info.cells)
+
+		self._bind(binding, declared=True)
+		if binding.is_cell:
+			# Created first, so that the function can capture itself
+			self._emit(f"{binding.name} = _Cell(None)")
+		self._emit(f"def {function_name}({', '.join(parameters)}):")
+		self._indent += 1
+		if info.globals:
+			self._emit(f"global {', '.join(info.globals)}")
+		if info.nonlocals:
+			self._emit(f"nonlocal {', '.join(info.nonlocals)}")
+		self._indent -= 1
+		# The body is a Python function of its own, which declares what it assigns
+		outer = self._scope, self._loops
+		self._scope, self._loops = None, 0
+		self._functions += 1
+		self._emit_body(stmt.body)
+		self._functions -= 1
+		self._scope, self._loops = outer
+
+		value = f"_Function({stmt.name.lexeme!r}, {len(stmt.params)}, {function_name})"
+		if binding.is_cell:
+			self._emit(f"{binding.name}.v = {value}")
+		else:
+			self._emit(f"{binding.name} = {value}")
+
+	def visit_return_stmt(self, stmt: Return) -> None:
+		if stmt.value is None:
+			self._emit("return None")
+		else:
+			self._emit(f"return {self._expr(stmt.value)}")
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_literal(self, expr: Literal) -> str:
+		value = expr.value
+		if isinstance(value, float) and not math.isfinite(value):
+			return f"float({repr(value)!r})"
+		return repr(value)
+
+	def visit_grouping(self, expr: Grouping) -> str:
+		return self._expr(expr.expression)
+
+	def visit_variable(self, expr: Variable) -> str:
+		binding = self._binding(expr)
+		if binding.kind == GLOBAL:
+			self._pending_reads.append((binding.name, expr.name))
+		if binding.is_cell:
+			return f"{binding.name}.v"
+		return binding.name
+
+	def visit_assign(self, expr: Assign) -> str:
+		return self._assignment(expr, as_statement=False)
+
+	def _assignment(self, expr: Assign, as_statement: bool) -> str:
+		binding = self._binding(expr)
+		value = self._expr(expr.value)
+		if id(expr) in self._analyzer.unchecked_writes:
+			value = f"_assign_global({value}, {binding.name!r}, {self._token(expr.name)})"
+		if not binding.is_cell:
+			self._bind(binding, declared=False)
+		if binding.is_cell:
+			return f"{binding.name}.v = {value}" if as_statement else f"{binding.name}.set({value})"
+		return f"{binding.name} = {value}" if as_statement else f"({binding.name} := {value})"
+
+	def visit_logical(self, expr: Logical) -> str:
+		left = self._expr(expr.left)
+		right = self._expr(expr.right)
+		keyword = "or" if expr.operator.type == TokenType.OR else "and"
+
+		if self._is_boolean(expr.left) and self._is_boolean(expr.right):
+			return f"({left} {keyword} {right})"
+
+		temporary = self._temporary()
+		if keyword == "or":
+			return f"({temporary} if _truthy({temporary} := {left}) else {right})"
+		return f"({right} if _truthy({temporary} := {left}) else {temporary})"
+
+	def visit_unary(self, expr: Unary) -> str:
+		if expr.operator.type == TokenType.BANG:
+			return f"(not {self._condition(expr.right)})"
+
+		if isinstance(expr.right, Literal) and isinstance(expr.right.value, float):
+			return f"({-expr.right.value!r})"
+		temporary = self._temporary()
+		right = self._expr(expr.right)
+		return f"(-{temporary} if ({temporary} := {right}).__class__ is float else _negate({temporary}, {self._token(expr.operator)}))"
+
+	def visit_binary(self, expr: Binary) -> str:
+		operator = expr.operator
+		left = self._expr(expr.left)
+		right = self._expr(expr.right)
+
+		if operator.type == TokenType.EQUAL_EQUAL:
+			return f"({left} == {right})"
+		if operator.type == TokenType.BANG_EQUAL:
+			return f"({left} != {right})"
+
+		if operator.type == TokenType.PLUS:
+			helper, symbol = "_add", "+"
+		else:
+			helper, symbol = NUMBER_HELPERS[operator.type]
+		token = self._token(operator)
+		left_temporary = self._temporary()
+
+		constant = expr.right.value if isinstance(expr.right, Literal) else None
+		if isinstance(constant, float) or (isinstance(constant, str) and symbol == "+"):
+			# Only the left operand needs a type check
+			expected = type(constant).__name__
+			return (
+				f"({left_temporary} {symbol} {right} if ({left_temporary} := {left}).__class__ is {expected} "
+				f"else {helper}({left_temporary}, {right}, {token}))"
+			)
+
+		right_temporary = self._temporary()
+		return (
+			f"({left_temporary} {symbol} {right_temporary} "
+			f"if ({left_temporary} := {left}).__class__ is ({right_temporary} := {right}).__class__ is float "
+			f"else {helper}({left_temporary}, {right_temporary}, {token}))"
+		)
+
+	def visit_call(self, expr: Call) -> str:
+		# The callee is picked first and the arguments are written once: natives, non-callables
+		# and arity mismatches go through `_slow_call`, which checks after the arguments are evaluated.
+		callee = self._expr(expr.callee)
+		arguments = ", ".join(self._expr(argument) for argument in expr.arguments)
+		temporary = self._temporary()
+		self._pending_calls.append(expr.paren)
+		return (
+			f"({temporary}.fn if ({temporary} := {callee}).__class__ is _Function and {temporary}.arity_ == {len(expr.arguments)} "
+			f"else _slow_call({temporary}, {self._token(expr.paren)}))({arguments})"
+		)
+
+# ----------- Execution ---------------
+
+class PythonEngine:
+	"""
+	Runs a transpiled program with compile()/exec(), so that CPython's own bytecode interpreter does the dispatch.
+	"""
+	def __init__(self, output: Output | None = None):
+		self._output = output if output is not None else Output()
+		self._namespace: dict[str, Any] = dict(RUNTIME)
+		self._namespace["_print"] = self._print
+		self._namespace["_slow_call"] = self._slow_call
+		self._namespace["_assign_global"] = self._assign_global
+
+		# We define native functions here
+		for name, native in NATIVES.items():
+			self._namespace[f"g_{name}"] = native
+
+	def interpret(self, program: PythonProgram) -> None:
+		try:
+			code = compile(program.source, FILENAME, "exec")
+		except (SyntaxError, RecursionError, MemoryError) as error:
+			# Code nested deeper than the Transpiler can flatten, such as a hundred nested `if`s
+			lineno = error.lineno if isinstance(error, SyntaxError) and error.lineno else 1
+			line = program.lines[lineno - 1] or next(filter(None, program.lines), 0)
+			raise LoxRuntimeError(Token(TokenType.EOF, "", None, line), "Program too deeply nested for the python engine.") from None
+		self._namespace["_T"] = program
+		try:
+			exec(code, self._namespace)
+		except NameError as error:
+			token = self._undefined_variable_token(error)
+			if token is None:
+				raise
+			raise LoxRuntimeError(token, f"Undefined variable '{token.lexeme}'.") from None
+		except RecursionError as error:
+			token = self._deepest_call_token(error)
+			if token is None:
+				raise
+			raise LoxRuntimeError(token, "Stack overflow.") from None
+		finally:
+			for name in program.discarded:
+				self._namespace.pop(name, None)
+			self._output.flush()
+
+	def _print(self, value: Any) -> None:
+		self._output.write_line(Interpreter._stringify(value))
+
+	def _slow_call(self, callee: Any, paren: Token) -> Any:
+		def call(*arguments: Any) -> Any:
+			if not isinstance(callee, LoxCallable):
+				raise LoxRuntimeError(paren, "Can only call functions and classes.")
+			if len(arguments) != callee.arity():
+				raise LoxRuntimeError(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+			try:
+				return callee.call(self, list(arguments))
+			except NativeError as error:
+				raise LoxRuntimeError(paren, error.message) from None
+		return call
+
+	def _assign_global(self, value: Any, name: str, token: Token) -> Any:
+		if name not in self._namespace:
+			raise LoxRuntimeError(token, f"Undefined variable '{token.lexeme}'.")
+		return value
+
+	@staticmethod
+	def _generated_frames(error: Exception) -> list[tuple[PythonProgram, int]]:
+		"""The frames of generated code in the traceback, innermost last, with their program and line."""
+		frames = []
+		entry = error.__traceback__
+		while entry is not None:
+			frame = entry.tb_frame
+			if frame.f_code.co_filename == FILENAME:
+				frames.append((frame.f_locals["_T"], entry.tb_lineno))
+			entry = entry.tb_next
+		return frames
+
+	@classmethod
+	def _undefined_variable_token(cls, error: NameError) -> Token | None:
+		frames = cls._generated_frames(error)
+		if not frames:
+			return None
+		program, lineno = frames[-1]
+		return program.global_reads.get((lineno, error.name))
+
+	@classmethod
+	def _deepest_call_token(cls, error: RecursionError) -> Token | None:
+		for program, lineno in reversed(cls._generated_frames(error)):
+			if lineno in program.calls:
+				return program.calls[lineno]
+		return None
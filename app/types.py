@@ -23,7 +23,7 @@ TokenType = Enum("TokenType", [
     "EOF"
 ])
 
-@dataclass
+@dataclass(slots=True)
 class Token():
     type: TokenType
     lexeme: str
@@ -32,6 +32,24 @@ class LoxRuntimeError(RuntimeError):
 		self.message = message
 		self.token = token
 
-class ReturnException(Exception):
-    def __init__(self, value):
-        self.value = value
+class NativeError(Exception):
+	"""
+	Raised by a native function, which does not know where it is called from: the engine that
+	made the call reports it as a LoxRuntimeError at the call.
+	"""
+	message: str
+
+	def __init__(self, message: str):
+		super().__init__(message)
+		self.message = message
+
+class TailCall:
+	"""
+	Completion of a `return` in tail position: the enclosing LoxFunction.call makes the call
+	itself instead of nesting it (see `Return.tail_call`).
+	"""
+	__slots__ = ("function", "arguments")
+
+	def __init__(self, function, arguments: list):
+		self.function = function
+		self.arguments = arguments
@@ -0,0 +1,422 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any
+from app.types import Token, TokenType
+from app.grammar.expressions import Assign, Call, Expr, Grouping, Binary, Logical, Unary, Literal, ExprVisitor, Variable
+from app.grammar.statements import Function, Return, Stmt, Print, Expression, StmtVisitor, Var, Block, If, While
+from app.vm.opcodes import (
+	CONSTANT, GET_LOCAL, SET_LOCAL, STORE_LOCAL, GET_CELL, SET_CELL, STORE_CELL, MAKE_CELL, GET_FREE, SET_FREE,
+	GET_GLOBAL, SET_GLOBAL, DEFINE_GLOBAL, JUMP, POP_JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+	CALL, CLOSURE, CELL_PARAM, POP, ADD, SUBTRACT, MULTIPLY, DIVIDE, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL,
+	EQUAL, NOT_EQUAL, NEGATE, NOT, PRINT, RETURN, HAS_OPERAND, OPCODE_NAMES,
+)
+
+BINARY_OPCODES = {
+	TokenType.PLUS: ADD,
+	TokenType.MINUS: SUBTRACT,
+	TokenType.STAR: MULTIPLY,
+	TokenType.SLASH: DIVIDE,
+	TokenType.GREATER: GREATER,
+	TokenType.GREATER_EQUAL: GREATER_EQUAL,
+	TokenType.LESS: LESS,
+	TokenType.LESS_EQUAL: LESS_EQUAL,
+	TokenType.EQUAL_EQUAL: EQUAL,
+	TokenType.BANG_EQUAL: NOT_EQUAL,
+}
+
+@dataclass(eq=False)
+class FunctionProto:
+	"""
+	The compiled form of a function (or of the top-level script).
+
+	`tokens` maps the position of every instruction that can fail at runtime to the token
+	used to report the error. `free_sources` tells the CLOSURE instruction where to take each
+	captured cell from: `(True, slot)` for a local of the enclosing function, `(False, index)`
+	for one of its own free variables.
+	"""
+	name: str
+	arity: int = 0
+	code: list[int] = field(default_factory=list)
+	constants: list[Any] = field(default_factory=list)
+	tokens: dict[int, Token] = field(default_factory=dict)
+	local_count: int = 0
+	free_sources: list[tuple[bool, int]] = field(default_factory=list)
+
+	def disassemble(self) -> str:
+		lines = [f"== {self.name} =="]
+		ip = 0
+		while ip < len(self.code):
+			op = self.code[ip]
+			if op < HAS_OPERAND:
+				lines.append(f"{ip:04} {OPCODE_NAMES[op]:<22} {self.code[ip + 1]}")
+				ip += 2
+			else:
+				lines.append(f"{ip:04} {OPCODE_NAMES[op]}")
+				ip += 1
+		for constant in self.constants:
+			if isinstance(constant, FunctionProto):
+				lines.append(constant.disassemble())
+		return "\n".join(lines)
+
+class CaptureAnalyzer(ExprVisitor, StmtVisitor):
+	"""
+	Finds the local variables that are referenced from a nested function.
+	Those are stored in cells by the VM, so that closures share them with the declaring function
+	(and get a fresh one every time the declaration runs, e.g. once per loop iteration).
+
+	Declarations are identified by the `id()` of their name token.
+	"""
+	def __init__(self):
+		self.captured: set[int] = set()
+		# Each scope maps a name to (declaration id, function depth)
+		self._scopes: list[dict[str, tuple[int, int]]] = []
+		self._function_depth = 0
+
+	def analyze(self, statements: list[Stmt]) -> set[int]:
+		for statement in statements:
+			statement.accept(self)
+		return self.captured
+
+	def _declare(self, name: Token) -> None:
+		if self._scopes:
+			self._scopes[-1][name.lexeme] = (id(name), self._function_depth)
+
+	def _reference(self, name: Token) -> None:
+		for scope in reversed(self._scopes):
+			if name.lexeme in scope:
+				declaration, function_depth = scope[name.lexeme]
+				if function_depth < self._function_depth:
+					self.captured.add(declaration)
+				return
+
+	def visit_block_stmt(self, stmt: Block) -> Any:
+		self._scopes.append({})
+		for statement in stmt.statements:
+			statement.accept(self)
+		self._scopes.pop()
+
+	def visit_var_stmt(self, stmt: Var) -> Any:
+		if stmt.initializer is not None:
+			stmt.initializer.accept(self)
+		self._declare(stmt.name)
+
+	def visit_function_stmt(self, stmt: Function) -> Any:
+		self._declare(stmt.name)
+		self._function_depth += 1
+		self._scopes.append({})
+		for param in stmt.params:
+			self._declare(param)
+		for statement in stmt.body:
+			statement.accept(self)
+		self._scopes.pop()
+		self._function_depth -= 1
+
+	def visit_expression_stmt(self, stmt: Expression) -> Any:
+		stmt.expression.accept(self)
+
+	def visit_print_stmt(self, stmt: Print) -> Any:
+		stmt.expression.accept(self)
+
+	def visit_return_stmt(self, stmt: Return) -> Any:
+		if stmt.value is not None:
+			stmt.value.accept(self)
+
+	def visit_if_stmt(self, stmt: If) -> Any:
+		stmt.condition.accept(self)
+		stmt.thenBranch.accept(self)
+		if stmt.elseBranch is not None:
+			stmt.elseBranch.accept(self)
+
+	def visit_while_stmt(self, stmt: While) -> Any:
+		stmt.condition.accept(self)
+		stmt.body.accept(self)
+
+	def visit_variable(self, expr: Variable) -> Any:
+		self._reference(expr.name)
+
+	def visit_assign(self, expr: Assign) -> Any:
+		expr.value.accept(self)
+		self._reference(expr.name)
+
+	def visit_binary(self, expr: Binary) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_logical(self, expr: Logical) -> Any:
+		expr.left.accept(self)
+		expr.right.accept(self)
+
+	def visit_unary(self, expr: Unary) -> Any:
+		expr.right.accept(self)
+
+	def visit_grouping(self, expr: Grouping) -> Any:
+		expr.expression.accept(self)
+
+	def visit_call(self, expr: Call) -> Any:
+		expr.callee.accept(self)
+		for argument in expr.arguments:
+			argument.accept(self)
+
+	def visit_literal(self, expr: Literal) -> Any:
+		return None
+
+@dataclass
+class LocalVariable:
+	slot: int
+	captured: bool
+
+class Compiler(ExprVisitor, StmtVisitor):
+	"""
+	Compiles the AST of a program into bytecode for the VM (see app/vm/machine.py).
+
+	One Compiler instance is used per function; nested functions get their own Compiler
+	whose `enclosing` points to the compiler of the surrounding function.
+	Scoping follows the Resolver: anything that is not found in an enclosing local scope is a global.
+	"""
+	def __init__(self, proto: FunctionProto, captured: set[int], enclosing: 'Compiler | None' = None):
+		self._proto = proto
+		self._captured = captured
+		self._enclosing = enclosing
+		self._scopes: list[dict[str, LocalVariable]] = []
+		self._local_count = 0
+		self._free: dict[str, int] = {}
+		self._constant_indexes: dict[tuple[type, Any], int] = {}
+
+	@classmethod
+	def compile(cls, statements: list[Stmt]) -> FunctionProto:
+		proto = FunctionProto("script")
+		compiler = cls(proto, CaptureAnalyzer().analyze(statements))
+		for statement in statements:
+			compiler._compile_stmt(statement)
+		compiler._emit_return(None)
+		return proto
+
+	# ----- Emitting code -----
+
+	def _emit(self, op: int, operand: int | None = None, token: Token | None = None) -> int:
+		code = self._proto.code
+		position = len(code)
+		if token is not None:
+			self._proto.tokens[position] = token
+		code.append(op)
+		if operand is not None:
+			code.append(operand)
+		return position
+
+	def _emit_jump(self, op: int) -> int:
+		"""Emits a jump with a placeholder target and returns the position of the target, to patch later."""
+		return self._emit(op, -1) + 1
+
+	def _patch_jump(self, position: int) -> None:
+		self._proto.code[position] = len(self._proto.code)
+
+	def _make_constant(self, value: Any) -> int:
+		constants = self._proto.constants
+		if isinstance(value, FunctionProto):
+			constants.append(value)
+			return len(constants) - 1
+		# Keyed by type too, since 1.0 == True in Python, and by sign, since -0.0 == 0.0
+		key = (type(value), value, math.copysign(1.0, value)) if isinstance(value, float) else (type(value), value)
+		if key not in self._constant_indexes:
+			self._constant_indexes[key] = len(constants)
+			constants.append(value)
+		return self._constant_indexes[key]
+
+	def _emit_return(self, value: Any) -> None:
+		self._emit(CONSTANT, self._make_constant(value))
+		self._emit(RETURN)
+
+	# ----- Scopes and variables -----
+
+	def _begin_scope(self) -> None:
+		self._scopes.append({})
+
+	def _end_scope(self) -> None:
+		# Slots are reused by later scopes: every declaration initializes its slot (or creates a new cell)
+		self._local_count -= len(self._scopes.pop())
+
+	def _declare_local(self, name: Token) -> LocalVariable:
+		local = LocalVariable(self._local_count, id(name) in self._captured)
+		self._scopes[-1][name.lexeme] = local
+		self._local_count += 1
+		self._proto.local_count = max(self._proto.local_count, self._local_count)
+		return local
+
+	def _resolve_local(self, name: str) -> LocalVariable | None:
+		for scope in reversed(self._scopes):
+			if name in scope:
+				return scope[name]
+		return None
+
+	def _resolve_free(self, name: str) -> int | None:
+		if name in self._free:
+			return self._free[name]
+		if self._enclosing is None:
+			return None
+
+		local = self._enclosing._resolve_local(name)
+		if local is not None:
+			source = (True, local.slot)
+		else:
+			index = self._enclosing._resolve_free(name)
+			if index is None:
+				return None
+			source = (False, index)
+
+		self._proto.free_sources.append(source)
+		self._free[name] = len(self._proto.free_sources) - 1
+		return self._free[name]
+
+	def _define_variable(self, name: Token) -> None:
+		"""Stores the value on top of the stack into a newly declared variable."""
+		if not self._scopes:
+			self._emit(DEFINE_GLOBAL, self._make_constant(name.lexeme))
+			return
+		local = self._declare_local(name)
+		self._emit(MAKE_CELL if local.captured else STORE_LOCAL, local.slot)
+
+	def _compile_stmt(self, stmt: Stmt) -> None:
+		stmt.accept(self)
+
+	def _compile_expr(self, expr: Expr) -> None:
+		expr.accept(self)
+
+	# ----- Handles statements (StmtVisitor) -----
+
+	def visit_expression_stmt(self, stmt: Expression) -> None:
+		self._compile_expr(stmt.expression)
+		self._emit(POP)
+
+	def visit_print_stmt(self, stmt: Print) -> None:
+		self._compile_expr(stmt.expression)
+		self._emit(PRINT)
+
+	def visit_var_stmt(self, stmt: Var) -> None:
+		if stmt.initializer is not None:
+			self._compile_expr(stmt.initializer)
+		else:
+			self._emit(CONSTANT, self._make_constant(None))
+		self._define_variable(stmt.name)
+
+	def visit_block_stmt(self, stmt: Block) -> None:
+		self._begin_scope()
+		for statement in stmt.statements:
+			self._compile_stmt(statement)
+		self._end_scope()
+
+	def visit_if_stmt(self, stmt: If) -> None:
+		self._compile_expr(stmt.condition)
+		else_jump = self._emit_jump(POP_JUMP_IF_FALSE)
+		self._compile_stmt(stmt.thenBranch)
+		if stmt.elseBranch is None:
+			self._patch_jump(else_jump)
+			return
+		end_jump = self._emit_jump(JUMP)
+		self._patch_jump(else_jump)
+		self._compile_stmt(stmt.elseBranch)
+		self._patch_jump(end_jump)
+
+	def visit_while_stmt(self, stmt: While) -> None:
+		loop_start = len(self._proto.code)
+		self._compile_expr(stmt.condition)
+		exit_jump = self._emit_jump(POP_JUMP_IF_FALSE)
+		self._compile_stmt(stmt.body)
+		self._emit(JUMP, loop_start)
+		self._patch_jump(exit_jump)
+
+	def visit_function_stmt(self, stmt: Function) -> None:
+		if not self._scopes:
+			self._emit_closure(stmt)
+			self._emit(DEFINE_GLOBAL, self._make_constant(stmt.name.lexeme))
+			return
+
+		# Declared before the body is compiled, so that the function can refer to itself
+		local = self._declare_local(stmt.name)
+		if local.captured:
+			self._emit(CONSTANT, self._make_constant(None))
+			self._emit(MAKE_CELL, local.slot)
+			self._emit_closure(stmt)
+			self._emit(STORE_CELL, local.slot)
+		else:
+			self._emit_closure(stmt)
+			self._emit(STORE_LOCAL, local.slot)
+
+	def _emit_closure(self, stmt: Function) -> None:
+		proto = FunctionProto(stmt.name.lexeme, arity=len(stmt.params))
+		compiler = Compiler(proto, self._captured, enclosing=self)
+		compiler._begin_scope()
+		for param in stmt.params:
+			local = compiler._declare_local(param)
+			if local.captured:
+				compiler._emit(CELL_PARAM, local.slot)
+		for statement in stmt.body:
+			compiler._compile_stmt(statement)
+		compiler._emit_return(None)
+		self._emit(CLOSURE, self._make_constant(proto))
+
+	def visit_return_stmt(self, stmt: Return) -> None:
+		if stmt.value is None:
+			self._emit_return(None)
+			return
+		self._compile_expr(stmt.value)
+		self._emit(RETURN)
+
+	# ----- Handles expressions (ExprVisitor) -----
+
+	def visit_literal(self, expr: Literal) -> None:
+		self._emit(CONSTANT, self._make_constant(expr.value))
+
+	def visit_grouping(self, expr: Grouping) -> None:
+		self._compile_expr(expr.expression)
+
+	def visit_unary(self, expr: Unary) -> None:
+		self._compile_expr(expr.right)
+		if expr.operator.type == TokenType.MINUS:
+			self._emit(NEGATE, token=expr.operator)
+		else:
+			self._emit(NOT)
+
+	def visit_binary(self, expr: Binary) -> None:
+		self._compile_expr(expr.left)
+		self._compile_expr(expr.right)
+		self._emit(BINARY_OPCODES[expr.operator.type], token=expr.operator)
+
+	def visit_logical(self, expr: Logical) -> None:
+		self._compile_expr(expr.left)
+		if expr.operator.type == TokenType.OR:
+			end_jump = self._emit_jump(JUMP_IF_TRUE_OR_POP)
+		else:
+			end_jump = self._emit_jump(JUMP_IF_FALSE_OR_POP)
+		self._compile_expr(expr.right)
+		self._patch_jump(end_jump)
+
+	def visit_call(self, expr: Call) -> None:
+		self._compile_expr(expr.callee)
+		for argument in expr.arguments:
+			self._compile_expr(argument)
+		self._emit(CALL, len(expr.arguments), token=expr.paren)
+
+	def visit_variable(self, expr: Variable) -> None:
+		name = expr.name
+		local = self._resolve_local(name.lexeme)
+		if local is not None:
+			self._emit(GET_CELL if local.captured else GET_LOCAL, local.slot)
+			return
+		free = self._resolve_free(name.lexeme)
+		if free is not None:
+			self._emit(GET_FREE, free)
+			return
+		self._emit(GET_GLOBAL, self._make_constant(name.lexeme), token=name)
+
+	def visit_assign(self, expr: Assign) -> None:
+		self._compile_expr(expr.value)
+		name = expr.name
+		local = self._resolve_local(name.lexeme)
+		if local is not None:
+			self._emit(SET_CELL if local.captured else SET_LOCAL, local.slot)
+			return
+		free = self._resolve_free(name.lexeme)
+		if free is not None:
+			self._emit(SET_FREE, free)
+			return
+		self._emit(SET_GLOBAL, self._make_constant(name.lexeme), token=name)
@@ -0,0 +1,309 @@
+from typing import Any
+from app.types import Token
+from app.utils import LoxRuntimeError, NativeError
+from app.interpreter import Interpreter, LoxCallable, NATIVES
+from app.output import Output
+from app.vm.compiler import FunctionProto
+from app.vm.opcodes import (
+	CONSTANT, GET_LOCAL, SET_LOCAL, STORE_LOCAL, GET_CELL, SET_CELL, STORE_CELL, MAKE_CELL, GET_FREE, SET_FREE,
+	GET_GLOBAL, SET_GLOBAL, DEFINE_GLOBAL, JUMP, POP_JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+	CALL, CLOSURE, CELL_PARAM, POP, ADD, SUBTRACT, MULTIPLY, DIVIDE, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL,
+	EQUAL, NOT_EQUAL, NEGATE, NOT, PRINT, RETURN,
+)
+
+FRAMES_MAX = 100_000
+
+_isTruthy = Interpreter._isTruthy
+
+class Cell:
+	"""Box for a local variable that is captured by a closure."""
+	__slots__ = ("value",)
+
+	def __init__(self, value: Any = None):
+		self.value = value
+
+class Closure(LoxCallable):
+	"""A function value of the VM: its compiled code plus the cells it captured."""
+	__slots__ = ("proto", "free")
+
+	def __init__(self, proto: FunctionProto, free: list[Cell]):
+		self.proto = proto
+		self.free = free
+
+	def arity(self) -> int:
+		return self.proto.arity
+
+	def call(self, interpreter: 'VM', arguments: list) -> Any:
+		return interpreter.call_closure(self, arguments)
+
+	def __str__(self) -> str:
+		return f"<fn {self.proto.name}>"
+
+def _is_number(value: Any) -> bool:
+	# bool is a subclass of int in Python, hence the explicit exclusion
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class VM:
+	"""
+	Stack-based virtual machine that runs the bytecode produced by app/vm/compiler.py.
+
+	Lox calls do not recurse in Python: each call pushes a frame (caller closure, return
+	address and locals) on `frames`, so the depth of Lox recursion is only bounded by `max_depth`,
+	past which a "Stack overflow." runtime error is raised.
+	Output and runtime errors are the same as those of the tree-walking Interpreter.
+	"""
+	def __init__(self, output: Output | None = None, max_depth: int = FRAMES_MAX):
+		self._globals: dict[str, Any] = {}
+		self._stack: list[Any] = []
+		self._output = output if output is not None else Output()
+		self._max_depth = max_depth
+
+		# We define native functions here
+		self._globals.update(NATIVES)
+
+	def interpret(self, script: FunctionProto) -> None:
+		try:
+			self._run(Closure(script, []), [])
+		finally:
+			self._output.flush()
+
+	def call_closure(self, closure: Closure, arguments: list) -> Any:
+		"""Entry point for natives calling back into Lox code."""
+		return self._run(closure, arguments)
+
+	def _run(self, closure: Closure, arguments: list) -> Any:
+		stack = self._stack
+		push = stack.append
+		pop = stack.pop
+		globals_ = self._globals
+		write_line = self._output.write_line
+		max_depth = self._max_depth
+		frames: list[tuple[Closure, int, list]] = []
+
+		proto = closure.proto
+		code = proto.code
+		constants = proto.constants
+		free = closure.free
+		locals_ = arguments + [None] * (proto.local_count - len(arguments))
+		ip = 0
+
+		while True:
+			op = code[ip]
+
+			if op == GET_LOCAL:
+				push(locals_[code[ip + 1]])
+				ip += 2
+			elif op == CONSTANT:
+				push(constants[code[ip + 1]])
+				ip += 2
+			elif op == STORE_LOCAL:
+				locals_[code[ip + 1]] = pop()
+				ip += 2
+			elif op == POP_JUMP_IF_FALSE:
+				value = pop()
+				if value is False or value is None or (value is not True and not _isTruthy(value)):
+					ip = code[ip + 1]
+				else:
+					ip += 2
+			elif op == ADD:
+				right = pop()
+				left = stack[-1]
+				if left.__class__ is float and right.__class__ is float:
+					stack[-1] = left + right
+				elif isinstance(left, str) and isinstance(right, str):
+					stack[-1] = left + right
+				elif _is_number(left) and _is_number(right):
+					stack[-1] = left + right
+				else:
+					raise LoxRuntimeError(proto.tokens[ip], "Operands must be two numbers or two strings.")
+				ip += 1
+			elif op == SUBTRACT:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left - right
+				ip += 1
+			elif op == LESS:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left < right
+				ip += 1
+			elif op == GET_GLOBAL:
+				name = constants[code[ip + 1]]
+				if name not in globals_:
+					raise LoxRuntimeError(proto.tokens[ip], f"Undefined variable '{name}'.")
+				push(globals_[name])
+				ip += 2
+			elif op == CALL:
+				argc = code[ip + 1]
+				callee = stack[-argc - 1]
+				if callee.__class__ is Closure:
+					callee_proto = callee.proto
+					if argc != callee_proto.arity:
+						raise LoxRuntimeError(
+							proto.tokens[ip], f"Expected {callee_proto.arity} arguments but got {argc}."
+						)
+					if len(frames) >= max_depth:
+						raise LoxRuntimeError(proto.tokens[ip], "Stack overflow.")
+					frames.append((closure, ip + 2, locals_))
+					if argc:
+						locals_ = stack[-argc:]
+						del stack[-argc - 1:]
+					else:
+						locals_ = []
+						pop()
+					if callee_proto.local_count > argc:
+						locals_.extend([None] * (callee_proto.local_count - argc))
+					closure = callee
+					proto = callee_proto
+					code = proto.code
+					constants = proto.constants
+					free = closure.free
+					ip = 0
+				else:
+					arguments = stack[len(stack) - argc:]
+					del stack[-argc - 1:]
+					push(self._call_native(proto.tokens[ip], callee, arguments))
+					ip += 2
+			elif op == RETURN:
+				if not frames:
+					return pop()
+				closure, ip, locals_ = frames.pop()
+				proto = closure.proto
+				code = proto.code
+				constants = proto.constants
+				free = closure.free
+			elif op == SET_LOCAL:
+				locals_[code[ip + 1]] = stack[-1]
+				ip += 2
+			elif op == POP:
+				pop()
+				ip += 1
+			elif op == JUMP:
+				ip = code[ip + 1]
+			elif op == GET_CELL:
+				push(locals_[code[ip + 1]].value)
+				ip += 2
+			elif op == GET_FREE:
+				push(free[code[ip + 1]].value)
+				ip += 2
+			elif op == SET_CELL:
+				locals_[code[ip + 1]].value = stack[-1]
+				ip += 2
+			elif op == SET_FREE:
+				free[code[ip + 1]].value = stack[-1]
+				ip += 2
+			elif op == MULTIPLY:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left * right
+				ip += 1
+			elif op == DIVIDE:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left / right
+				ip += 1
+			elif op == GREATER:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left > right
+				ip += 1
+			elif op == GREATER_EQUAL:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left >= right
+				ip += 1
+			elif op == LESS_EQUAL:
+				right = pop()
+				left = stack[-1]
+				if not (left.__class__ is float and right.__class__ is float):
+					self._check_number_operands(proto.tokens[ip], left, right)
+				stack[-1] = left <= right
+				ip += 1
+			elif op == EQUAL:
+				right = pop()
+				stack[-1] = stack[-1] == right
+				ip += 1
+			elif op == NOT_EQUAL:
+				right = pop()
+				stack[-1] = stack[-1] != right
+				ip += 1
+			elif op == NOT:
+				stack[-1] = not _isTruthy(stack[-1])
+				ip += 1
+			elif op == NEGATE:
+				if not _is_number(stack[-1]):
+					raise LoxRuntimeError(proto.tokens[ip], "Operand must be a number.")
+				stack[-1] = -stack[-1]
+				ip += 1
+			elif op == JUMP_IF_FALSE_OR_POP:
+				if _isTruthy(stack[-1]):
+					pop()
+					ip += 2
+				else:
+					ip = code[ip + 1]
+			elif op == JUMP_IF_TRUE_OR_POP:
+				if _isTruthy(stack[-1]):
+					ip = code[ip + 1]
+				else:
+					pop()
+					ip += 2
+			elif op == PRINT:
+				write_line(Interpreter._stringify(pop()))
+				ip += 1
+			elif op == SET_GLOBAL:
+				name = constants[code[ip + 1]]
+				if name not in globals_:
+					raise LoxRuntimeError(proto.tokens[ip], f"Undefined variable '{name}'.")
+				globals_[name] = stack[-1]
+				ip += 2
+			elif op == DEFINE_GLOBAL:
+				globals_[constants[code[ip + 1]]] = pop()
+				ip += 2
+			elif op == MAKE_CELL:
+				locals_[code[ip + 1]] = Cell(pop())
+				ip += 2
+			elif op == STORE_CELL:
+				locals_[code[ip + 1]].value = pop()
+				ip += 2
+			elif op == CELL_PARAM:
+				slot = code[ip + 1]
+				locals_[slot] = Cell(locals_[slot])
+				ip += 2
+			elif op == CLOSURE:
+				function_proto: FunctionProto = constants[code[ip + 1]]
+				push(Closure(function_proto, [
+					locals_[index] if is_local else free[index]
+					for is_local, index in function_proto.free_sources
+				]))
+				ip += 2
+			else:
+				raise RuntimeError(f"Unknown opcode {op} at {ip}")
+
+	def _call_native(self, paren: Token, callee: Any, arguments: list) -> Any:
+		if not isinstance(callee, LoxCallable):
+			raise LoxRuntimeError(paren, "Can only call functions and classes.")
+		if len(arguments) != callee.arity():
+			raise LoxRuntimeError(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+		try:
+			return callee.call(self, arguments)
+		except RecursionError: # A native, such as bench(), calling back into Lox
+			raise LoxRuntimeError(paren, "Stack overflow.") from None
+		except NativeError as error:
+			raise LoxRuntimeError(paren, error.message) from None
+
+	@staticmethod
+	def _check_number_operands(operator: Token, left: Any, right: Any) -> None:
+		if not (_is_number(left) and _is_number(right)):
+			raise LoxRuntimeError(operator, "Operands must be numbers.")
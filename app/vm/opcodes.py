@@ -0,0 +1,51 @@
+"""
+Instruction set of the bytecode VM.
+
+Instructions are stored in a flat list of ints: the opcode, followed by its operand when it has one.
+Opcodes are plain ints (rather than an Enum) because they are compared on every dispatch.
+"""
+
+# Instructions with one operand
+CONSTANT = 0        # push constants[operand]
+GET_LOCAL = 1       # push locals[operand]
+SET_LOCAL = 2       # locals[operand] = top (value stays on the stack)
+STORE_LOCAL = 3     # locals[operand] = pop()
+GET_CELL = 4        # push locals[operand].value
+SET_CELL = 5        # locals[operand].value = top (value stays on the stack)
+STORE_CELL = 6      # locals[operand].value = pop()
+MAKE_CELL = 7       # locals[operand] = Cell(pop())
+GET_FREE = 8        # push free[operand].value
+SET_FREE = 9        # free[operand].value = top (value stays on the stack)
+GET_GLOBAL = 10     # push globals[constants[operand]]
+SET_GLOBAL = 11     # globals[constants[operand]] = top (value stays on the stack)
+DEFINE_GLOBAL = 12  # globals[constants[operand]] = pop()
+JUMP = 13                 # ip = operand
+POP_JUMP_IF_FALSE = 14    # ip = operand if pop() is falsey
+JUMP_IF_FALSE_OR_POP = 15 # ip = operand if top is falsey, else pop()
+JUMP_IF_TRUE_OR_POP = 16  # ip = operand if top is truthy, else pop()
+CALL = 17           # call the callee below the top `operand` arguments
+CLOSURE = 18        # push a Closure over the FunctionProto in constants[operand]
+CELL_PARAM = 19     # locals[operand] = Cell(locals[operand]), for captured parameters
+
+# Instructions without operand
+POP = 20
+ADD = 21
+SUBTRACT = 22
+MULTIPLY = 23
+DIVIDE = 24
+GREATER = 25
+GREATER_EQUAL = 26
+LESS = 27
+LESS_EQUAL = 28
+EQUAL = 29
+NOT_EQUAL = 30
+NEGATE = 31
+NOT = 32
+PRINT = 33
+RETURN = 34
+
+HAS_OPERAND = POP # opcodes below this value are followed by an operand
+
+OPCODE_NAMES: dict[int, str] = {
+	value: name for name, value in globals().items() if name.isupper() and name != "HAS_OPERAND"
+}
@@ -0,0 +1,69 @@
+"""
+Measures what Environment allocation costs the tree-walking Interpreter:
+per Lox function call (one Environment for the parameters and body) and per loop
+iteration (one Environment for the block of the loop body).
+
+Run from the repository root:
+
+    python -m bench.environment
+"""
+import timeit
+import tracemalloc
+from app.scanner import Scanner
+from app.parser import Parser
+from app.resolver import Resolver
+from app.interpreter import Interpreter
+from app.environment import Environment
+
+ITERATIONS = 100_000
+
+CALLS = f"""
+fun f(a) {{ return a; }}
+for (var i = 0; i < {ITERATIONS}; i = i + 1) f(i);
+"""
+
+EMPTY_LOOP = f"""
+var i = 0;
+while (i < {ITERATIONS}) i = i + 1;
+"""
+
+BLOCK_LOOP = f"""
+var i = 0;
+while (i < {ITERATIONS}) {{ i = i + 1; }}
+"""
+
+def run(source: str) -> float:
+    scanner = Scanner(source)
+    statements = Parser(scanner.tokenize()).parse()
+    Resolver().resolve(statements)
+    interpreter = Interpreter(resolved=True)
+    return min(timeit.repeat(lambda: interpreter.interpret(statements), number=1, repeat=3))
+
+def bytes_per_environment(count: int = 10_000) -> float:
+    parent = Environment()
+    tracemalloc.start()
+    environments = []
+    for i in range(count):
+        environment = Environment(parent)
+        environment.define("a", i)
+        environments.append(environment)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / count
+
+def main():
+    empty_loop = run(EMPTY_LOOP)
+    block_loop = run(BLOCK_LOOP)
+    calls = run(CALLS)
+    # A call iteration also pays for the `for` body block and increment, measured by block_loop
+    per_iteration = (block_loop - empty_loop) / ITERATIONS * 1e6
+    per_call = (calls - block_loop) / ITERATIONS * 1e6
+    allocation = timeit.timeit(lambda: Environment(None), number=ITERATIONS) / ITERATIONS * 1e6
+
+    print(f"Environment() alone:         {allocation:8.3f} us")
+    print(f"Environment memory:          {bytes_per_environment():8.1f} bytes (with one variable)")
+    print(f"Block entry per iteration:   {per_iteration:8.3f} us")
+    print(f"Function call:               {per_call:8.3f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Measures what a Lox `return` costs the tree-walking Interpreter: on its own (a function that
+returns its argument against one that only evaluates it) and per call of a recursive `fib`.
+
+Run from the repository root:
+
+    python -m bench.returns
+"""
+import timeit
+from app.scanner import Scanner
+from app.parser import Parser
+from app.resolver import Resolver
+from app.interpreter import Interpreter
+
+ITERATIONS = 100_000
+FIB_N = 22
+
+RETURNING = f"""
+fun f(a) {{ return a; }}
+for (var i = 0; i < {ITERATIONS}; i = i + 1) f(i);
+"""
+
+NOT_RETURNING = f"""
+fun f(a) {{ a; }}
+for (var i = 0; i < {ITERATIONS}; i = i + 1) f(i);
+"""
+
+FIB = f"""
+fun fib(n) {{ if (n < 2) return n; return fib(n - 1) + fib(n - 2); }}
+fib({FIB_N});
+"""
+
+def run(source: str) -> float:
+    scanner = Scanner(source)
+    statements = Parser(scanner.tokenize()).parse()
+    Resolver().resolve(statements)
+    interpreter = Interpreter(resolved=True)
+    return min(timeit.repeat(lambda: interpreter.interpret(statements), number=1, repeat=3))
+
+def fib_calls(n: int) -> int:
+    calls = [1, 1]
+    for _ in range(2, n + 1):
+        calls.append(calls[-1] + calls[-2] + 1)
+    return calls[n]
+
+def main():
+    returning = run(RETURNING)
+    not_returning = run(NOT_RETURNING)
+    fib = run(FIB)
+
+    print(f"Call with return:            {returning / ITERATIONS * 1e6:8.3f} us")
+    print(f"Call without return:         {not_returning / ITERATIONS * 1e6:8.3f} us")
+    print(f"Return alone:                {(returning - not_returning) / ITERATIONS * 1e6:8.3f} us")
+    print(f"fib({FIB_N}) per call:           {fib / fib_calls(FIB_N) * 1e6:8.3f} us")
+
+if __name__ == "__main__":
+    main()
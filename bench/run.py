@@ -0,0 +1,173 @@
+"""
+Benchmark suite of the tree-walking Interpreter: runs every program of `bench/programs`, plus a
+large generated source for the Scanner and the Parser, and times each phase separately.
+
+Every program is compiled and run from scratch `--repeat` times after `--warmup` discarded runs,
+and the mean and standard deviation of each phase are reported, and optionally saved as JSON.
+Given a `--baseline` saved by an earlier run, phases whose mean grew by more than `--threshold`
+are flagged as regressions, and the runner exits with status 1.
+
+Run from the repository root:
+
+    python -m bench.run --output=baseline.json
+    python -m bench.run --baseline=baseline.json [fib strings ...]
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from app.scanner import Scanner
+from app.parser import Parser
+from app.resolver import Resolver
+from app.optimizer import Optimizer
+from app.interpreter import Interpreter
+from app.output import Output
+
+PROGRAMS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+PHASES = ["scan", "parse", "resolve", "interpret"]
+
+# Phases shorter than this in the baseline are too noisy to be flagged as regressions
+MIN_COMPARED_SECONDS = 0.001
+
+GENERATED_NAME = "generated_source"
+GENERATED_UNITS = 2000
+
+def generated_source(units: int = GENERATED_UNITS) -> str:
+    """A long program exercising every kind of token, for the Scanner and the Parser."""
+    unit = """
+// Unit {i}: a comment the scanner has to skip
+var name{i} = "value number {i}";
+fun compute{i}(a, b) {{
+  if (a >= b and !(a == nil)) {{
+    return a * {i}.5 - (b / 2);
+  }} else {{
+    for (var k = 0; k <= 2; k = k + 1) a = a + k;
+  }}
+  return a != b or false;
+}}
+print compute{i}({i}, {i} + 1);
+"""
+    return "".join(unit.format(i=i) for i in range(units))
+
+def load_programs(names: list[str]) -> dict[str, str]:
+    programs = {}
+    for filename in sorted(os.listdir(PROGRAMS_DIRECTORY)):
+        if filename.endswith(".lox"):
+            with open(os.path.join(PROGRAMS_DIRECTORY, filename)) as file:
+                programs[filename.removesuffix(".lox")] = file.read()
+    programs[GENERATED_NAME] = generated_source()
+
+    unknown = [name for name in names if name not in programs]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)} (available: {', '.join(programs)})")
+    return {name: source for name, source in programs.items() if not names or name in names}
+
+def time_phases(source: str) -> dict[str, float]:
+    """Runs the program once, returning the time spent in each phase in seconds."""
+    timings = {}
+    start = time.perf_counter()
+    tokens = Scanner(source, print_to_stdout=False).tokenize()
+    timings["scan"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    statements = Parser(tokens).parse()
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Resolver().resolve(statements)
+    statements = Optimizer().optimize(statements)
+    timings["resolve"] = time.perf_counter() - start
+
+    interpreter = Interpreter(resolved=True, output=Output(io.StringIO()))
+    start = time.perf_counter()
+    interpreter.interpret(statements)
+    timings["interpret"] = time.perf_counter() - start
+    return timings
+
+def benchmark(source: str, repeat: int, warmup: int) -> dict[str, dict[str, float]]:
+    for _ in range(warmup):
+        time_phases(source)
+
+    samples: dict[str, list[float]] = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        gc.collect() # Garbage of the previous run is not charged to this one
+        for phase, seconds in time_phases(source).items():
+            samples[phase].append(seconds)
+
+    return {
+        phase: {
+            "mean": statistics.mean(times),
+            "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "min": min(times),
+        }
+        for phase, times in samples.items()
+    }
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Phases slower than in the baseline by more than `threshold` (a fraction of the baseline mean)."""
+    regressions = []
+    for name, phases in results["benchmarks"].items():
+        for phase, stats in phases.items():
+            previous = baseline["benchmarks"].get(name, {}).get(phase)
+            if previous is None or previous["mean"] < MIN_COMPARED_SECONDS:
+                continue
+            change = stats["mean"] / previous["mean"] - 1
+            if change > threshold:
+                regressions.append(f"{name}/{phase}: {previous['mean'] * 1e3:.2f} ms -> {stats['mean'] * 1e3:.2f} ms (+{change:.0%})")
+    return regressions
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    print(f"{'benchmark':<20} {'phase':<10} {'mean (ms)':>12} {'stddev':>10} {'baseline':>12}")
+    for name, phases in results["benchmarks"].items():
+        for phase, stats in phases.items():
+            previous = baseline["benchmarks"].get(name, {}).get(phase) if baseline is not None else None
+            compared = f"{stats['mean'] / previous['mean'] - 1:+.1%}" if previous and previous["mean"] else ""
+            print(f"{name:<20} {phase:<10} {stats['mean'] * 1e3:12.3f} {stats['stddev'] * 1e3:10.3f} {compared:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Times the phases of the Lox interpreter on the benchmark programs.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="measured runs of each program")
+    parser.add_argument("--warmup", type=int, default=1, help="discarded runs before measuring")
+    parser.add_argument("--output", help="file to save the results to, as JSON")
+    parser.add_argument("--baseline", help="results saved by an earlier run, to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown over the baseline mean reported as a regression (default: 0.10)")
+    args = parser.parse_args()
+    if args.repeat < 1 or args.warmup < 0:
+        parser.error("--repeat must be positive and --warmup not negative")
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "benchmarks": {},
+    }
+    for name, source in load_programs(args.names).items():
+        results["benchmarks"][name] = benchmark(source, args.repeat, args.warmup)
+
+    print_results(results, baseline)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            exit(1)
+
+if __name__ == "__main__":
+    main()
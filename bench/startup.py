@@ -0,0 +1,105 @@
+"""
+Startup benchmark: times `tokenize`, `parse` and `run` of an empty program in fresh processes,
+which measures what the entry point costs before the program itself starts, mostly imports.
+
+Each command is run `--repeat` times and the fastest run is kept. The time of starting Python
+itself (`python -c pass`, timed the same way) is subtracted. The slowest imports of each command
+are listed, as measured by `-X importtime`.
+
+The benchmark fails, exiting with status 1, when starting `run` takes longer than `--budget`
+times starting Python itself, or when a command imports a module it does not need (e.g. `run`
+on the tree engine loading the compiled engines or the cache). The budget is relative, so that
+it holds on slower and faster machines alike. When it was set, on a loaded single-CPU Linux
+machine, `run` took 3 to 5 times as long as starting Python, against about 8 times when every
+module was imported eagerly.
+
+Run from the repository root:
+
+    python -m bench.startup
+    python -m bench.startup --budget=4 --top=5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = ["tokenize", "parse", "run"]
+BUDGETED_COMMAND = "run"
+DEFAULT_BUDGET = 6.0
+
+# Modules that a command must not import
+UNNEEDED_MODULES = {
+    "tokenize": ["app.parser", "app.interpreter"],
+    "parse": ["app.resolver", "app.interpreter"],
+    "run": [
+        "app.cache", "app.stats", "app.profiler", "app.closure_compiler", "app.transpiler",
+        "app.vm.compiler", "app.vm.machine", "app.batch", "app.server",
+    ],
+}
+
+def time_processes(processes: list[list[str]], repeat: int) -> list[float]:
+    """
+    The shortest wall time, in seconds, of `repeat` runs of each Python process, whatever its
+    status. The processes take turns, so that a change in the load of the machine affects them all.
+    """
+    best = [float("inf")] * len(processes)
+    for _ in range(repeat):
+        for index, arguments in enumerate(processes):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *arguments], cwd=REPOSITORY, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            best[index] = min(best[index], time.perf_counter() - start)
+    return best
+
+def import_times(arguments: list[str]) -> dict[str, tuple[float, bool]]:
+    """
+    The modules a Python process imports, with their cumulative import time in seconds and whether
+    they were imported at the top level (rather than by another module).
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=REPOSITORY, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        # Nested imports are indented further than the module that imports them
+        times[module.strip()] = (int(cumulative) / 1e6, not module.startswith("  "))
+    return times
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Times the startup of the interpreter on an empty program.")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each command, of which the fastest is kept")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help=f"maximum startup time of `{BUDGETED_COMMAND}`, as a multiple of starting Python")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports listed for each command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        empty_program = os.path.join(directory, "empty.lox")
+        open(empty_program, "w").close()
+
+        commands = {command: ["-m", "app.main", command, empty_program] for command in COMMANDS}
+        python, *startups = time_processes([["-c", "pass"], *commands.values()], args.repeat)
+        python_modules = import_times(["-c", "pass"])
+        print(f"{'python -c pass':<20}{python * 1e3:10.1f} ms")
+        failures = []
+        for (command, arguments), total in zip(commands.items(), startups):
+            startup = total - python
+            print(f"{command:<20}{startup * 1e3:10.1f} ms (besides starting Python)")
+
+            times = import_times(arguments)
+            # The imports of the entry point, not of starting Python
+            imports = [(module, seconds) for module, (seconds, top_level) in times.items() if top_level and module not in python_modules]
+            for module, seconds in sorted(imports, key=lambda item: -item[1])[:args.top]:
+                print(f"    {module:<32}{seconds * 1e3:10.1f} ms")
+            failures.extend(f"`{command}` imports {module}" for module in UNNEEDED_MODULES[command] if module in times)
+            if command == BUDGETED_COMMAND and startup > args.budget * python:
+                failures.append(f"`{command}` starts in {startup * 1e3:.1f} ms, over the budget of {args.budget} x {python * 1e3:.1f} ms")
+
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
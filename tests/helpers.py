@@ -0,0 +1,33 @@
+"""
+Helpers shared by the tests: running a program in process on an engine, with its output captured.
+"""
+import io
+from app.grammar.statements import Stmt
+from app.interpreter import Interpreter
+from app.main import compile_program
+from app.output import Output
+
+def tree_interpreter(stream: io.StringIO, **options) -> Interpreter:
+    """An Interpreter for resolved programs that prints to `stream`, with the given options (e.g. memo_capacity)."""
+    return Interpreter(resolved=True, output=Output(stream), **options)
+
+def run_tree(program: str | list[Stmt], **options) -> str:
+    """Runs a program (its source, or its compiled statements) on the tree engine and returns its output."""
+    stream = io.StringIO()
+    tree_interpreter(stream, **options).interpret(compile_program(program) if isinstance(program, str) else program)
+    return stream.getvalue()
+
+def run_vm(source: str) -> str:
+    from app.vm.compiler import Compiler
+    from app.vm.machine import VM
+
+    stream = io.StringIO()
+    VM(Output(stream)).interpret(Compiler.compile(compile_program(source)))
+    return stream.getvalue()
+
+def run_python(source: str) -> str:
+    from app.transpiler import PythonEngine, Transpiler
+
+    stream = io.StringIO()
+    PythonEngine(Output(stream)).interpret(Transpiler().transpile(compile_program(source)))
+    return stream.getvalue()
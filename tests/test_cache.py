@@ -0,0 +1,56 @@
+"""
+Tests of the on-disk cache of compiled programs.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from app.cache import CACHE_DIRECTORY, ProgramCache
+from app.main import compile_program
+
+SOURCE = "var a = 1;\nprint a;\n"
+
+class ProgramCacheTest(unittest.TestCase):
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.root = temporary.name
+        self.script = os.path.join(self.root, "script.lox")
+
+    def test_hit_after_store(self):
+        cache = ProgramCache.for_script(self.script)
+        self.assertIsNone(cache.load(SOURCE))
+        compile_program(SOURCE, cache)
+        self.assertIsNotNone(cache.load(SOURCE))
+        self.assertFalse(os.stat(cache.directory).st_mode & 0o022)
+
+    def test_directory_writable_by_others_is_not_loaded(self):
+        cache = ProgramCache.for_script(self.script)
+        compile_program(SOURCE, cache)
+        os.chmod(cache.directory, 0o777)
+        self.assertIsNone(cache.load(SOURCE))
+
+    def test_directory_writable_by_others_is_not_written(self):
+        directory = os.path.join(self.root, CACHE_DIRECTORY)
+        os.mkdir(directory)
+        os.chmod(directory, 0o775)
+        ProgramCache(directory).store(SOURCE, compile_program(SOURCE))
+        self.assertEqual(os.listdir(directory), [])
+
+    def test_untrusted_directory_next_to_script_falls_back_to_user_cache(self):
+        directory = os.path.join(self.root, CACHE_DIRECTORY)
+        os.mkdir(directory)
+        os.chmod(directory, 0o777)
+        user_cache = os.path.join(self.root, "user-cache")
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": user_cache}):
+            cache = ProgramCache.for_script(self.script)
+        self.assertEqual(cache.directory, os.path.join(user_cache, "lox"))
+        compile_program(SOURCE, cache)
+        self.assertIsNotNone(cache.load(SOURCE))
+
+if __name__ == "__main__":
+    unittest.main()
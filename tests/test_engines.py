@@ -0,0 +1,163 @@
+"""
+Differential tests of the execution engines, including the transpiler: each program of the
+corpus must print the same output, report the same errors and exit with the same code on every
+engine as on `tree`.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ENGINES = ["closure", "vm", "python"]
+
+CORPUS = {
+    "closures captured in loops": """
+        var first = nil;
+        for (var i = 0; i < 3; i = i + 1) {
+            var j = i;
+            fun show() { print j; }
+            if (i == 0) first = show;
+            show();
+        }
+        first();
+        var last = nil;
+        {
+            var k = 0;
+            while (k < 3) {
+                var captured = k;
+                fun f() { return captured * 10; }
+                last = f;
+                k = k + 1;
+            }
+        }
+        print last();
+    """,
+    "counter": """
+        fun counter() {
+            var n = 0;
+            fun increment() { n = n + 1; return n; }
+            return increment;
+        }
+        var c = counter();
+        c();
+        c();
+        print c();
+        print counter()();
+    """,
+    "returns": """
+        fun first(a, b) { if (a) return a; return b; }
+        print first(nil, "b");
+        fun loop() { while (true) { for (;;) { return "out"; } } }
+        print loop();
+        fun none() { return; }
+        print none();
+        fun nothing() { 1; }
+        print nothing();
+        print first;
+        print clock;
+    """,
+    "returns of falsy values": """
+        fun find(n) {
+            for (var i = 0; i < 10; i = i + 1) {
+                while (true) {
+                    print i;
+                    if (i == n) { return nil; }
+                    if (i < n) { i = i + 1; } else { return "past"; }
+                }
+            }
+            return "not found";
+        }
+        print find(2);
+        print find(-1);
+        fun stop() { { { return false; } } print "unreachable"; }
+        print stop();
+        fun empty() { if (true) return; print "unreachable"; }
+        print empty();
+    """,
+    "constant operands": """
+        var s = "a";
+        var i = 0;
+        while (i < 3) i = i + 1;
+        print i * 2 > 5;
+        print s - 1;
+    """,
+    "constant operand of a comparison": """
+        var t = true;
+        print t < 10;
+    """,
+    "values": """
+        print -0;
+        print 1 / 3;
+        print 10 / 2;
+        print "a" + "b" == "ab";
+        print nil == false;
+        print !nil and 1 or 2;
+    """,
+    "deep recursion": """
+        fun depth(n) { if (n == 0) return 0; return depth(n - 1) + 1; }
+        print depth(100);
+    """,
+    "stack overflow": """
+        fun f(n) { return f(n + 1) + 1; }
+        print "before";
+        f(0);
+    """,
+    "stack overflow through a native": """
+        fun f() { return bench(f, 1); }
+        print f();
+    """,
+    "operands of a subtraction": """
+        print "start";
+        print "a" - 1;
+    """,
+    "operands of an addition": """
+        print 1 + nil;
+    """,
+    "undefined variable": """
+        var x = 1;
+        print x;
+        print y;
+    """,
+    "wrong number of arguments": """
+        fun f(a, b) { return a + b; }
+        print f(1, 2);
+        print f(1);
+    """,
+    "call of a non-function": """
+        var s = "x";
+        s();
+    """,
+}
+
+def run_engine(source: str, engine: str, *options: str) -> tuple[str, str, int]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "script.lox")
+        with open(path, "w") as file:
+            file.write(source)
+        result = subprocess.run([sys.executable, "-m", "app.main", "run", f"--engine={engine}", *options, path], capture_output=True, text=True)
+    return result.stdout, result.stderr, result.returncode
+
+class EngineDifferentialTest(unittest.TestCase):
+    def test_corpus(self):
+        for name, source in CORPUS.items():
+            expected = run_engine(source, "tree")
+            for engine in ENGINES:
+                with self.subTest(name, engine=engine):
+                    self.assertEqual(run_engine(source, engine), expected)
+
+    def test_vm_recursion_up_to_max_depth(self):
+        # depth(n) makes n + 1 calls, which must fit in --max-depth
+        source = "fun depth(n) { if (n == 0) return 0; return depth(n - 1) + 1; }\nprint depth(%d);\n"
+        self.assertEqual(run_engine(source % 499, "vm", "--max-depth=500"), ("499\n", "", 0))
+        overflow = run_engine(source % 500, "vm", "--max-depth=500")
+        self.assertEqual(overflow, ("", "Stack overflow.\n[line 1]\n", 70))
+        # As on the tree engine, past the depth that Python's stack allows
+        self.assertEqual(run_engine(source % 100000, "tree"), overflow)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Tests of the inline caches of the tree-walking Interpreter.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import dataclasses
+import unittest
+from app.grammar.expressions import Expr, Variable
+from app.grammar.statements import Stmt
+from app.interpreter import LoxFunction
+from app.main import compile_program
+from helpers import run_tree
+
+def variables(node, name: str) -> list[Variable]:
+    """The reads of the variable `name` in a syntax tree."""
+    if isinstance(node, list):
+        return [variable for child in node for variable in variables(child, name)]
+    if not isinstance(node, (Stmt, Expr)):
+        return []
+    # Fields that are not compared are annotations, such as the caches, rather than children
+    children = [getattr(node, field.name) for field in dataclasses.fields(node) if field.compare]
+    found = [variable for child in children for variable in variables(child, name)]
+    return found + [node] if isinstance(node, Variable) and node.name.lexeme == name else found
+
+class GlobalCacheTest(unittest.TestCase):
+    def test_global_functions_and_values_are_cached(self):
+        statements = compile_program("var n = 10;\nfun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }\nprint fib(n);\n")
+        self.assertEqual(run_tree(statements), "55\n")
+        self.assertTrue(all(isinstance(read.cached_value, LoxFunction) for read in variables(statements, "fib")))
+        self.assertEqual([read.cached_value for read in variables(statements, "n") if read.depth is None], [10.0])
+
+    def test_closures_are_not_kept_alive(self):
+        # The closure, and the environment it captured, used to stay in the cache of `f()`
+        statements = compile_program("fun make() { var x = 1; fun g() { return x; } return g; }\nvar f = make();\nprint f();\nf = nil;\n")
+        self.assertEqual(run_tree(statements), "1\n")
+        self.assertEqual([read.cached_value for read in variables(statements, "f")], [None])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests of the command line of app.main.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+def run_main(*arguments: str) -> subprocess.CompletedProcess:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "script.lox")
+        with open(path, "w") as file:
+            file.write("print 1;\n")
+        return subprocess.run([sys.executable, "-m", "app.main", *arguments, path], capture_output=True, text=True)
+
+class OptionsTest(unittest.TestCase):
+    def test_accepted_options(self):
+        result = run_main("run", "--engine=vm", "--max-depth=10")
+        self.assertEqual((result.returncode, result.stdout), (0, "1\n"))
+
+    def test_unknown_option(self):
+        # A misspelt option used to be ignored, silently running the tree engine
+        result = run_main("run", "--engnie=vm")
+        self.assertEqual(result.returncode, 64)
+        self.assertEqual(result.stderr, "Unknown option for run: --engnie\n")
+
+    def test_option_of_another_command(self):
+        self.assertEqual(run_main("tokenize", "--stats").returncode, 64)
+        self.assertEqual(run_main("batch", "--memoize").returncode, 64)
+
+    def test_max_depth_on_another_engine(self):
+        # Only the vm engine has a call stack of its own to bound
+        result = run_main("run", "--max-depth=10")
+        self.assertEqual(result.returncode, 64)
+        self.assertEqual(result.stderr, "--max-depth is only supported by the vm engine\n")
+
+if __name__ == "__main__":
+    unittest.main()
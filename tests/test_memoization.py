@@ -0,0 +1,110 @@
+"""
+Tests of the memoization of pure functions (`run --memoize`): which functions the
+PurityAnalyzer finds pure, and which calls MemoizedFunction remembers.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import io
+import unittest
+from app.grammar.statements import Function
+from app.interpreter import Interpreter, Memo
+from app.main import compile_program, mark_pure_functions
+from helpers import tree_interpreter
+
+def run_memoized(source: str, capacity: int = 1024) -> tuple[str, dict[str, Function], Interpreter]:
+    """Runs a program with memoization, and returns its output, its global functions and the interpreter."""
+    statements = mark_pure_functions(compile_program(source))
+    stream = io.StringIO()
+    interpreter = tree_interpreter(stream, memo_capacity=capacity)
+    interpreter.interpret(statements)
+    functions = {statement.name.lexeme: statement for statement in statements if isinstance(statement, Function)}
+    return stream.getvalue(), functions, interpreter
+
+def memo_of(interpreter: Interpreter, function: Function) -> Memo:
+    return interpreter.memos[id(function)]
+
+class PurityTest(unittest.TestCase):
+    def test_impure_functions_are_not_memoized(self):
+        source = """
+            var count = 0;
+            var limit = 1;
+            fun prints(x) { print x; return x; }
+            fun assigns(x) { count = count + x; return count; }
+            fun reads(x) { return x + limit; }
+            fun calls(x) { return prints(x); }
+            print prints(1);
+            print prints(1);
+            print assigns(1);
+            print assigns(1);
+            print reads(1);
+            limit = 2;
+            print reads(1);
+            print calls(1);
+        """
+        output, functions, interpreter = run_memoized(source)
+        self.assertEqual(output, "1\n1\n1\n1\n1\n2\n2\n3\n1\n1\n")
+        for name in ["prints", "assigns", "reads", "calls"]:
+            self.assertFalse(functions[name].pure, name)
+        self.assertEqual(interpreter.memos, {})
+
+    def test_mutual_recursion_is_pure(self):
+        source = """
+            fun isEven(n) { if (n == 0) return true; return isOdd(n - 1); }
+            fun isOdd(n) { if (n == 0) return false; return isEven(n - 1); }
+            print isEven(10);
+            print isEven(10);
+        """
+        output, functions, interpreter = run_memoized(source)
+        self.assertEqual(output, "true\ntrue\n")
+        self.assertTrue(functions["isEven"].pure)
+        self.assertTrue(functions["isOdd"].pure)
+        self.assertEqual(memo_of(interpreter, functions["isEven"]).hits, 1)
+
+class MemoizedFunctionTest(unittest.TestCase):
+    def test_booleans_and_numbers_are_not_mixed_up(self):
+        # In Python, `true == 1`, and so would their keys be
+        source = """
+            fun identity(x) { return x; }
+            print identity(1);
+            print identity(true);
+            print identity(false);
+            print identity(0.5);
+            print identity("1");
+        """
+        output, functions, interpreter = run_memoized(source)
+        self.assertEqual(output, "1\ntrue\nfalse\n0.5\n1\n")
+        memo = memo_of(interpreter, functions["identity"])
+        self.assertEqual((memo.hits, memo.misses), (0, 3))
+
+    def test_zero_arguments_are_not_memoized(self):
+        # -0 == 0, but they print differently
+        source = """
+            fun identity(x) { return x; }
+            print identity(0);
+            print identity(-0);
+            print identity(0);
+        """
+        output, functions, interpreter = run_memoized(source)
+        self.assertEqual(output, "0\n-0\n0\n")
+        memo = memo_of(interpreter, functions["identity"])
+        self.assertEqual((memo.hits, memo.misses), (0, 0))
+
+    def test_least_recently_used_result_is_evicted(self):
+        source = """
+            fun square(x) { return x * x; }
+            square(1);
+            square(2);
+            square(1);
+            square(3);
+            square(1);
+            square(2);
+        """
+        _, functions, interpreter = run_memoized(source, capacity=2)
+        memo = memo_of(interpreter, functions["square"])
+        # square(3) evicts square(2), the least recently used, but not square(1)
+        self.assertEqual((memo.hits, memo.misses), (2, 4))
+
+if __name__ == "__main__":
+    unittest.main()
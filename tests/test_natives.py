@@ -0,0 +1,31 @@
+"""
+Regression tests for the timing natives, such as bench(), which call back into Lox.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import unittest
+from app.utils import LoxRuntimeError
+from helpers import run_tree, run_vm
+
+class BenchTest(unittest.TestCase):
+    def test_bench_calls_back_into_lox(self):
+        self.assertEqual(run_vm("fun f() { return 1; }\nprint bench(f, 3) >= 0;\n"), "true\n")
+
+    def test_recursion_through_bench_is_a_stack_overflow(self):
+        # Each call through bench() adds Python frames: this used to crash with a RecursionError
+        with self.assertRaises(LoxRuntimeError) as context:
+            run_vm("fun f() { return bench(f, 1); }\nprint f();\n")
+        self.assertEqual(context.exception.message, "Stack overflow.")
+        self.assertEqual(context.exception.token.line, 1)
+
+    def test_recursion_through_bench_in_a_tail_call_is_reported_where_it_overflows(self):
+        # A tail call of a native used to leave the RecursionError to the outermost call
+        with self.assertRaises(LoxRuntimeError) as context:
+            run_tree("fun f() { return bench(f, 1); }\nprint f();\n")
+        self.assertEqual(context.exception.message, "Stack overflow.")
+        self.assertEqual(context.exception.token.line, 1)
+
+if __name__ == "__main__":
+    unittest.main()
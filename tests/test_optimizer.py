@@ -0,0 +1,83 @@
+"""
+Tests of the Optimizer: optimized programs must behave exactly like unoptimized ones.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import io
+import unittest
+from app.grammar.expressions import Binary, Literal, Unary
+from app.grammar.statements import Print, Stmt
+from app.optimizer import Optimizer
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+from app.utils import LoxRuntimeError
+from helpers import tree_interpreter
+
+def resolve(source: str) -> list[Stmt]:
+    return Resolver().resolve(Parser(Scanner(source).tokenize()).parse())
+
+def run(statements: list[Stmt]) -> tuple[str, str | None]:
+    """The output of a program, and the error it fails with, if any."""
+    stream = io.StringIO()
+    try:
+        tree_interpreter(stream).interpret(statements)
+    except LoxRuntimeError as error:
+        return stream.getvalue(), f"{error.message} [line {error.token.line}]"
+    except ArithmeticError as error:
+        return stream.getvalue(), type(error).__name__
+    return stream.getvalue(), None
+
+class OptimizerTest(unittest.TestCase):
+    def optimize(self, source: str) -> list[Stmt]:
+        """Optimizes a program, checking that it behaves as it does without optimization."""
+        optimized = Optimizer().optimize(resolve(source))
+        self.assertEqual(run(optimized), run(resolve(source)))
+        return optimized
+
+    def assertPrintsLiterals(self, statements: list[Stmt], values: list):
+        self.assertTrue(all(isinstance(statement, Print) and isinstance(statement.expression, Literal) for statement in statements))
+        self.assertEqual([statement.expression.value for statement in statements], values)
+
+    def test_folding(self):
+        statements = self.optimize('print 1 + 2 * (3 - 1);\nprint "a" + "b";\nprint !nil;\nprint -(-2);\nprint 1 < 2 == true;\nprint nil or "x";\n')
+        self.assertPrintsLiterals(statements, [5.0, "ab", True, 2.0, True, "x"])
+
+    def test_failing_folds_are_left_in_place(self):
+        statements = self.optimize('print "before";\nprint -"str";\n')
+        self.assertIsInstance(statements[1].expression, Unary)
+        statements = self.optimize('print "before";\nprint "a" - 1;\n')
+        self.assertIsInstance(statements[1].expression, Binary)
+        statements = self.optimize('print "before";\nprint 1 / 0;\n')
+        self.assertIsInstance(statements[1].expression, Binary)
+
+    def test_failing_folds_only_fail_when_executed(self):
+        statements = self.optimize('fun f() { return -"str"; }\nfun g() { return 1 / 0; }\nprint "never called";\n')
+        self.assertIsInstance(statements[0].body[0].value, Unary)
+        self.assertIsInstance(statements[1].body[0].value, Binary)
+
+    def test_propagation_of_constant_locals(self):
+        statements = self.optimize('{\n  var a = 2;\n  var b;\n  print a * 3;\n  print b;\n}\n')
+        self.assertPrintsLiterals(statements[0].statements[2:], [6.0, None])
+
+    def test_reassigned_locals_are_not_propagated(self):
+        source = 'fun f() {\n  var a = 1;\n  if (clock() > 0) a = 2;\n  return a + 1;\n}\nprint f();\n'
+        statements = self.optimize(source)
+        self.assertNotIsInstance(statements[0].body[2].value, Literal)
+        # Nor are globals, which can be reassigned from anywhere
+        statements = self.optimize('var g = 1;\nfun set() { g = 2; }\nset();\nprint g + 1;\n')
+        self.assertNotIsInstance(statements[3].expression, Literal)
+
+    def test_dead_branches(self):
+        statements = self.optimize('if (false) print 1; else print 2;\nif (nil) print 3;\nwhile (false) print 4;\nif (1 < 2) { print 5; }\n')
+        self.assertEqual(len(statements), 2)
+        self.assertPrintsLiterals(statements[:1], [2.0])
+
+    def test_live_loops_are_kept(self):
+        statements = self.optimize('var i = 0;\nwhile (i < 2) { if (true) i = i + 1; }\nprint i;\n')
+        self.assertEqual(len(statements), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests of the static errors and of the (depth, slot) addresses found by the Resolver.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import dataclasses
+import io
+import unittest
+from app.grammar.expressions import Assign, Expr, Variable
+from app.grammar.statements import Stmt
+from app.parser import ParseError, Parser
+from app.resolver import Resolver
+from app.scanner import Scanner
+
+def resolve(source: str) -> list[Stmt]:
+    return Resolver().resolve(Parser(Scanner(source, print_to_stdout=False).tokenize()).parse())
+
+def addresses(node) -> list[tuple[str, int | None, int | None]]:
+    """The address of every variable read and assignment, in the order they are resolved."""
+    if isinstance(node, list):
+        return [address for child in node for address in addresses(child)]
+    if not isinstance(node, (Stmt, Expr)):
+        return []
+    found = [address for field in dataclasses.fields(node) for address in addresses(getattr(node, field.name))]
+    if isinstance(node, (Variable, Assign)):
+        # An assignment comes after its value
+        found.append((node.name.lexeme, node.depth, node.slot))
+    return found
+
+class StaticErrorTest(unittest.TestCase):
+    def assertStaticError(self, source: str, message: str):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(ParseError):
+            resolve(source)
+        self.assertEqual(stderr.getvalue(), message)
+
+    def test_local_read_in_its_own_initializer(self):
+        # Used to print 3, reading the outer `a`
+        self.assertStaticError("var a = 1;\n{ var a = a + 2; }\n", "[line 2] at 'a': Can't read local variable in its own initializer.\n")
+
+    def test_duplicate_local(self):
+        self.assertStaticError("fun f() {\n  var a = 1;\n  var a = 2;\n}\n", "[line 3] at 'a': Already a variable with this name in this scope.\n")
+
+    def test_duplicate_parameter(self):
+        self.assertStaticError("fun f(a, a) {}\n", "[line 1] at 'a': Already a variable with this name in this scope.\n")
+
+    def test_top_level_return(self):
+        self.assertStaticError("return 1;\n", "[line 1] at 'return': Can't return from top-level code.\n")
+
+    def test_globals_can_be_redeclared(self):
+        self.assertEqual(addresses(resolve("var a = 1;\nvar a = a + 2;\n")), [("a", None, None)])
+
+class AddressTest(unittest.TestCase):
+    def test_shadowed_variables(self):
+        source = """
+            var a = "global";
+            {
+                var b = 1;
+                var a = "outer";
+                {
+                    var a = "inner";
+                    print a;
+                    print b;
+                }
+                print a;
+            }
+            print a;
+        """
+        self.assertEqual(addresses(resolve(source)), [("a", 0, 0), ("b", 1, 0), ("a", 0, 1), ("a", None, None)])
+
+    def test_captured_variables(self):
+        source = """
+            fun counter(step) {
+                var count = 0;
+                fun increment() {
+                    var previous = count;
+                    count = count + step;
+                    return previous;
+                }
+                return increment;
+            }
+        """
+        # Parameters come first in the scope of the function body
+        self.assertEqual(addresses(resolve(source)), [
+            ("count", 1, 1), ("count", 1, 1), ("step", 1, 0), ("count", 1, 1), ("previous", 0, 0), ("increment", 0, 2),
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests of the Rope representation of long strings built by `+`.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import unittest
+from app.interpreter import Interpreter
+from app.rope import ROPE_THRESHOLD, Rope
+from helpers import run_tree
+
+BASE = "x" * ROPE_THRESHOLD
+
+class RopeTest(unittest.TestCase):
+    def test_equality_with_str(self):
+        rope = Rope.concat(BASE, "a")
+        self.assertIsInstance(rope, Rope)
+        self.assertTrue(rope == BASE + "a")
+        self.assertTrue(BASE + "a" == rope)
+        self.assertFalse(rope == BASE + "b")
+        self.assertFalse(rope == BASE)
+        self.assertTrue(rope == Rope.concat(BASE[:-1], "xa"))
+        self.assertEqual(hash(rope), hash(BASE + "a"))
+        self.assertEqual({rope: 1}[BASE + "a"], 1)
+        self.assertFalse(rope == 1.0)
+
+    def test_two_appends_to_the_same_base(self):
+        base = Rope.concat(BASE, "a")
+        first = Rope.concat(base, "b")
+        second = Rope.concat(base, "c")
+        self.assertEqual(str(base), BASE + "a")
+        self.assertEqual(str(first), BASE + "ab")
+        self.assertEqual(str(second), BASE + "ac")
+        # Appending again to a rope that was already extended, once it has been joined
+        third = Rope.concat(first, "d")
+        self.assertEqual(str(Rope.concat(first, "e")), BASE + "abe")
+        self.assertEqual(str(third), BASE + "abd")
+
+    def test_stringify(self):
+        rope = Rope.concat(Rope.concat(BASE, "a"), Rope.concat(BASE, "b"))
+        self.assertEqual(Interpreter._stringify(rope), BASE + "a" + BASE + "b")
+        self.assertEqual(len(rope), 2 * len(BASE) + 2)
+
+    def test_assigned_copy_is_not_affected_by_appends(self):
+        source = f"""
+            var s = "{BASE}";
+            s = s + "y";
+            var m = s;
+            m = m + "z";
+            s = s + "w";
+            print s == "{BASE}yw";
+            print m == "{BASE}yz";
+            print m == s;
+        """
+        self.assertEqual(run_tree(source), "true\ntrue\nfalse\n")
+        self.assertEqual(run_tree(f'var s = "{BASE}";\ns = s + "y";\nprint s;\n'), BASE + "y\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Tests of the Scanner: the output of `tokenize`, and scanning a source in chunks.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import unittest
+from app.scanner import Scanner
+
+def tokenize(source: str) -> str:
+    """The output of the `tokenize` command."""
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        Scanner(source, print_to_stdout=True).tokenize()
+    return stdout.getvalue()
+
+def scan(source) -> list[tuple]:
+    return [(token.type, token.lexeme, token.literal, token.line) for token in Scanner(source).tokenize()]
+
+class TokenizeTest(unittest.TestCase):
+    def test_keyword_at_the_end_of_a_line(self):
+        # Used to get the line number of the next line
+        self.assertEqual([token.line for token in Scanner("var x\n= 1;\nprint\nx;\n").tokenize()], [1, 1, 2, 2, 2, 3, 4, 4, 5])
+
+    def test_identifiers_are_not_merged_across_a_newline(self):
+        self.assertEqual(tokenize("foo\nbar"), "IDENTIFIER foo null\nIDENTIFIER bar null\nEOF  null\n")
+
+    def test_number_without_integer_part(self):
+        self.assertEqual(tokenize(".5"), "DOT . null\nNUMBER 5 5.0\nEOF  null\n")
+
+    def test_number_with_two_dots(self):
+        # Used to crash
+        self.assertEqual(tokenize("1.2.3"), "NUMBER 1.2 1.2\nDOT . null\nNUMBER 3 3.0\nEOF  null\n")
+
+    def test_carriage_return_is_whitespace(self):
+        self.assertEqual(tokenize("a\r\nb\r"), "IDENTIFIER a null\nIDENTIFIER b null\nEOF  null\n")
+        self.assertEqual(scan("a\r\nb")[1][3], 2)
+
+class ChunkTest(unittest.TestCase):
+    SOURCE = 'var name = "multi\nline";\n// comment "\nprint name == 12.5 or other_name;\n\tfun f() {}\n'
+
+    def test_every_split_gives_the_same_tokens(self):
+        expected = scan(self.SOURCE)
+        for i in range(len(self.SOURCE) + 1):
+            with self.subTest(split=i):
+                self.assertEqual(scan(iter([self.SOURCE[:i], self.SOURCE[i:]])), expected)
+
+    def test_one_character_chunks(self):
+        self.assertEqual(scan(iter(self.SOURCE)), scan(self.SOURCE))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+Regression tests for the `python` engine on programs nested deeper than Python allows.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import unittest
+from helpers import run_python
+
+class DeepNestingTest(unittest.TestCase):
+    def test_long_chain_of_binary_operators(self):
+        # Each operator used to nest another pair of parentheses: "too many nested parentheses"
+        source = "var a = 1;\nprint " + " + ".join(["a"] * 140) + ";\n"
+        self.assertEqual(run_python(source), "140\n")
+
+    def test_deeply_nested_loops(self):
+        # Each loop used to nest another Python block: "too many statically nested blocks"
+        loops = "".join(f"for (var i{depth} = 0; i{depth} < 1; i{depth} = i{depth} + 1) {{ " for depth in range(25))
+        source = f"var count = 0;\n{loops}count = count + 1;{'}' * 25}\nprint count;\n"
+        self.assertEqual(run_python(source), "1\n")
+
+    def test_return_from_deeply_nested_loops(self):
+        loops = "while (true) { " * 25
+        source = f"fun f(x) {{ {loops}return x;{'}' * 25} }}\nprint f(3);\n"
+        self.assertEqual(run_python(source), "3\n")
+
+if __name__ == "__main__":
+    unittest.main()